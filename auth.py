@@ -0,0 +1,95 @@
+# auth.py
+# Password hashing and login checks for the app's user accounts.
+#
+# Passwords are stored as salted PBKDF2-SHA256 hashes
+#   pbkdf2_sha256$<iterations>$<salt, base64>$<hash, base64>
+# in users.password_hash (SQLite) / THEGREAT.PASSWORD_HASH (MySQL). A login is
+# one indexed lookup of the username (storage.get_credentials) plus one hash
+# verification, however many accounts exist. Accounts created before hashing
+# still have a plaintext password; it is checked once and replaced by a hash
+# on the first successful login.
+#
+# DR_PASSWORD_ITERATIONS sets the PBKDF2 work factor for new hashes (default
+# 600000); existing hashes are upgraded on login when it is raised.
+
+import base64
+import hashlib
+import hmac
+import os
+
+import settings
+
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = settings.get_int("password_iterations", 600000)
+SALT_BYTES = 16
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii")
+
+
+def hash_password(password, iterations=None, salt=None):
+    iterations = iterations or ITERATIONS
+    salt = salt or os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return "%s$%d$%s$%s" % (ALGORITHM, iterations, _b64(salt), _b64(digest))
+
+
+def _parse(stored):
+    algorithm, iterations, salt, digest = stored.split("$")
+    if algorithm != ALGORITHM:
+        raise ValueError("unknown password hash algorithm %r" % algorithm)
+    return int(iterations), base64.b64decode(salt), base64.b64decode(digest)
+
+
+def verify_password(password, stored):
+    try:
+        iterations, salt, digest = _parse(stored)
+    except (ValueError, TypeError):
+        return False
+    candidate = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return hmac.compare_digest(candidate, digest)
+
+
+def needs_rehash(stored):
+    try:
+        return _parse(stored)[0] < ITERATIONS
+    except (ValueError, TypeError):
+        return True
+
+
+# hashed once, so an unknown username costs the same as a wrong password
+_DUMMY_HASH = None
+
+
+def _dummy_hash():
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = hash_password("not a password")
+    return _DUMMY_HASH
+
+
+def check_login(db, username, password):
+    """True if the password is right. Slow on purpose (PBKDF2): call it off the Tk thread."""
+    row = db.get_credentials(username)
+    if row is None:
+        verify_password(password, _dummy_hash())
+        return False
+    stored_hash, legacy_password = row
+    if stored_hash:
+        ok = verify_password(password, stored_hash)
+        if ok and needs_rehash(stored_hash):
+            db.set_password_hash(username, hash_password(password))
+        return ok
+    # account from before hashing: compare the plaintext once, then upgrade it
+    if legacy_password and hmac.compare_digest(str(legacy_password).encode("utf-8"), password.encode("utf-8")):
+        db.set_password_hash(username, hash_password(password))
+        return True
+    return False
+
+
+def create_user(db, username, password):
+    """False if the username is taken."""
+    if db.get_credentials(username) is not None:
+        return False
+    return db.add_user(username, hash_password(password))
@@ -0,0 +1,213 @@
+# autotune.py
+# Pick CPU runtime settings for this machine and save them as the runtime
+# profile that model.py applies at startup.
+#
+#   python autotune.py                       # sweep, write runtime_profile.json
+#   python autotune.py --objective latency   # optimise single-image latency (GUI use)
+#   python autotune.py --quick --dry-run     # smaller sweep, print only
+#
+# Swept on a synthetic workload (random 224x224 batches, untrained weights -
+# speed does not depend on the weights):
+#   - intra-op threads (torch.set_num_threads)
+#   - inter-op threads (torch.set_num_interop_threads)
+#   - channels_last memory layout (eager backend)
+#   - batch size
+#   - backend: eager, torchscript and onnxruntime when installed
+#
+# Inter-op threads can only be set once per process, so every thread
+# combination runs in a fresh interpreter. The saved profile records the
+# machine it was tuned on (CPU count, torch version); model.py ignores a
+# profile copied from a different machine. A backend other than eager is
+# only used at load time if its exported model file exists
+# (export_model.py torchscript / onnx).
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import model
+import settings
+from log_config import setup_logging
+
+_CHILD = r'''
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+cfg = json.loads(sys.argv[2])
+import torch
+if cfg["threads"]:
+    torch.set_num_threads(cfg["threads"])
+if cfg["interop"]:
+    torch.set_num_interop_threads(cfg["interop"])
+import model, backends
+
+def measure(net, batch, min_seconds, min_runs):
+    with torch.no_grad():
+        net(batch)
+        runs, t0 = 0, time.perf_counter()
+        while runs < min_runs or time.perf_counter() - t0 < min_seconds:
+            net(batch)
+            runs += 1
+    return (time.perf_counter() - t0) / runs
+
+out = []
+for backend, path in cfg["backends"]:
+    if backend == "eager":
+        net = model.build_model().eval()
+    else:
+        net = backends.load_backend(backend, path, cfg["threads"] or None)
+    for cl in (cfg["layouts"] if backend == "eager" else [False]):
+        if backend == "eager":
+            net = net.to(memory_format=torch.channels_last if cl else torch.contiguous_format)
+        for bs in cfg["batch_sizes"]:
+            batch = torch.randn(bs, 3, 224, 224)
+            if cl:
+                batch = batch.contiguous(memory_format=torch.channels_last)
+            sec = measure(net, batch, cfg["min_seconds"], cfg["min_runs"])
+            out.append({"backend": backend, "channels_last": cl, "batch_size": bs,
+                        "batch_ms": 1000 * sec, "images_per_sec": bs / sec})
+print("RESULT " + json.dumps(out))
+'''
+
+
+def thread_candidates(cpus, quick=False):
+    cands = {1, cpus, max(1, cpus // 2)}
+    n = 2
+    while n < cpus:
+        cands.add(n)
+        n *= 2
+    if quick:
+        cands = {1, max(1, cpus // 2), cpus}
+    return sorted(cands)
+
+
+def available_backends(workdir, requested):
+    """[(name, artifact path)] for the backends that can be exported here."""
+    import backends
+    out = [("eager", None)]
+    net = None
+    for name in requested:
+        if name == "eager":
+            continue
+        net = net or model.build_model().eval()
+        try:
+            if name == "torchscript":
+                out.append((name, backends.export_torchscript(net, os.path.join(workdir, "tune.ts.pt"))))
+            elif name == "onnxruntime":
+                import onnxruntime  # noqa: F401
+                out.append((name, backends.export_onnx(net, os.path.join(workdir, "tune.onnx"))))
+        except Exception as e:
+            print(f"[TUNE] {name} skipped: {e}")
+    return out
+
+
+def run_child(cfg, timeout=None):
+    env = dict(os.environ, DR_RUNTIME_PROFILE="")  # measure without the current profile
+    proc = subprocess.run([sys.executable, "-c", _CHILD, settings.BASE_DIR, json.dumps(cfg)],
+                          capture_output=True, text=True, env=env, timeout=timeout)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "no result")
+
+
+def score(row, objective):
+    # higher is better
+    return row["images_per_sec"] if objective == "throughput" else -row["batch_ms"]
+
+
+def tune(objective="throughput", batch_sizes=(1, 4, 8, 16, 32), backends_wanted=("torchscript", "onnxruntime"),
+         quick=False, min_seconds=1.0, min_runs=2):
+    cpus = os.cpu_count() or 1
+    if objective == "latency":
+        batch_sizes = (1,)
+    base_cfg = dict(layouts=[False, True], batch_sizes=list(batch_sizes), min_seconds=min_seconds, min_runs=min_runs)
+    with tempfile.TemporaryDirectory(prefix="dr-tune-") as workdir:
+        backend_list = available_backends(workdir, backends_wanted)
+
+        # defaults: what model.py did before any tuning (eager, contiguous, torch's thread defaults)
+        print("[TUNE] measuring defaults...")
+        default_bs = 1 if objective == "latency" else 16
+        defaults = run_child(dict(base_cfg, threads=0, interop=0, backends=[("eager", None)],
+                                  layouts=[False], batch_sizes=[default_bs]))[0]
+
+        rows = []
+        for threads in thread_candidates(cpus, quick):
+            for interop in sorted({1, 2} if not quick else {1}):
+                cfg = dict(base_cfg, threads=threads, interop=interop, backends=backend_list)
+                t0 = time.perf_counter()
+                try:
+                    results = run_child(cfg)
+                except Exception as e:
+                    print(f"[TUNE] threads={threads} interop={interop} failed: {e}")
+                    continue
+                for r in results:
+                    r.update(threads=threads, interop_threads=interop)
+                rows.extend(results)
+                best = max(results, key=lambda r: score(r, objective))
+                print(f"[TUNE] threads={threads:<3} interop={interop} best: {best['backend']}, "
+                      f"channels_last={best['channels_last']}, bs={best['batch_size']} -> "
+                      f"{best['images_per_sec']:.1f} img/s, {best['batch_ms']:.0f} ms/batch "
+                      f"({time.perf_counter() - t0:.0f}s)")
+    if not rows:
+        raise RuntimeError("no configuration could be measured")
+    best = max(rows, key=lambda r: score(r, objective))
+    return best, defaults, rows
+
+
+def write_profile(path, best, defaults, objective, rows):
+    profile = {
+        "machine": model.machine_fingerprint(),
+        "objective": objective,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {"threads": best["threads"], "interop_threads": best["interop_threads"],
+                     "channels_last": best["channels_last"], "batch_size": best["batch_size"],
+                     "backend": best["backend"]},
+        "measured": {"best": best, "defaults": defaults},
+        "sweep": rows,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(profile, fh, indent=2)
+    os.replace(tmp, path)
+    return profile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune threads, batch size, layout and backend for this machine")
+    parser.add_argument("--objective", choices=("throughput", "latency"), default="throughput",
+                        help="throughput: images/sec for batch scoring; latency: one image (GUI)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--backends", nargs="*", default=["torchscript", "onnxruntime"],
+                        help="backends to try besides eager")
+    parser.add_argument("--quick", action="store_true", help="fewer thread combinations")
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="timing budget per measurement")
+    parser.add_argument("--out", default=None, help="profile path (default DR_RUNTIME_PROFILE or runtime_profile.json)")
+    parser.add_argument("--dry-run", action="store_true", help="print the result without writing the profile")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    best, defaults, rows = tune(args.objective, args.batch_sizes, args.backends, args.quick, args.min_seconds)
+    if args.objective == "throughput":
+        speedup = best["images_per_sec"] / defaults["images_per_sec"]
+        detail = f"{defaults['images_per_sec']:.1f} -> {best['images_per_sec']:.1f} img/s"
+    else:
+        speedup = defaults["batch_ms"] / best["batch_ms"]
+        detail = f"{defaults['batch_ms']:.0f} -> {best['batch_ms']:.0f} ms per image"
+    print(f"[TUNE] best: threads={best['threads']} interop={best['interop_threads']} "
+          f"channels_last={best['channels_last']} batch_size={best['batch_size']} backend={best['backend']}")
+    print(f"[TUNE] {args.objective} vs defaults: {detail} ({speedup:.2f}x)")
+    if best["backend"] != "eager":
+        print(f"[TUNE] export the model for the {best['backend']} backend (export_model.py) so the profile can use it")
+    if not args.dry_run:
+        path = args.out or model.RUNTIME_PROFILE_PATH or os.path.join(settings.BASE_DIR, "runtime_profile.json")
+        write_profile(path, best, defaults, args.objective, rows)
+        print(f"[TUNE] wrote {path}; model.py applies it on the next start")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
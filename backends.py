@@ -0,0 +1,109 @@
+# backends.py
+# Exported-graph inference backends for the classifier.
+#
+#   eager        - the torchvision ResNet152 from model.py (default)
+#   torchscript  - a traced + frozen TorchScript module (export_torchscript)
+#   onnxruntime  - an ONNX model run by onnxruntime (export_onnx)
+#   int8         - a post-training quantized TorchScript module (quantize.py)
+#
+# Every backend object is called like the eager module: backend(batch) takes
+# an NCHW float tensor and returns log-probabilities as a tensor, and has an
+# eval() method, so model.inference_batch / forward_tta work unchanged.
+
+import os
+
+import torch
+
+BACKENDS = ("eager", "torchscript", "onnxruntime", "int8")
+
+
+def _example_input(batch=1):
+    return torch.zeros(batch, 3, 224, 224)
+
+
+# ----------------------------
+# Export
+# ----------------------------
+def export_torchscript(net, dst):
+    net = net.eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(net, _example_input(2))
+        # freeze folds parameters and conv+bn into constants; optimize_for_inference
+        # is not applied because its MKLDNN ops do not survive save/load
+        frozen = torch.jit.freeze(traced)
+    torch.jit.save(frozen, dst)
+    return dst
+
+
+def export_onnx(net, dst, opset=17):
+    net = net.eval()
+    kwargs = dict(input_names=["input"], output_names=["log_probs"],
+                  dynamic_axes={"input": {0: "batch"}, "log_probs": {0: "batch"}},
+                  opset_version=opset, do_constant_folding=True)
+    with torch.no_grad():
+        try:
+            # the TorchScript-based exporter handles dynamic_axes directly
+            torch.onnx.export(net, _example_input(2), dst, dynamo=False, **kwargs)
+        except TypeError:
+            torch.onnx.export(net, _example_input(2), dst, **kwargs)
+    return dst
+
+
+# ----------------------------
+# Runtime wrappers
+# ----------------------------
+def load_torchscript(path):
+    module = torch.jit.load(path, map_location="cpu")
+    module.eval()
+    return module
+
+
+def load_int8(path):
+    # the quantized kernels come from whichever engine this CPU supports
+    engines = torch.backends.quantized.supported_engines
+    for name in ("x86", "fbgemm", "qnnpack"):
+        if name in engines:
+            torch.backends.quantized.engine = name
+            break
+    return load_torchscript(path)
+
+
+class OnnxRuntimeBackend:
+    def __init__(self, path, intra_op_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("onnxruntime backend selected but onnxruntime is not installed "
+                               "(pip install onnxruntime)")
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            opts.intra_op_num_threads = int(intra_op_threads)
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def eval(self):
+        return self
+
+    def __call__(self, batch):
+        x = batch.detach().cpu().contiguous().numpy()
+        out = self.session.run(None, {self.input_name: x})[0]
+        return torch.from_numpy(out)
+
+
+def load_backend(name, path, intra_op_threads=None):
+    if name == "torchscript":
+        return load_torchscript(path)
+    if name == "int8":
+        return load_int8(path)
+    if name == "onnxruntime":
+        return OnnxRuntimeBackend(path, intra_op_threads)
+    raise ValueError("unknown backend %r (expected one of %s)" % (name, ", ".join(BACKENDS)))
+
+
+def default_artifact_path(name, checkpoint_path):
+    stem = os.path.splitext(checkpoint_path)[0]
+    if stem.endswith(".infer"):
+        stem = stem[:-len(".infer")]
+    return stem + {"torchscript": ".ts.pt", "int8": ".int8.pt"}.get(name, ".onnx")
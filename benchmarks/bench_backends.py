@@ -0,0 +1,81 @@
+# benchmarks/bench_backends.py
+# Per-image CPU latency of the eager, TorchScript and onnxruntime backends at
+# batch sizes 1, 8 and 32 (forward pass only, on pre-decoded sample images).
+#
+#   python benchmarks/bench_backends.py --random-weights
+#   python benchmarks/bench_backends.py --checkpoint classifier.pt --batch-sizes 1 8 32
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import torch
+
+import model
+import backends
+
+
+def load_batch(n):
+    files = sorted(glob.glob(os.path.join(ROOT, "sampleimages", "*")))
+    tensors = []
+    for i in range(n):
+        tensors.append(model.load_input(files[i % len(files)]))
+    return torch.stack(tensors)
+
+
+def time_forward(net, batch, repeat):
+    with torch.no_grad():
+        net(batch)
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            net(batch)
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend latency comparison")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--random-weights", action="store_true")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    eager = model.build_model() if args.random_weights or not args.checkpoint else model.load_model(args.checkpoint)
+    eager.eval()
+    workdir = tempfile.mkdtemp(prefix="dr-backends-")
+    nets = {"eager": eager}
+    ts_path = backends.export_torchscript(eager, os.path.join(workdir, "classifier.ts.pt"))
+    nets["torchscript"] = backends.load_torchscript(ts_path)
+    try:
+        onnx_path = backends.export_onnx(eager, os.path.join(workdir, "classifier.onnx"))
+        nets["onnxruntime"] = backends.OnnxRuntimeBackend(onnx_path)
+    except Exception as e:
+        print("[BENCH] onnxruntime skipped:", e)
+
+    batches = {bs: load_batch(bs) for bs in args.batch_sizes}
+    print(f"torch threads={torch.get_num_threads()}, best of {args.repeat}; ms per image")
+    print(f"{'backend':<14}" + "".join(f"{'bs=' + str(bs):>10}" for bs in args.batch_sizes) + f"{'rel diff':>12}")
+    with torch.no_grad():
+        ref = eager(batches[args.batch_sizes[0]])
+    for name, net in nets.items():
+        cells = []
+        for bs in args.batch_sizes:
+            dt = time_forward(net, batches[bs], args.repeat)
+            cells.append(f"{1000 * dt / bs:>10.1f}")
+        with torch.no_grad():
+            # relative log-prob difference: random weights give huge, saturated logits
+            diff = ((net(batches[args.batch_sizes[0]]) - ref).abs().max() / ref.abs().max().clamp(min=1)).item()
+        print(f"{name:<14}" + "".join(cells) + f"{diff:>12.1e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_batch_inference.py
+# Per-image cost of calling model.main() in a loop versus model.inference_batch()
+# at several batch sizes, on the images in sampleimages/.
+#
+#   python benchmarks/bench_batch_inference.py --random-weights
+#   python benchmarks/bench_batch_inference.py --batch-sizes 8 16 32 --images 64
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import model
+
+
+def sample_paths(n):
+    paths = sorted(glob.glob(os.path.join(ROOT, "sampleimages", "*")))
+    if not paths:
+        raise SystemExit("no images in sampleimages/")
+    return [paths[i % len(paths)] for i in range(n)]
+
+
+def timed(fn):
+    w0, c0 = time.perf_counter(), time.process_time()
+    fn()
+    return time.perf_counter() - w0, time.process_time() - c0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="main() loop vs inference_batch()")
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32])
+    parser.add_argument("--random-weights", action="store_true")
+    args = parser.parse_args()
+
+    if args.random_weights:
+        model.registry.use(model.build_model())
+    m = model.get_model()
+    paths = sample_paths(args.images)
+    # warm-up
+    model.inference_batch(paths[:2], batch_size=2, model=m)
+
+    rows = []
+    wall, cpu = timed(lambda: [model.main(p) for p in paths])
+    rows.append(("main() loop", wall, cpu))
+    for bs in args.batch_sizes:
+        wall, cpu = timed(lambda: model.inference_batch(paths, batch_size=bs, model=m))
+        rows.append((f"inference_batch bs={bs}", wall, cpu))
+
+    base = rows[0][1]
+    print(f"{len(paths)} images, torch threads={model.torch.get_num_threads()}")
+    print(f"{'mode':<26}{'ms/img wall':>12}{'ms/img cpu':>12}{'speedup':>9}")
+    for name, wall, cpu in rows:
+        print(f"{name:<26}{1000 * wall / len(paths):>12.1f}{1000 * cpu / len(paths):>12.1f}{base / wall:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
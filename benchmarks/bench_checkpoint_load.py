@@ -0,0 +1,121 @@
+# benchmarks/bench_checkpoint_load.py
+# Compare load time and peak RSS of the full training checkpoint against the
+# slim inference checkpoint (fp32, mmap) and its bf16 variant.
+#
+#   python benchmarks/bench_checkpoint_load.py --checkpoint classifier.pt
+#   python benchmarks/bench_checkpoint_load.py --random-weights
+#
+# Every format is loaded in a fresh interpreter so peak RSS is not polluted
+# by the previous run.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_CHILD = r'''
+import json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+
+def mem():
+    # VmHWM is reset on exec; ru_maxrss is not, and would include the parent
+    out = {"maxrss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(("VmHWM:", "RssAnon:", "RssFile:")):
+                    key, val = line.split(":")
+                    out[key.lower() + "_mb"] = int(val.split()[0]) / 1024.0
+    except OSError:
+        pass
+    if "vmhwm_mb" in out:
+        out["maxrss_mb"] = out["vmhwm_mb"]
+    return out
+
+import model
+before = mem()
+t0 = time.perf_counter()
+m = model.load_model(sys.argv[2])
+m.eval()
+load_s = time.perf_counter() - t0
+import torch
+with torch.no_grad():
+    m(torch.zeros(1, 3, 224, 224))
+after = mem()
+print("RESULT " + json.dumps({"load_s": load_s, "before": before, "after": after}))
+'''
+
+
+def measure(path):
+    proc = subprocess.run([sys.executable, "-c", _CHILD, ROOT, path],
+                          capture_output=True, text=True, check=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError("no result from child process:\n" + proc.stderr)
+
+
+def make_random_training_checkpoint(path):
+    # same layout as the notebook checkpoint, including the Adam moments
+    import torch
+    import model
+    m = model.freeze_layers(model.build_model())
+    _, optimizer, _ = model.build_optimizer(m)
+    for p in m.parameters():
+        if p.requires_grad:
+            p.grad = torch.zeros_like(p)
+    optimizer.step()
+    torch.save({'epoch': 0, 'model': m, 'model_state_dict': m.state_dict(),
+                'optimizer_state_dict': optimizer.state_dict(), 'loss': 0.0}, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpoint load time / RSS comparison")
+    parser.add_argument("--checkpoint", default=None, help="training checkpoint (classifier.pt)")
+    parser.add_argument("--random-weights", action="store_true", help="benchmark a random-initialised checkpoint")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", default=None, help="write results to this file")
+    args = parser.parse_args()
+
+    import model
+    workdir = tempfile.mkdtemp(prefix="dr-ckpt-")
+    src = args.checkpoint or model.DEFAULT_MODEL_PATH
+    if args.random_weights or not os.path.exists(src):
+        src = os.path.join(workdir, "classifier.pt")
+        print("Creating random-weight training checkpoint:", src)
+        make_random_training_checkpoint(src)
+    slim = model.export_inference_checkpoint(src, os.path.join(workdir, "classifier.infer.pt"))
+    slim_bf16 = model.export_inference_checkpoint(src, os.path.join(workdir, "classifier.infer-bf16.pt"), dtype="bf16")
+
+    results = {}
+    for name, path in (("training", src), ("slim-fp32-mmap", slim), ("slim-bf16", slim_bf16)):
+        runs = [measure(path) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["load_s"])
+        results[name] = {
+            "file_mb": os.path.getsize(path) / 1e6,
+            "load_s": best["load_s"],
+            "peak_rss_mb": max(r["after"]["maxrss_mb"] for r in runs),
+            "rss_delta_mb": best["after"]["maxrss_mb"] - best["before"]["maxrss_mb"],
+            "rss_anon_mb": best["after"].get("rssanon_mb"),
+            "rss_file_mb": best["after"].get("rssfile_mb"),
+        }
+
+    print(f"{'format':<16}{'file MB':>9}{'load s':>9}{'peak RSS MB':>13}{'RSS +MB':>9}{'anon MB':>9}{'file MB':>9}")
+    for name, r in results.items():
+        anon = "-" if r["rss_anon_mb"] is None else "%.0f" % r["rss_anon_mb"]
+        fmb = "-" if r["rss_file_mb"] is None else "%.0f" % r["rss_file_mb"]
+        print(f"{name:<16}{r['file_mb']:>9.1f}{r['load_s']:>9.3f}{r['peak_rss_mb']:>13.0f}{r['rss_delta_mb']:>9.0f}{anon:>9}{fmb:>9}")
+    print("anon = private memory; file = page-cache pages shared with other processes mapping the same file")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
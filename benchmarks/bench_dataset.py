@@ -0,0 +1,95 @@
+# benchmarks/bench_dataset.py
+# Epoch wall time of the notebook loader (CreateDataset: full-size PNG decode +
+# ToPILImage + Resize every epoch) against MemmapDataset (decoded once by
+# dataset.build_memmap), through the same DataLoader settings.
+#
+#   python benchmarks/bench_dataset.py --images 400 --workers 2 --epochs 2
+#
+# The training set is APTOS-like: the sample images upscaled to full-size PNGs
+# (--short-side) in a temp dir, repeated to --images files.
+
+import argparse
+import csv
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image
+from torch.utils.data import DataLoader
+
+import dataset
+
+
+def make_training_set(dst, n, short_side):
+    sources = []
+    for i, path in enumerate(sorted(glob.glob(os.path.join(ROOT, "sampleimages", "*")))):
+        with Image.open(path) as im:
+            im = im.convert("RGB")
+            scale = short_side / float(min(im.size))
+            im = im.resize((int(im.width * scale), int(im.height * scale)), Image.BICUBIC)
+            out = os.path.join(dst, "src%02d.png" % i)
+            im.save(out)
+            sources.append(out)
+    images = os.path.join(dst, "train_images")
+    os.makedirs(images)
+    with open(os.path.join(dst, "train.csv"), "w", newline="") as fh:
+        w = csv.writer(fh)
+        w.writerow(["id_code", "diagnosis"])
+        for i in range(n):
+            name = "img%05d" % i
+            shutil.copyfile(sources[i % len(sources)], os.path.join(images, name + ".png"))
+            w.writerow([name, i % 5])
+    return os.path.join(dst, "train.csv"), images
+
+
+def time_epochs(ds, epochs, batch_size, workers):
+    loader = DataLoader(ds, batch_size=batch_size, shuffle=True, num_workers=workers,
+                        persistent_workers=workers > 0)
+    times = []
+    for _ in range(epochs):
+        t0 = time.perf_counter()
+        for images, labels in loader:
+            pass
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Training dataset epoch time")
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--short-side", type=int, default=1736, help="APTOS train images are ~2416x1736")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--epochs", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="dr-dataset-") as tmp:
+        print(f"[BENCH] writing {args.images} full-size PNGs...")
+        csv_path, image_dir = make_training_set(tmp, args.images, args.short_side)
+
+        rows = dataset.read_rows(csv_path)
+        old = time_epochs(dataset.CreateDataset(rows, image_dir, dataset.train_transforms),
+                          args.epochs, args.batch_size, args.workers)
+
+        t0 = time.perf_counter()
+        dataset.build_memmap(csv_path, image_dir, os.path.join(tmp, "mm"))
+        build = time.perf_counter() - t0
+        new = time_epochs(dataset.MemmapDataset(os.path.join(tmp, "mm"), flip_p=0.4),
+                          args.epochs, args.batch_size, args.workers)
+
+    print(f"{args.images} images, batch {args.batch_size}, {args.workers} workers; seconds per epoch")
+    print(f"{'CreateDataset':<16}" + "".join(f"{t:>9.2f}" for t in old))
+    print(f"{'MemmapDataset':<16}" + "".join(f"{t:>9.2f}" for t in new) + f"   (one-off build {build:.2f}s)")
+    per_epoch_saved = sum(old) / len(old) - sum(new) / len(new)
+    print(f"speedup {sum(old) / max(sum(new), 1e-9):.1f}x per epoch; "
+          f"build pays for itself after {build / max(per_epoch_saved, 1e-9):.2f} epochs")
+
+
+if __name__ == '__main__':
+    main()
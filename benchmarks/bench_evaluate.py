@@ -0,0 +1,90 @@
+# benchmarks/bench_evaluate.py
+# Metric time on APTOS-sized cached outputs (3662 images by default):
+# the notebook style (Python-loop round_off_preds, per-element kappa) against
+# evaluate.py's vectorized metrics and the full threshold search.
+#
+#   python benchmarks/bench_evaluate.py --images 3662
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+import evaluate
+
+
+def notebook_round_off_preds(preds, coef=[0.5, 1.5, 2.5, 3.5]):
+    for i, pred in enumerate(preds):
+        if pred < coef[0]:
+            preds[i] = 0
+        elif pred >= coef[0] and pred < coef[1]:
+            preds[i] = 1
+        elif pred >= coef[1] and pred < coef[2]:
+            preds[i] = 2
+        elif pred >= coef[2] and pred < coef[3]:
+            preds[i] = 3
+        else:
+            preds[i] = 4
+    return preds
+
+
+def loop_qwk(y_true, y_pred, n=5):
+    # the textbook per-element formulation
+    observed = [[0] * n for _ in range(n)]
+    for a, b in zip(y_true, y_pred):
+        observed[a][b] += 1
+    hist_a = [sum(observed[i]) for i in range(n)]
+    hist_b = [sum(observed[i][j] for i in range(n)) for j in range(n)]
+    total = float(len(y_true))
+    num = den = 0.0
+    for i in range(n):
+        for j in range(n):
+            w = (i - j) ** 2 / float((n - 1) ** 2)
+            num += w * observed[i][j]
+            den += w * hist_a[i] * hist_b[j] / total
+    return 1.0 - num / den
+
+
+def synthetic(n, seed=0):
+    rng = np.random.RandomState(seed)
+    labels = rng.choice(5, size=n, p=[0.49, 0.10, 0.27, 0.05, 0.09])
+    logits = rng.normal(size=(n, 5)) + 3.0 * np.eye(5)[labels] * (rng.rand(n, 1) < 0.8)
+    log_probs = logits - np.log(np.exp(logits).sum(axis=1, keepdims=True))
+    return labels, log_probs.astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluation metric speed")
+    parser.add_argument("--images", type=int, default=3662)
+    args = parser.parse_args()
+
+    labels, log_probs = synthetic(args.images)
+    scores = evaluate.expected_grade(log_probs)
+
+    t0 = time.perf_counter()
+    preds = notebook_round_off_preds(scores.tolist())
+    q_loop = loop_qwk(labels.tolist(), [int(p) for p in preds])
+    loop_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    q_vec = evaluate.quadratic_weighted_kappa(labels, evaluate.round_off_preds(scores))
+    vec_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    thresholds, q_best = evaluate.optimize_thresholds(scores, labels)
+    search_s = time.perf_counter() - t0
+
+    print(f"{args.images} images")
+    print(f"notebook loop        {1000 * loop_s:>9.2f} ms   QWK {q_loop:.6f}")
+    print(f"vectorized           {1000 * vec_s:>9.2f} ms   QWK {q_vec:.6f}   ({loop_s / vec_s:.0f}x)")
+    print(f"threshold search     {1000 * search_s:>9.2f} ms   QWK {q_best:.6f}   thresholds "
+          + ", ".join(f"{t:.3f}" for t in thresholds))
+
+
+if __name__ == '__main__':
+    main()
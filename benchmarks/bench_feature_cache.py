@@ -0,0 +1,89 @@
+# benchmarks/bench_feature_cache.py
+# Seconds per fine-tuning epoch: the notebook setup (full forward/backward with
+# conv1/bn1/layer1 frozen) against training layer2..fc from the cached stem
+# activations (tail mode) and training only fc from cached pooled features
+# (head mode), plus the one-off cache build times.
+#
+#   python benchmarks/bench_feature_cache.py --images 32 --batch-size 8
+
+import argparse
+import csv
+import glob
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import torch
+from torch import nn
+from torch.utils.data import DataLoader
+
+import model
+import dataset
+import feature_cache
+
+
+def make_dataset(dst, n):
+    files = sorted(glob.glob(os.path.join(ROOT, "sampleimages", "*")))
+    csv_path = os.path.join(dst, "train.csv")
+    with open(csv_path, "w", newline="") as fh:
+        w = csv.writer(fh)
+        w.writerow(["id_code", "diagnosis"])
+        for i in range(n):
+            w.writerow([os.path.basename(files[i % len(files)]), i % 5])
+    dataset.build_memmap(csv_path, os.path.join(ROOT, "sampleimages"), os.path.join(dst, "data"))
+    return os.path.join(dst, "data")
+
+
+def full_epoch(net, data_root, batch_size):
+    model.freeze_layers(net)
+    net.train()
+    criterion, optimizer, _ = model.build_optimizer(net)
+    loader = DataLoader(dataset.MemmapDataset(data_root, flip_p=0.4), batch_size=batch_size, shuffle=True)
+    t0 = time.perf_counter()
+    for images, labels in loader:
+        images, labels = images.to(model.device), labels.to(model.device)
+        optimizer.zero_grad()
+        loss = criterion(net(images), labels)
+        loss.backward()
+        optimizer.step()
+    return time.perf_counter() - t0
+
+
+def cached_epoch(net, cache_dir, mode, batch_size):
+    part = feature_cache.trainable_part(net, mode)
+    optimizer = torch.optim.Adam([p for p in part.parameters() if p.requires_grad], lr=1e-6)
+    loader = DataLoader(feature_cache.CachedFeatureDataset(cache_dir, flip_p=0.4), batch_size=batch_size, shuffle=True)
+    t0 = time.perf_counter()
+    feature_cache.run_epoch(part, loader, nn.NLLLoss(), optimizer)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feature-cache fine-tuning epoch time")
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    net = model.build_model().to(model.device)
+    with tempfile.TemporaryDirectory(prefix="dr-featcache-") as tmp:
+        data_root = make_dataset(tmp, args.images)
+        full = full_epoch(net, data_root, args.batch_size)
+        results = {}
+        for mode in ("tail", "head"):
+            cache_dir = os.path.join(tmp, mode)
+            build = feature_cache.build_cache(net, data_root, cache_dir, mode, batch_size=args.batch_size)["build_seconds"]
+            results[mode] = (build, cached_epoch(net, cache_dir, mode, args.batch_size))
+
+    print(f"{args.images} images, batch {args.batch_size}, torch threads={torch.get_num_threads()}")
+    print(f"{'mode':<22}{'s/epoch':>9}{'saved/epoch':>13}{'cache build':>13}")
+    print(f"{'full (notebook)':<22}{full:>9.2f}{'':>13}{'':>13}")
+    for mode, (build, epoch) in results.items():
+        print(f"{mode + ' (cached)':<22}{epoch:>9.2f}{full - epoch:>13.2f}{build:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
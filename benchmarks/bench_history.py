@@ -0,0 +1,141 @@
+# benchmarks/bench_history.py
+# Diagnosis history queries on a large synthetic history, on a temporary
+# SQLite copy of app_data.db:
+#   - timeline: one patient's rows through the (patient_id, created_at) index,
+#     against the same query forced to scan the table
+#   - progression: the report over the last N months from patient_progress
+#     (one index range + one probe per patient tested in the window), against
+#     computing it from the whole history with window functions; both must
+#     return the same patients
+#   - save: storage.save_diagnosis, which now also updates patient_progress
+#
+#   python benchmarks/bench_history.py --patients 100000 --history 2000000
+
+import argparse
+import datetime
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import history
+import migrations
+import storage
+
+# model.classes (not imported: it would load torch)
+LABELS = ['No DR', 'Mild', 'Moderate', 'Severe', 'Proliferative DR']
+
+# the report computed from every history row (what the summary table avoids)
+SCAN_PROGRESSION = """
+    WITH ranked AS (
+        SELECT patient_id, CAST(diagnosis AS INTEGER) AS c, created_at >= :since AS inside,
+               ROW_NUMBER() OVER (PARTITION BY patient_id, created_at >= :since ORDER BY created_at DESC, id DESC) AS from_end,
+               ROW_NUMBER() OVER (PARTITION BY patient_id, created_at >= :since ORDER BY created_at, id) AS from_start
+        FROM records WHERE diagnosis GLOB '[0-9]*')
+    SELECT patient_id,
+           COALESCE(MAX(CASE WHEN NOT inside AND from_end = 1 THEN c END),
+                    MAX(CASE WHEN inside AND from_start = 1 THEN c END)) AS baseline,
+           MAX(CASE WHEN inside AND from_end = 1 THEN c END) AS current
+    FROM ranked GROUP BY patient_id HAVING current > baseline"""
+
+SCAN_TIMELINE = """
+    SELECT created_at, diagnosis, diagnosis_class, filename FROM records NOT INDEXED
+    WHERE patient_id = ? ORDER BY created_at, id"""
+
+
+def seed(db, patients, rows, days):
+    db.add_user("bench", "")
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO patients (user_id, name, age, gender, contact, notes) "
+            "VALUES ((SELECT id FROM users WHERE username = 'bench'), ?, 50, 'F', '', '')",
+            (("patient %d" % i,) for i in range(patients)))
+        ids = [row[0] for row in conn.execute("SELECT id FROM patients ORDER BY id")]
+    rnd = random.Random(0)
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+    def visits(patient_id):
+        cls = rnd.choice((0, 0, 0, 1, 2))
+        times = sorted(rnd.random() * days for _ in range(max(1, int(rnd.expovariate(patients / rows)))))
+        for t in times:
+            # mostly stable, drifting upwards more often than down
+            cls = min(4, max(0, cls + rnd.choices((0, 1, -1), (85, 10, 5))[0]))
+            at = (now - datetime.timedelta(days=days - t)).strftime("%Y-%m-%d %H:%M:%S.%f")[:23]
+            # as the app saves it: the class number in diagnosis, its label in diagnosis_class
+            yield patient_id, str(cls), LABELS[cls], "eye.png", at
+
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO records (patient_id, diagnosis, diagnosis_class, filename, created_at) "
+                         "VALUES (?, ?, ?, ?, ?)", (row for pid in ids for row in visits(pid)))
+        total = conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+    return ids, total
+
+
+def timed(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return 1000 * statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnosis history: timeline, progression report and save cost (SQLite)")
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--history", type=int, default=2000000, help="approximate number of history rows")
+    parser.add_argument("--days", type=int, default=3 * 365, help="history spans this many days")
+    parser.add_argument("--months", type=int, nargs="+", default=[1, 6, 12])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="dr-history-")
+    try:
+        path = os.path.join(tmp, "app_data.db")
+        shutil.copy(os.path.join(ROOT, "app_data.db"), path)
+        db = storage.Storage(storage.SQLiteBackend(path))
+        # history first, then the migration that builds patient_progress from it
+        migrations.migrate(db, target=4)
+        t0 = time.perf_counter()
+        ids, total = seed(db, args.patients, args.history, args.days)
+        seeded = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        migrations.migrate(db)
+        backfill = time.perf_counter() - t0
+        print(f"{args.patients} patients, {total} history rows (seeded in {seeded:.0f}s, "
+              f"patient_progress backfilled in {backfill:.1f}s)")
+
+        print(f"{'query':<34}{'rows':>8}{'indexed ms':>12}{'scan ms':>10}")
+        sample = random.Random(1).sample(ids, args.repeat)
+        picks = iter(sample * 2)
+        ms, rows = timed(lambda: db.patient_history(next(picks)), args.repeat)
+        with db.transaction() as conn:
+            scan_ms, _ = timed(lambda: conn.execute(SCAN_TIMELINE, (next(picks),)).fetchall(), 1)
+        print(f"{'timeline (one patient)':<34}{len(rows):>8}{ms:>12.2f}{scan_ms:>10.0f}")
+
+        for months in args.months:
+            since = history.months_before(db.now(), months)
+            ms, rows = timed(lambda: db.progression(None, since, limit=10 ** 9), args.repeat)
+            with db.transaction() as conn:
+                scan_ms, scanned = timed(lambda: conn.execute(SCAN_PROGRESSION, {"since": since}).fetchall(), 1)
+            assert sorted(r[0] for r in rows) == sorted(r[0] for r in scanned), "summary and scan disagree"
+            ms_page, _ = timed(lambda: db.progression(None, since), args.repeat)
+            print(f"{'progression, %d months' % months:<34}{len(rows):>8}{ms:>12.1f}{scan_ms:>10.0f}")
+            print(f"{'  first 500 of them':<34}{min(500, len(rows)):>8}{ms_page:>12.1f}")
+
+        saves = iter(sample * 20)
+        ms, _ = timed(lambda: db.save_diagnosis(next(saves), "bench", 2, LABELS[2], "eye.png"), args.repeat * 4)
+        print(f"{'save_diagnosis (with summary)':<34}{1:>8}{ms:>12.2f}")
+        db.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_login.py
+# Login cost as the number of accounts grows, on a temporary SQLite copy of
+# app_data.db:
+#   - scan: the old handle_login (SELECT every user, compare in Python)
+#   - lookup: storage.get_credentials (unique-index probe, one row)
+#   - check_login: lookup + PBKDF2 verification (what a login costs now)
+#
+#   python benchmarks/bench_login.py --users 1000 10000 100000
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import auth
+import migrations
+import storage
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return 1000 * statistics.median(times)
+
+
+def grow(db, start, stop, stored_hash):
+    # every synthetic account shares one hash: seeding 100k real hashes would take hours
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO users (username, password_hash, password) VALUES (?, ?, ?)",
+                         (("user%07d" % i, stored_hash, "pw%d" % i) for i in range(start, stop)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login latency vs number of users (SQLite)")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="dr-login-")
+    try:
+        path = os.path.join(tmp, "app_data.db")
+        shutil.copy(os.path.join(ROOT, "app_data.db"), path)
+        db = storage.Storage(storage.SQLiteBackend(path))
+        migrations.migrate(db)
+        stored_hash = auth.hash_password("secret")
+        print(f"PBKDF2 iterations: {auth.ITERATIONS}")
+        print(f"{'users':>8}{'scan ms':>10}{'lookup ms':>11}{'check_login ms':>16}")
+        have = 0
+        for n in sorted(args.users):
+            grow(db, have, n, stored_hash)
+            have = n
+            target = "user%07d" % (n // 2)
+
+            def scan():
+                with db.transaction() as conn:
+                    rows = conn.execute("SELECT username, password FROM users").fetchall()
+                return any(r[0] == target and r[1] == "pw%d" % (n // 2) for r in rows)
+
+            def lookup():
+                return db.get_credentials(target)
+
+            def login():
+                assert auth.check_login(db, target, "secret")
+
+            print(f"{n:>8}{median_ms(scan, args.repeat):>10.2f}{median_ms(lookup, args.repeat):>11.3f}"
+                  f"{median_ms(login, args.repeat):>16.1f}")
+        db.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+# benchmarks/bench_metrics.py
+# Per-call overhead of the metrics hooks, disabled (the default) and enabled,
+# against calling the function directly.
+#
+#   python benchmarks/bench_metrics.py --calls 200000
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import metrics
+
+
+def work():
+    return None
+
+
+def per_call_ns(fn, calls):
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return 1e9 * (time.perf_counter() - t0) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metrics hook overhead")
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    decorated = metrics.timed("bench")(work)
+
+    def with_timer():
+        with metrics.timer("bench"):
+            return work()
+
+    rows = [("plain call", per_call_ns(work, args.calls))]
+    for enabled in (False, True):
+        metrics.enable(enabled)
+        state = "on" if enabled else "off"
+        rows.append((f"@timed, metrics {state}", per_call_ns(decorated, args.calls)))
+        rows.append((f"timer(), metrics {state}", per_call_ns(with_timer, args.calls)))
+    metrics.enable(False)
+    for label, ns in rows:
+        print(f"{label:<26}{ns:>9.0f} ns/call{ns - rows[0][1]:>9.0f} ns overhead")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/bench_patient_list.py
+# What it costs to show the patient list screen with a lot of patients, on a
+# temporary SQLite copy of app_data.db:
+#   - full list: the old refresh (storage.list_patients, every row)
+#   - first page: PatientListModel.reset (visible rows + one prefetch page)
+#   - next page: one more keyset page from deep in the list
+#   - scrolling: PatientListModel.load_more / load_previous once the window
+#     of pages is full (each page evicts one from the other end), and the
+#     most rows held while scrolling through the whole list and back
+#   - search: prefix search on name and on contact, first page
+#   - refresh: incremental refresh after a few edits / one delete
+#
+#   python benchmarks/bench_patient_list.py --patients 100000
+#
+# Times are database + Python only; inserting rows into the Tk Treeview adds
+# roughly the same per-row cost on top, which is why fewer rows matter.
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import migrations
+import patient_list
+import storage
+
+FIRST = ["Anita", "Arjun", "Bala", "Deepa", "Kavya", "Mohan", "Priya", "Ravi", "Sita", "Vikram"]
+LAST = ["Iyer", "Kumar", "Nair", "Patel", "Rao", "Reddy", "Shah", "Singh"]
+
+
+def seed(db, patients):
+    db.add_user("bench", "")
+    rnd = random.Random(0)
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO patients (user_id, name, age, gender, contact, notes, updated_at) "
+            "VALUES ((SELECT id FROM users WHERE username = 'bench'), ?, ?, 'F', ?, '', "
+            "strftime('%Y-%m-%d %H:%M:%f', 'now', '-1 day'))",
+            [("%s %s %d" % (rnd.choice(FIRST), rnd.choice(LAST), i), 20 + i % 60, "9%09d" % rnd.randrange(10 ** 9))
+             for i in range(patients)])
+
+
+def median_ms(fn, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return 1000 * statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Patient list screen: full load vs paging, search and refresh (SQLite)")
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--visible", type=int, default=25, help="rows on screen")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="dr-patients-")
+    try:
+        path = os.path.join(tmp, "app_data.db")
+        shutil.copy(os.path.join(ROOT, "app_data.db"), path)
+        db = storage.Storage(storage.SQLiteBackend(path))
+        migrations.migrate(db)
+        seed(db, args.patients)
+        first = args.visible + patient_list.PAGE_SIZE
+        model = patient_list.PatientListModel(db, "bench")
+        ids = [row[0] for row in db.patients_page("bench", 0, args.patients)]
+        middle = ids[len(ids) // 2]
+        edits = iter(range(10 ** 6))
+
+        def edit():
+            model.reset(count=first)
+            for pid in random.sample(ids[2:first], 5):
+                db.update_patient(pid, "Edited %d" % next(edits), 40, "F", "9000000000", "")
+            victim = ids.pop(1)
+            db.delete_patient(victim)
+
+        rows = [
+            ("full list (old)", len(db.list_patients("bench")), median_ms(lambda: db.list_patients("bench"), args.repeat)),
+            ("first page", len(model.reset(count=first)), median_ms(lambda: model.reset(count=first), args.repeat)),
+            ("next page (deep)", patient_list.PAGE_SIZE,
+             median_ms(lambda: db.patients_page("bench", middle, patient_list.PAGE_SIZE), args.repeat)),
+            ("search name 'Priya R'", len(model.reset("Priya R", count=first)),
+             median_ms(lambda: model.reset("Priya R", count=first), args.repeat)),
+            ("search contact '912'", len(model.reset("912", count=first)),
+             median_ms(lambda: model.reset("912", count=first), args.repeat)),
+        ]
+        # through the whole list and back: the window never grows past max_rows
+        model.reset(count=first)
+        held = len(model.rows)
+        while not model.exhausted:
+            model.load_more()
+            held = max(held, len(model.rows))
+        while not model.at_start:
+            model.load_previous()
+            held = max(held, len(model.rows))
+        for _ in range(2 * patient_list.WINDOW_PAGES):
+            model.load_more()
+        rows.append(("next page, window full", patient_list.PAGE_SIZE, median_ms(model.load_more, args.repeat)))
+        rows.append(("previous page, window full", patient_list.PAGE_SIZE,
+                     median_ms(model.load_previous, args.repeat)))
+
+        model.reset(count=first)
+        ops = []
+        rows.append(("refresh, 5 edits + 1 delete", 6,
+                     median_ms(lambda: ops.append(model.refresh()), args.repeat, setup=edit)))
+        rows.append(("refresh, nothing changed", 0, median_ms(model.refresh, args.repeat)))
+        assert all(len(o) == 6 for o in ops), ops
+
+        print(f"{args.patients} patients, first page = {args.visible} visible + {patient_list.PAGE_SIZE} prefetch")
+        print(f"{'query':<30}{'rows':>8}{'ms':>10}")
+        for label, count, ms in rows:
+            print(f"{label:<30}{count:>8}{ms:>10.2f}")
+        print(f"most rows held scrolling through all {len(ids)} and back: {held} (window {model.max_rows})")
+        db.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
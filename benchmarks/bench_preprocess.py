@@ -0,0 +1,165 @@
+# benchmarks/bench_preprocess.py
+# Decode + preprocess time and peak memory per image: the original path
+# (full-resolution Image.open().convert('RGB') + Resize((224,224))) against
+# preprocessing.load_fundus (draft/reduce decode, border crop, one resize),
+# plus the UI preview (full decode + thumbnail vs load_preview).
+#
+#   python benchmarks/bench_preprocess.py [--images DIR] [--repeat 3]
+#   python benchmarks/bench_preprocess.py --agreement [--random-weights]
+#
+# --agreement runs the model (DR_MODEL_PATH, or an untrained one with
+# --random-weights) on every image decoded the original way and through
+# load_fundus with and without the border crop, and reports how often the
+# predicted class matches the original path and the largest probability
+# change. Check it before turning DR_CROP_BORDER on.
+#
+# The bundled sample images are small web copies, so a second set is made by
+# upscaling them to retinal-camera size (--camera-size, JPEG) in a temp dir.
+#
+# Each method runs in a fresh interpreter and peak memory is the growth of
+# VmHWM (Linux) over the process baseline, so the methods do not pollute
+# each other.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = r'''
+import glob, json, os, sys, time
+sys.path.insert(0, sys.argv[1])
+from PIL import Image
+import model, preprocessing
+
+def hwm_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def baseline(p):
+    with Image.open(p) as im:
+        return model.test_transforms(im.convert("RGB"))
+
+def fast(p):
+    return model.load_input(p)
+
+def preview_baseline(p):
+    im = Image.open(p)
+    im.thumbnail((320, 320))
+    return im
+
+def preview_fast(p):
+    return preprocessing.load_preview(p, (320, 320))
+
+fn = globals()[sys.argv[2]]
+paths = sorted(glob.glob(os.path.join(sys.argv[3], "*")))
+repeat = int(sys.argv[4])
+fn(paths[0])
+before = hwm_mb()
+t0 = time.perf_counter()
+for _ in range(repeat):
+    for p in paths:
+        fn(p)
+dt = time.perf_counter() - t0
+print("RESULT " + json.dumps({"ms_per_image": 1000 * dt / (repeat * len(paths)),
+                              "peak_mb": hwm_mb() - before, "images": len(paths)}))
+'''
+
+
+def run(method, images, repeat):
+    proc = subprocess.run([sys.executable, "-c", _CHILD, ROOT, method, images, str(repeat)],
+                          capture_output=True, text=True, check=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(proc.stderr)
+
+
+def make_camera_set(images, dst, short_side):
+    from PIL import Image
+    for name in sorted(os.listdir(images)):
+        with Image.open(os.path.join(images, name)) as im:
+            im = im.convert("RGB")
+            scale = short_side / float(min(im.size))
+            im = im.resize((int(im.width * scale), int(im.height * scale)), Image.BICUBIC)
+            im.save(os.path.join(dst, os.path.splitext(name)[0] + ".jpg"), quality=92)
+    return dst
+
+
+def report(title, images, repeat):
+    print(f"\n{title}")
+    print(f"{'method':<20}{'ms/img':>9}{'peak +MB':>10}")
+    rows = {}
+    for method in ("baseline", "fast", "preview_baseline", "preview_fast"):
+        r = run(method, images, repeat)
+        rows[method] = r
+        print(f"{method:<20}{r['ms_per_image']:>9.2f}{r['peak_mb']:>10.1f}")
+    print(f"model input speedup: {rows['baseline']['ms_per_image'] / rows['fast']['ms_per_image']:.2f}x, "
+          f"preview speedup: {rows['preview_baseline']['ms_per_image'] / rows['preview_fast']['ms_per_image']:.2f}x")
+
+
+def agreement(images, random_weights=False):
+    sys.path.insert(0, ROOT)
+    import torch
+    from PIL import Image
+    import model
+    import preprocessing
+
+    net = model.build_model() if random_weights else model.get_model()
+    net = net.to(model.device).eval()
+    paths = sorted(os.path.join(images, name) for name in os.listdir(images))
+
+    def original(p):
+        with Image.open(p) as im:
+            return model.test_transforms(im.convert("RGB"))
+
+    def fundus(crop):
+        return lambda p: model.tensor_transforms(preprocessing.load_fundus(p, model.INPUT_SIZE, crop))
+
+    def probs(decode):
+        with torch.no_grad():
+            return torch.exp(net(torch.stack([decode(p) for p in paths]).to(model.device))).cpu()
+
+    ref = probs(original)
+    print(f"\nagreement with the original decode path ({len(paths)} images"
+          f"{', random weights' if random_weights else ''})")
+    print(f"{'decode':<20}{'same class':>11}{'max |dp|':>10}")
+    for label, decode in (("load_fundus", fundus(False)), ("load_fundus + crop", fundus(True))):
+        p = probs(decode)
+        same = (p.argmax(1) == ref.argmax(1)).float().mean().item()
+        print(f"{label:<20}{100 * same:>10.0f}%{(p - ref).abs().max().item():>10.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode + preprocess benchmark")
+    parser.add_argument("--images", default=os.path.join(ROOT, "sampleimages"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--camera-size", type=int, default=2000,
+                        help="short side of the generated camera-size JPEGs (0 to skip)")
+    parser.add_argument("--agreement", action="store_true",
+                        help="compare model predictions across decode paths instead of timing them")
+    parser.add_argument("--random-weights", action="store_true", help="with --agreement: untrained model (testing)")
+    args = parser.parse_args()
+
+    if args.agreement:
+        agreement(args.images, args.random_weights)
+        return
+
+    report(f"{args.images}", args.images, args.repeat)
+    if args.camera_size:
+        with tempfile.TemporaryDirectory(prefix="dr-camera-") as tmp:
+            make_camera_set(args.images, tmp, args.camera_size)
+            report(f"camera-size JPEG (short side {args.camera_size}px)", tmp, args.repeat)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_storage.py
+# The storage layer on SQLite: a "UI" thread reading the patient list while
+# diagnosis workers save results, with one shared connection behind a lock
+# (how the app used its single global cursor) versus the connection pool.
+# Runs on a temporary copy of app_data.db, so nothing real is touched.
+#
+#   python benchmarks/bench_storage.py --patients 2000 --workers 4 --seconds 5
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import migrations
+import storage
+
+
+def seed(db, patients):
+    db.add_user("bench", "")
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO patients (user_id, name, age, gender, contact, notes) "
+            "VALUES ((SELECT id FROM users WHERE username = 'bench'), ?, ?, 'F', '555', '')",
+            [("patient %d" % i, 20 + i % 60) for i in range(patients)])
+
+
+def run(db, workers, seconds, ids, interval):
+    stop = threading.Event()
+    writes = [0] * workers
+
+    def writer(k):
+        n = 0
+        while not stop.is_set():
+            db.save_diagnosis(ids[n % len(ids)], "bench", "Mild", "1", "eye.png")
+            n += 1
+            stop.wait(interval)
+        writes[k] = n
+
+    threads = [threading.Thread(target=writer, args=(k,)) for k in range(workers)]
+    for t in threads:
+        t.start()
+    reads = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        db.list_patients("bench")
+        reads.append(time.perf_counter() - t0)
+    stop.set()
+    for t in threads:
+        t.join()
+    return reads, sum(writes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage layer under concurrent reads and writes (SQLite)")
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4, help="threads saving diagnoses")
+    parser.add_argument("--interval", type=float, default=0.01, help="pause between a worker's saves")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="dr-storage-")
+    try:
+        path = os.path.join(tmp, "app_data.db")
+        shutil.copy(os.path.join(ROOT, "app_data.db"), path)
+        setup = storage.Storage(storage.SQLiteBackend(path))
+        migrations.migrate(setup)
+        seed(setup, args.patients)
+        ids = [row[0] for row in setup.list_patients("bench")]
+        setup.close()
+
+        print(f"{args.patients} patients, {args.workers} writer threads, {args.seconds:.0f}s per run")
+        print(f"{'mode':<24}{'list p50 ms':>12}{'list p95 ms':>12}{'reads/s':>10}{'writes/s':>10}")
+        for label, pool_size in (("shared connection", 1), ("pool", args.workers + 1)):
+            db = storage.Storage(storage.SQLiteBackend(path), pool_size=pool_size)
+            reads, writes = run(db, args.workers, args.seconds, ids, args.interval)
+            db.close()
+            ms = sorted(1000 * r for r in reads)
+            print(f"{label:<24}{statistics.median(ms):>12.2f}{ms[int(0.95 * (len(ms) - 1))]:>12.2f}"
+                  f"{len(reads) / args.seconds:>10.0f}{writes / args.seconds:>10.0f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
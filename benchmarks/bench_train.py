@@ -0,0 +1,89 @@
+# benchmarks/bench_train.py
+# Training throughput (samples/sec) of the training.ipynb loop against
+# train.run_epoch (worker DataLoaders, channels_last, bf16 autocast where
+# supported, on-device metrics) on the synthetic dataset.
+#
+#   python benchmarks/bench_train.py --images 64 --batch-size 16
+#   python benchmarks/bench_train.py --images 32 --image-size 128 --workers 2
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import torch
+from torch.utils.data import DataLoader
+
+import model
+import dataset
+import train
+
+
+def notebook_epoch(net, data, batch_size):
+    # the train_and_test inner loop: default DataLoader, .item() every batch
+    net = net.to(memory_format=torch.contiguous_format)
+    model.freeze_layers(net)
+    criterion, optimizer, _ = model.build_optimizer(net)
+    trainloader = DataLoader(data, batch_size=batch_size, shuffle=True)
+    net.train()
+    running_loss = 0
+    accuracy = 0
+    t0 = time.perf_counter()
+    for images, labels in trainloader:
+        images, labels = images.to(model.device), labels.to(model.device)
+        optimizer.zero_grad()
+        outputs = net(images)
+        loss = criterion(outputs, labels)
+        loss.backward()
+        optimizer.step()
+        running_loss += loss.item()
+        top_p, top_class = torch.exp(outputs).topk(1, dim=1)
+        equals = top_class == labels.view(*top_class.shape)
+        accuracy += torch.mean(equals.type(torch.FloatTensor))
+    return len(data) / (time.perf_counter() - t0)
+
+
+def new_epoch(net, data, batch_size, workers, amp, channels_last):
+    model.freeze_layers(net)
+    criterion, optimizer, _ = model.build_optimizer(net)
+    if channels_last:
+        net = net.to(memory_format=torch.channels_last)
+    loader, _ = train.make_loaders(data, 0.0, batch_size, workers)
+    dtype = train.amp_dtype(amp)
+    train.run_epoch(net, loader, criterion, optimizer, dtype, channels_last)  # workers start, warm-up
+    t0 = time.perf_counter()
+    _, _, n = train.run_epoch(net, loader, criterion, optimizer, dtype, channels_last)
+    return n / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Training loop throughput")
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--image-size", type=int, default=224)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    data = dataset.SyntheticDataset(args.images, args.image_size)
+    net = model.build_model().to(model.device)
+    notebook_epoch(net, data, args.batch_size)  # warm-up
+    rows = [("notebook loop", notebook_epoch(net, data, args.batch_size))]
+    for label, amp, cl in (("train.py fp32", "off", False),
+                           ("train.py fp32 + channels_last", "off", True),
+                           ("train.py bf16 + channels_last", "auto", True)):
+        if amp == "auto" and train.amp_dtype("auto") is None:
+            continue
+        rows.append((label, new_epoch(net, data, args.batch_size, args.workers, amp, cl)))
+
+    print(f"{args.images} x {args.image_size}px synthetic images, batch {args.batch_size}, "
+          f"{args.workers} workers, torch threads={torch.get_num_threads()}")
+    base = rows[0][1]
+    for label, rate in rows:
+        print(f"{label:<32}{rate:>8.2f} samples/s{rate / base:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/bench_tta.py
+# Latency overhead of each test-time augmentation mode over plain inference,
+# and a determinism check (two runs must give identical probabilities).
+#
+#   python benchmarks/bench_tta.py --random-weights --batch-size 8
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTA latency overhead")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--random-weights", action="store_true")
+    args = parser.parse_args()
+
+    if args.random_weights:
+        model.registry.use(model.build_model())
+    m = model.get_model()
+    paths = sorted(glob.glob(os.path.join(ROOT, "sampleimages", "*")))[:args.batch_size]
+
+    baseline = None
+    print(f"{len(paths)} images per run, best of {args.repeat}")
+    print(f"{'mode':<10}{'views':>6}{'ms/img':>10}{'overhead':>10}{'deterministic':>15}{'agree w/ off':>14}")
+    ref_classes = None
+    for mode in model.TTA_MODES:
+        best = None
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            res = model.inference_batch(paths, batch_size=args.batch_size, model=m, tta=mode)
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+        again = model.inference_batch(paths, batch_size=args.batch_size, model=m, tta=mode)
+        deterministic = all(a['probs'] == b['probs'] for a, b in zip(res, again))
+        classes = [r['class'] for r in res]
+        if ref_classes is None:
+            ref_classes = classes
+        agree = sum(a == b for a, b in zip(classes, ref_classes)) / len(classes)
+        if baseline is None:
+            baseline = best
+        n_views = 1 if mode == "off" else model.tta_views(model.torch.zeros(1, 3, 4, 4), mode)[1]
+        print(f"{mode:<10}{n_views:>6}{1000 * best / len(paths):>10.1f}{100 * (best / baseline - 1):>9.0f}%"
+              f"{str(deterministic):>15}{100 * agree:>13.0f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/load_generator.py
+# Closed-loop load generator for inference_server.py: N concurrent clients
+# POST images from sampleimages/ and we report p50/p99 latency and throughput.
+#
+#   python inference_server.py --port 8765 &
+#   python benchmarks/load_generator.py --url http://127.0.0.1:8765 --concurrency 16 --requests 200
+#
+#   # or start a random-weight server in-process:
+#   python benchmarks/load_generator.py --spawn --concurrency 8 --requests 64
+
+import argparse
+import glob
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from inference_client import InferenceClient
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(q / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def spawn_server(max_batch, max_wait_ms):
+    import model
+    import inference_server
+    model.registry.use(model.build_model())
+    httpd = inference_server.make_server("127.0.0.1", 0, max_batch, max_wait_ms)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    host, port = httpd.server_address[:2]
+    return httpd, "http://%s:%d" % (host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the inference server")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--spawn", action="store_true", help="start a random-weight server in this process")
+    parser.add_argument("--max-batch", type=int, default=16, help="with --spawn")
+    parser.add_argument("--max-wait-ms", type=float, default=10.0, help="with --spawn")
+    args = parser.parse_args()
+
+    httpd = None
+    url = args.url
+    if args.spawn:
+        httpd, url = spawn_server(args.max_batch, args.max_wait_ms)
+    client = InferenceClient(url)
+
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "sampleimages", "*"))):
+        with open(path, "rb") as fh:
+            payloads.append(fh.read())
+    if not payloads:
+        raise SystemExit("no images in sampleimages/")
+
+    # warm-up request
+    client.predict_bytes(payloads[0])
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def one(i):
+        t0 = time.perf_counter()
+        res = client.predict_bytes(payloads[i % len(payloads)])
+        dt = time.perf_counter() - t0
+        with lock:
+            latencies.append(dt)
+            if res.get("error"):
+                errors[0] += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - t0
+
+    print(f"url={url} concurrency={args.concurrency} requests={args.requests} errors={errors[0]}")
+    print(f"throughput: {args.requests / wall:.2f} img/s")
+    print(f"latency ms: p50={1000 * percentile(latencies, 50):.1f} p90={1000 * percentile(latencies, 90):.1f} "
+          f"p99={1000 * percentile(latencies, 99):.1f} max={1000 * max(latencies):.1f}")
+    try:
+        print("server batching:", client.health(refresh=True).get("batching"))
+    except Exception:
+        pass
+    if httpd is not None:
+        httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
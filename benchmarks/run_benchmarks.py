@@ -0,0 +1,210 @@
+# benchmarks/run_benchmarks.py
+# Offline inference benchmark suite over sampleimages/: times every stage of a
+# prediction and writes the results to JSON so runs can be compared.
+#
+#   python benchmarks/run_benchmarks.py --random-weights --out bench_results.json
+#   python benchmarks/run_benchmarks.py --random-weights --compare bench_results.json --tolerance 0.2
+#
+# Stages (milliseconds per image unless noted):
+#   decode.pil             Image.open().convert('RGB') at full resolution
+#   decode.fundus          preprocessing.load_fundus (what the model path uses)
+#   transforms.test        model.test_transforms on the full-resolution image
+#   transforms.tensor      model.tensor_transforms on the 224x224 image
+#   forward.bs<B>.t<T>     model forward pass, batch size B, T torch threads
+#   predict_image          blindness.predict_image end to end (cache disabled)
+#   report_pdf             blindness.generate_report_pdf (ms per report)
+#
+# With --compare, every stage present in both files is checked: the run fails
+# (exit status 1) when a stage's median (or --metric min_ms) is more than
+# --tolerance slower than the baseline. Stages whose dependencies are missing
+# (e.g. the GUI module without mysql-connector / reportlab) are recorded as
+# skipped.
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# predict_image must hit the model, not the prediction cache
+os.environ.setdefault("DR_PREDICTION_CACHE", "0")
+
+import torch
+from PIL import Image
+
+import model
+import preprocessing
+
+
+def timed(fn, items, repeat):
+    """Median / min milliseconds per item of fn over items, best-effort warm."""
+    fn(items[0])
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for item in items:
+            fn(item)
+        samples.append(1000 * (time.perf_counter() - t0) / len(items))
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples), "repeat": repeat, "items": len(items)}
+
+
+def bench_decode(files, repeat):
+    def pil(path):
+        with Image.open(path) as im:
+            return im.convert("RGB")
+    return {
+        "decode.pil": timed(pil, files, repeat),
+        "decode.fundus": timed(lambda p: preprocessing.load_fundus(p, model.INPUT_SIZE, model.CROP_BORDER), files, repeat),
+    }
+
+
+def bench_transforms(files, repeat):
+    full = []
+    small = []
+    for path in files:
+        with Image.open(path) as im:
+            full.append(im.convert("RGB"))
+        small.append(preprocessing.load_fundus(path, model.INPUT_SIZE, model.CROP_BORDER))
+    return {
+        "transforms.test": timed(model.test_transforms, full, repeat),
+        "transforms.tensor": timed(model.tensor_transforms, small, repeat),
+    }
+
+
+def bench_forward(net, files, batch_sizes, threads, repeat):
+    tensors = [model.load_input(p) for p in files]
+    results = {}
+    default_threads = torch.get_num_threads()
+    try:
+        for t in threads:
+            torch.set_num_threads(t)
+            for bs in batch_sizes:
+                batch = torch.stack([tensors[i % len(tensors)] for i in range(bs)]).to(model.device)
+
+                def forward(_):
+                    with torch.no_grad():
+                        net(batch)
+                stats = timed(forward, [None], repeat)
+                # per image, like the other stages
+                for key in ("median_ms", "min_ms"):
+                    stats[key] /= bs
+                stats["items"] = bs
+                results["forward.bs%d.t%d" % (bs, t)] = stats
+    finally:
+        torch.set_num_threads(default_threads)
+    return results
+
+
+def bench_gui(files, repeat):
+    try:
+        import blindness
+    except Exception as e:
+        reason = "blindness.py not importable: %s" % e
+        return {"predict_image": {"skipped": reason}, "report_pdf": {"skipped": reason}}
+    out = {"predict_image": timed(blindness.predict_image, files, repeat)}
+    row = (1, "P0001", "Benchmark Patient", 54, "F", "000-000-0000", "")
+    with tempfile.TemporaryDirectory(prefix="dr-bench-") as tmp:
+        pdf = os.path.join(tmp, "report.pdf")
+        out["report_pdf"] = timed(lambda p: blindness.generate_report_pdf(row, p, "Moderate", 2, pdf), files[:3], repeat)
+    return out
+
+
+def compare(results, baseline, tolerance, metric="median_ms"):
+    """Print a comparison table; return the stages that regressed."""
+    regressions = []
+    print(f"\n{'stage':<24}{'baseline':>10}{'now':>10}{'change':>9}")
+    for name, stats in results["stages"].items():
+        old = baseline.get("stages", {}).get(name, {})
+        if metric not in stats or metric not in old:
+            continue
+        ratio = stats[metric] / old[metric] if old[metric] else 1.0
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<24}{old[metric]:>10.2f}{stats[metric]:>10.2f}{100 * (ratio - 1):>8.1f}%{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inference benchmark suite")
+    parser.add_argument("--images", default=os.path.join(ROOT, "sampleimages"))
+    parser.add_argument("--checkpoint", default=None, help="default: the configured model")
+    parser.add_argument("--random-weights", action="store_true", help="no classifier.pt needed")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--threads", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", nargs="+", default=["decode", "transforms", "forward", "gui"],
+                        choices=["decode", "transforms", "forward", "gui"])
+    parser.add_argument("--out", default=None, help="write results to this JSON file")
+    parser.add_argument("--compare", default=None, help="baseline JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown per stage (0.2 = 20%%)")
+    parser.add_argument("--metric", choices=["median_ms", "min_ms"], default="median_ms",
+                        help="statistic compared against the baseline (min_ms is steadier on busy machines)")
+    args = parser.parse_args(argv)
+
+    files = sorted(p for p in glob.glob(os.path.join(args.images, "*")) if os.path.isfile(p))
+    if not files:
+        raise SystemExit("no images in %s" % args.images)
+    if args.random_weights:
+        net = model.build_model().to(model.device)
+        model.registry.use(net)
+    elif args.checkpoint:
+        net = model.load_model(args.checkpoint)
+        model.registry.use(net)
+    else:
+        net = model.get_model()
+    net.eval()
+
+    stages = {}
+    if "decode" in args.stages:
+        stages.update(bench_decode(files, args.repeat))
+    if "transforms" in args.stages:
+        stages.update(bench_transforms(files, args.repeat))
+    if "forward" in args.stages:
+        stages.update(bench_forward(net, files, args.batch_sizes, args.threads, args.repeat))
+    if "gui" in args.stages:
+        stages.update(bench_gui(files, args.repeat))
+
+    results = {
+        "meta": {
+            "created": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(), "torch": torch.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count(), "device": str(model.device),
+            "weights": "random" if args.random_weights else (args.checkpoint or model.registry.path),
+            "images": len(files),
+        },
+        "stages": stages,
+    }
+    print(f"{'stage':<24}{'median ms':>10}{'min ms':>10}")
+    for name, stats in stages.items():
+        if "skipped" in stats:
+            print(f"{name:<24}  skipped: {stats['skipped']}")
+        else:
+            print(f"{name:<24}{stats['median_ms']:>10.2f}{stats['min_ms']:>10.2f}")
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"[BENCH] wrote {args.out}")
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, args.tolerance, args.metric)
+        if regressions:
+            print(f"[BENCH] {len(regressions)} stage(s) slower than baseline by more than "
+                  f"{100 * args.tolerance:.0f}%: {', '.join(regressions)}")
+            return 1
+        print("[BENCH] no regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,16 +6,20 @@
 # - Pages expand to full window
 # - Patient table has grid/alternating rows
 # - Diagnosis label + class saved, history maintained
-# - Auto-ALTER DB (diagnosis, diagnosis_class, history) at startup
+# - DB schema (diagnosis, diagnosis_class, history) kept current by migrations.py
 
 import os
 import sys
-import traceback
+import time
 import datetime
 import webbrowser
 import inspect
+import io
+import itertools
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
 
-import mysql.connector as sk
 from tkinter import *
 from tkinter import ttk, messagebox
 from tkinter.filedialog import askopenfilename
@@ -33,33 +37,135 @@ from reportlab.lib.enums import TA_LEFT
 
 # import your model (expects main)
 import model
+import settings
+import preprocessing
+import metrics
+import storage
+import migrations
+import auth
+import history
+import patient_list
+from log_config import setup_logging
+from prediction_cache import PredictionCache, make_key as make_cache_key
+from inference_client import InferenceClient
 
+log = logging.getLogger("dr.app")
 
 
 # ----------------------------
-# Database connection
+# Database (storage.py: MySQL or the bundled SQLite app_data.db)
 # ----------------------------
 try:
-    connection = sk.connect(
-        host="localhost",
-        user="root",
-        password="root@123",
-        database="DR_Database"
-    )
-    sql = connection.cursor()
+    db = storage.open_storage()
     DB_OK = True
 except Exception as e:
-    print("[WARN] Could not connect to MySQL:", e)
-    sql = None
-    connection = None
+    log.warning("could not open the %s database: %s (set DR_DB_BACKEND=sqlite to use app_data.db)",
+                settings.get("db_backend", "mysql"), e)
+    db = None
     DB_OK = False
 
+# ----------------------------
+# Prediction cache
+# ----------------------------
+try:
+    prediction_cache = PredictionCache(
+        db_path=settings.resolve_path(settings.get("prediction_cache_db", "app_data.db")),
+        memory_size=settings.get_int("prediction_cache_memory", 256),
+        disk_size=settings.get_int("prediction_cache_size", 20000),
+    ) if settings.get_bool("prediction_cache", True) else None
+except Exception as e:
+    log.warning("prediction cache disabled: %s", e)
+    prediction_cache = None
+
 # ----------------------------
 # Model wrapper
 # ----------------------------
+# Client mode: with DR_INFERENCE_URL set, predictions come from a shared
+# inference_server.py instead of a model loaded in this process.
+INFERENCE_URL = settings.get("inference_url")
+remote_model = InferenceClient(INFERENCE_URL) if INFERENCE_URL else None
+
+def model_ready():
+    return remote_model is not None or model.registry.is_ready()
+
+def _wait_for_model():
+    if remote_model is not None:
+        return
+    if not model.registry.is_ready():
+        log.info("waiting for model", extra={"state": model.registry.state})
+    model.get_model()
+
+@metrics.timed("predict_images")
+def predict_images(image_paths, batch_size=16, progress=None):
+    """Batch version of predict_image: one (label, class) pair per path."""
+    image_paths = list(image_paths)
+    try:
+        _wait_for_model()
+        results = _cached_inference(image_paths, batch_size, progress)
+    except Exception as e:
+        log.exception("predict_images failed: %s", e)
+        return [(f"Model error: {e}", None)] * len(image_paths)
+    out = []
+    for path, res in zip(image_paths, results):
+        if res.get('error'):
+            log.error("prediction failed", extra={"path": path, "error": res['error']})
+            out.append((f"Model error: {res['error']}", None))
+        else:
+            out.append((res['class'], res['label']))
+    log.info("prediction done", extra={"images": len(image_paths), "results": out})
+    return out
+
+def _cached_inference(image_paths, batch_size, progress=None):
+    backend = remote_model or model
+    if prediction_cache is None:
+        return backend.inference_batch(image_paths, batch_size=batch_size, progress=progress)
+    if remote_model is not None:
+        version = remote_model.version()
+        preprocess = remote_model.preprocess_signature()
+    else:
+        version = model.model_version()
+        preprocess = model.preprocess_signature()
+    results = [None] * len(image_paths)
+    misses = []
+    if progress:
+        progress("decoding")
+    for i, path in enumerate(image_paths):
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+        except OSError as e:
+            results[i] = {'class': None, 'label': None, 'probs': None, 'error': str(e)}
+            continue
+        key = make_cache_key(data, version, preprocess)
+        hit = prediction_cache.get(key)
+        if hit is not None:
+            results[i] = hit
+        else:
+            misses.append((i, key, data))
+    if misses:
+        fresh = backend.inference_batch([io.BytesIO(data) for _, _, data in misses], batch_size=batch_size, progress=progress)
+        for (i, key, data), res in zip(misses, fresh):
+            results[i] = res
+            if remote_model is not None and res.get('version'):
+                # store under the model that answered, which may not be the one /health reported
+                key = make_cache_key(data, remote_model.version(res['version']), preprocess)
+            if not res.get('error'):
+                prediction_cache.put(key, res)
+    metrics.inc("prediction_cache_hits", len(image_paths) - len(misses))
+    metrics.inc("prediction_cache_misses", len(misses))
+    log.debug("prediction cache", extra={"hits": len(image_paths) - len(misses), "requests": len(image_paths)})
+    return results
+
+@metrics.timed("predict_image")
 def predict_image(image_path):
+    if hasattr(model, "inference_batch"):
+        return predict_images([image_path], batch_size=1)[0]
+    return _predict_with_main(image_path)
+
+def _predict_with_main(image_path):
     tried = []
     try:
+        _wait_for_model()
         main_fn = getattr(model, "main", None)
         if main_fn is None:
             raise RuntimeError("model.main not found")
@@ -105,104 +211,16 @@ def predict_image(image_path):
                 cls = int(cls)
         except Exception:
             pass
-        print(f"[MODEL] success ({tried[-1] if tried else 'unknown'}) -> label={label}, class={cls}")
+        log.info("prediction done", extra={"via": tried[-1] if tried else "unknown", "label": label, "class": cls})
         return label, cls
     except Exception as e:
-        print("[ERROR] predict_image failed (tried: %s): %s" % (tried, e))
-        traceback.print_exc()
+        log.exception("predict_image failed (tried: %s): %s", tried, e)
         return f"Model error: {e}", None
 
-# ----------------------------
-# DB schema helpers (auto ALTER)
-# ----------------------------
-def ensure_patient_schema_and_columns():
-    if not DB_OK:
-        return
-    try:
-        sql.execute("""
-            CREATE TABLE IF NOT EXISTS patients (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user VARCHAR(255),
-                name VARCHAR(255),
-                age INT,
-                gender VARCHAR(20),
-                contact VARCHAR(50),
-                notes TEXT
-            )
-        """)
-        connection.commit()
-    except Exception as e:
-        print("[DB] ensure patients table warning:", e)
-    try:
-        sql.execute("""
-            SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_SCHEMA = DATABASE()
-              AND TABLE_NAME = 'patients'
-              AND COLUMN_NAME = 'diagnosis'
-        """)
-        if sql.fetchone()[0] == 0:
-            try:
-                sql.execute("ALTER TABLE patients ADD COLUMN diagnosis VARCHAR(255) NULL")
-                connection.commit()
-                print("[DB] Added 'diagnosis' column to patients")
-            except Exception as e:
-                print("[DB] Could not add 'diagnosis' column:", e)
-    except Exception as e:
-        print("[DB] diagnosis column check warning:", e)
-    try:
-        sql.execute("""
-            SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_SCHEMA = DATABASE()
-              AND TABLE_NAME = 'patients'
-              AND COLUMN_NAME = 'diagnosis_class'
-        """)
-        if sql.fetchone()[0] == 0:
-            try:
-                sql.execute("ALTER TABLE patients ADD COLUMN diagnosis_class VARCHAR(64) NULL")
-                connection.commit()
-                print("[DB] Added 'diagnosis_class' column to patients")
-            except Exception as e:
-                print("[DB] Could not add 'diagnosis_class' column:", e)
-    except Exception as e:
-        print("[DB] diagnosis_class column check warning:", e)
-    try:
-        sql.execute("""
-            CREATE TABLE IF NOT EXISTS diagnosis_history (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                patient_id INT,
-                diagnosis VARCHAR(255),
-                diagnosis_class VARCHAR(64),
-                test_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (patient_id) REFERENCES patients(id)
-            )
-        """)
-        connection.commit()
-    except Exception as e:
-        print("[DB] diagnosis_history creation warning:", e)
-
-def ensure_predict_column():
-    if not DB_OK:
-        return
-    try:
-        sql.execute("""
-            SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_SCHEMA = DATABASE()
-              AND TABLE_NAME = 'THEGREAT'
-              AND COLUMN_NAME = 'PREDICT'
-        """)
-        if sql.fetchone()[0] == 0:
-            try:
-                sql.execute("ALTER TABLE THEGREAT ADD COLUMN PREDICT VARCHAR(255) NULL")
-                connection.commit()
-                print("[DB] Added PREDICT column to THEGREAT")
-            except Exception as e:
-                print("[DB] Could not add PREDICT column:", e)
-    except Exception as e:
-        print("[DB] ensure_predict_column warning:", e)
-
 # ----------------------------
 # PDF generator (Layout A: Name, Gender, blank, Age, Contact)
 # ----------------------------
+@metrics.timed("report_pdf")
 def generate_report_pdf(patient_row, image_path, diagnosis, diagnosis_class, out_path):
     try:
         if not patient_row:
@@ -263,16 +281,111 @@ def generate_report_pdf(patient_row, image_path, diagnosis, diagnosis_class, out
                 img = RLImage(image_path, width=300, height=300)
                 elements.append(img)
             except Exception as e:
-                print("[PDF] Could not attach image:", e)
+                log.warning("could not attach image to report: %s", e)
 
         doc.build(elements)
-        print(f"[PDF] Saved: {out_path}")
+        log.info("report saved", extra={"path": out_path})
         return True, None
     except Exception as e:
-        print("[PDF ERROR]", e)
-        traceback.print_exc()
+        metrics.inc("report_pdf_errors")
+        log.exception("report generation failed: %s", e)
         return False, str(e)
 
+# ----------------------------
+# Diagnosis pipeline (worker thread)
+# ----------------------------
+REPORTS_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), "reports")
+
+@metrics.timed("db.save_diagnosis")
+def save_diagnosis(patient_row, user, value, cls_str, image_path=None):
+    db.save_diagnosis(patient_row[0] if patient_row else None, user, value, cls_str, image_path)
+
+class DiagnosisJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, path, patient_row, user):
+        self.id = next(DiagnosisJob._ids)
+        self.path = path
+        self.patient_row = patient_row
+        self.user = user
+        self.stage = "queued"
+        self.value = None
+        self.cls_str = ""
+        self.report = None
+        self.error = None
+        self.submitted = None
+
+    @property
+    def patient_name(self):
+        if self.patient_row and len(self.patient_row) > 2:
+            return self.patient_row[2]
+        return self.user or "patient"
+
+class DiagnosisPipeline:
+    """Runs decode -> inference -> DB save -> PDF off the Tk thread.
+
+    Workers never touch widgets: every state change is put on `events` as
+    (kind, job, payload) and the App drains the queue with after().
+    kind is "stage" (payload = stage name), "done" or "error" (payload = message).
+    """
+
+    STAGES = ("queued", "decoding", "inference", "saving", "pdf", "done")
+
+    def __init__(self, max_workers=1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="diagnosis")
+        self.events = queue.Queue()
+
+    def submit(self, job):
+        job.submitted = time.perf_counter()
+        self.events.put(("stage", job, "queued"))
+        self._executor.submit(self._run, job)
+        return job
+
+    def _stage(self, job, name):
+        job.stage = name
+        self.events.put(("stage", job, name))
+
+    def _run(self, job):
+        metrics.observe("diagnosis.queue_wait", time.perf_counter() - job.submitted)
+        with metrics.timer("diagnosis.job"):
+            self._run_stages(job)
+
+    def _run_stages(self, job):
+        try:
+            value, cls = predict_images([job.path], batch_size=1, progress=lambda st: self._stage(job, st))[0]
+            if cls is None:
+                raise RuntimeError(value)
+            job.value = value
+            job.cls_str = str(cls)
+
+            self._stage(job, "saving")
+            if DB_OK:
+                try:
+                    save_diagnosis(job.patient_row, job.user, value, job.cls_str, job.path)
+                except Exception as e:
+                    log.warning("could not save diagnosis: %s", e, extra={"job": job.id})
+
+            self._stage(job, "pdf")
+            os.makedirs(REPORTS_DIR, exist_ok=True)
+            safe_name = str(job.patient_name).replace(" ", "_")
+            ts = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+            out_file = os.path.join(REPORTS_DIR, f"report_{safe_name}_{ts}_{job.id}.pdf")
+            ok, err = generate_report_pdf(job.patient_row, job.path, str(value), job.cls_str, out_file)
+            if ok:
+                job.report = out_file
+            else:
+                job.error = f"Could not create report: {err}"
+            job.stage = "done"
+            self.events.put(("done", job, job.error))
+        except Exception as e:
+            log.exception("diagnosis job failed", extra={"job": job.id})
+            job.stage = "error"
+            job.error = str(e)
+            self.events.put(("error", job, str(e)))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
 # ----------------------------
 # UI constants
 # ----------------------------
@@ -317,19 +430,55 @@ class App(tk := Tk):
         container.rowconfigure(0, weight=1)
         self.container = container
 
+        # start loading the model now; the UI comes up while it loads
+        if remote_model is None:
+            model.warm_up()
+
         if DB_OK:
-            ensure_patient_schema_and_columns()
-            ensure_predict_column()
+            try:
+                migrations.ensure_current(db)
+            except Exception as e:
+                log.warning("could not migrate the database schema: %s", e)
+
+        self.pipeline = DiagnosisPipeline(max_workers=settings.get_int("diagnosis_workers", 1))
+        # short blocking jobs (password hashing, lookups) that must not freeze the window
+        self.background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ui-bg")
 
         self.user = None
         self.frames = {}
-        for F in (LoginPage, SignupPage, PatientListPage, PatientFormPage, UploadPage):
+        for F in (LoginPage, SignupPage, PatientListPage, PatientFormPage, UploadPage, HistoryPage, ProgressionPage):
             page_name = F.__name__
             frame = F(parent=container, controller=self)
             self.frames[page_name] = frame
             frame.grid(row=0, column=0, sticky='nsew')
 
         self.show_frame("LoginPage")
+        self.after(100, self._poll_pipeline)
+
+    def _poll_pipeline(self):
+        # runs on the Tk thread: the only place pipeline results reach widgets
+        upload = self.frames.get("UploadPage")
+        try:
+            while True:
+                kind, job, payload = self.pipeline.events.get_nowait()
+                if upload:
+                    upload.on_job_event(kind, job, payload)
+        except queue.Empty:
+            pass
+        self.after(100, self._poll_pipeline)
+
+    def run_in_background(self, fn, *args, on_done):
+        """fn(*args) on a worker thread; on_done(result, error) is called on the Tk thread."""
+        future = self.background.submit(fn, *args)
+
+        def check():
+            if not future.done():
+                self.after(20, check)
+                return
+            error = future.exception()
+            on_done(None if error else future.result(), error)
+        self.after(20, check)
+        return future
 
     def show_frame(self, name, **kwargs):
         frame = self.frames.get(name)
@@ -409,7 +558,8 @@ class LoginPage(BasePage):
 
         btn_frame = ttk.Frame(form)
         btn_frame.grid(row=4, column=0, pady=8, sticky='w')
-        ttk.Button(btn_frame, text="Login", style='Accent.TButton', command=self.handle_login).pack(side='left', padx=(0,8))
+        self.login_btn = ttk.Button(btn_frame, text="Login", style='Accent.TButton', command=self.handle_login)
+        self.login_btn.pack(side='left', padx=(0,8))
         ttk.Button(btn_frame, text="Create account", command=lambda: controller.show_frame("SignupPage")).pack(side='left')
 
         hint = ttk.Label(right, text="Don't have an account? Click Create account.", foreground='#444')
@@ -424,19 +574,23 @@ class LoginPage(BasePage):
         if not DB_OK:
             messagebox.showerror("Database", "Database connection not available.")
             return
-        try:
-            sql.execute("SELECT * FROM THEGREAT")
-            rows = sql.fetchall()
-            ok_user = any(r[0] == username and r[1] == password for r in rows)
-            if ok_user:
-                self.controller.user = username
-                messagebox.showinfo("Welcome", f"Hello {username}, you are logged in.")
-                self.controller.show_frame("PatientListPage")
-            else:
-                messagebox.showerror("Login failed", "Invalid username or password.")
-        except Exception as e:
-            messagebox.showerror("DB Error", f"Database query failed: {e}")
-            print("DB error:", e)
+        # the password hash is deliberately slow: verify it off the Tk thread
+        self.login_btn.state(['disabled'])
+        self.controller.run_in_background(auth.check_login, db, username, password,
+                                          on_done=lambda ok, err: self._login_done(username, ok, err))
+
+    def _login_done(self, username, ok_user, error):
+        self.login_btn.state(['!disabled'])
+        if error is not None:
+            messagebox.showerror("DB Error", f"Database query failed: {error}")
+            log.warning("login DB error: %s", error)
+        elif ok_user:
+            self.password_var.set("")
+            self.controller.user = username
+            messagebox.showinfo("Welcome", f"Hello {username}, you are logged in.")
+            self.controller.show_frame("PatientListPage")
+        else:
+            messagebox.showerror("Login failed", "Invalid username or password.")
 
 # ----------------------------
 # SignupPage (larger font & centered)
@@ -480,7 +634,8 @@ class SignupPage(BasePage):
 
         btn_frame = ttk.Frame(inner)
         btn_frame.grid(row=6, column=0, pady=6, sticky='w')
-        ttk.Button(btn_frame, text="Sign up", style='Accent.TButton', command=self.handle_signup).pack(side='left', padx=(0,8))
+        self.signup_btn = ttk.Button(btn_frame, text="Sign up", style='Accent.TButton', command=self.handle_signup)
+        self.signup_btn.pack(side='left', padx=(0,8))
         ttk.Button(btn_frame, text="Back to Login", command=lambda: controller.show_frame("LoginPage")).pack(side='left')
 
     def handle_signup(self):
@@ -496,20 +651,21 @@ class SignupPage(BasePage):
         if not DB_OK:
             messagebox.showerror("Database", "DB connection not available.")
             return
-        try:
-            sql.execute("SELECT * FROM THEGREAT")
-            data = sql.fetchall()
-            if any(row[0] == u for row in data):
-                messagebox.showinfo("Exists", "Username already registered. Choose another.")
-                return
-            query = "INSERT INTO THEGREAT (USERNAME, PASSWORD) VALUES(%s, %s)"
-            sql.execute(query, (u, p))
-            connection.commit()
+        self.signup_btn.state(['disabled'])
+        self.controller.run_in_background(auth.create_user, db, u, p, on_done=self._signup_done)
+
+    def _signup_done(self, created, error):
+        self.signup_btn.state(['!disabled'])
+        if error is not None:
+            messagebox.showerror("DB Error", f"Could not create account: {error}")
+            log.warning("signup DB error: %s", error)
+        elif not created:
+            messagebox.showinfo("Exists", "Username already registered. Choose another.")
+        else:
+            self.new_pass.set("")
+            self.confirm_pass.set("")
             messagebox.showinfo("Success", "Account created — you can now log in.")
             self.controller.show_frame("LoginPage")
-        except Exception as e:
-            messagebox.showerror("DB Error", f"Could not create account: {e}")
-            print("Signup DB error:", e)
 
 # ----------------------------
 # PatientListPage (visual lines / alternating rows)
@@ -522,6 +678,23 @@ class PatientListPage(BasePage):
         ttk.Label(topbar, text="Patients", style='Header.TLabel').pack(side='left')
         ttk.Button(topbar, text="Logout", command=self.logout).pack(side='right')
         ttk.Button(topbar, text="Add Patient", command=lambda: controller.show_frame("PatientFormPage", patient=None)).pack(side='right', padx=8)
+        ttk.Button(topbar, text="Progression", command=lambda: controller.show_frame("ProgressionPage")).pack(side='right')
+        self.search_var = StringVar()
+        ttk.Entry(topbar, textvariable=self.search_var, width=28).pack(side='right', padx=8)
+        ttk.Label(topbar, text="Search").pack(side='right')
+        self.count_label = ttk.Label(topbar, text="")
+        self.count_label.pack(side='left', padx=12)
+
+        # rows come a page at a time (patient_list.py) and only a bounded
+        # window of pages is kept in the tree; the model belongs to one user,
+        # and every reset bumps the generation so results of an older query
+        # that arrive late are dropped
+        self.model = None
+        self.generation = 0
+        self.loading = False
+        self.refresh_pending = False
+        self.search_after = None
+        self.search_var.trace_add('write', self.on_search_changed)
 
         self.card_frame = self.card(self, padding=(10,10))
         self.card_frame.pack(fill='both', expand=True, padx=20, pady=10)
@@ -542,13 +715,15 @@ class PatientListPage(BasePage):
         self.tree.tag_configure('evenrow', background='#f6fafd')
 
         scrollbar = ttk.Scrollbar(self.card_frame, orient='vertical', command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
+        self.scrollbar = scrollbar
+        self.tree.configure(yscroll=self.on_scroll)
         scrollbar.grid(row=0, column=1, sticky='ns', padx=(6,0), pady=6)
 
         btn_panel = ttk.Frame(self.card_frame)
         btn_panel.grid(row=0, column=2, sticky='ns', padx=8, pady=6)
         ttk.Button(btn_panel, text="Edit", command=self.edit_selected).pack(fill='x', pady=6)
         ttk.Button(btn_panel, text="Upload Image", command=self.upload_selected).pack(fill='x', pady=6)
+        ttk.Button(btn_panel, text="History", command=self.history_selected).pack(fill='x', pady=6)
         ttk.Button(btn_panel, text="Delete", command=self.delete_selected).pack(fill='x', pady=6)
 
         self.refresh()
@@ -557,32 +732,140 @@ class PatientListPage(BasePage):
         self.refresh()
 
     def refresh(self):
-        try:
-            sql.execute("SHOW TABLES LIKE 'patients'")
-            if sql.fetchone() is None:
-                sql.execute("""CREATE TABLE IF NOT EXISTS patients (
-                            id INT AUTO_INCREMENT PRIMARY KEY,
-                            user VARCHAR(255),
-                            name VARCHAR(255),
-                            age INT,
-                            gender VARCHAR(20),
-                            contact VARCHAR(50),
-                            notes TEXT,
-                            diagnosis VARCHAR(255),
-                            diagnosis_class VARCHAR(64)
-                            )""")
-                connection.commit()
-            sql.execute("SELECT id, name, age, gender, contact, diagnosis, diagnosis_class FROM patients WHERE user = %s", (self.controller.user,))
-            rows = sql.fetchall()
-        except Exception as e:
-            print("Patient load error:", e)
-            rows = []
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        for idx, r in enumerate(rows):
-            tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
-            diag_cls_display = r[6] if len(r) > 6 and r[6] is not None else ""
-            self.tree.insert('', 'end', values=(r[0], r[1], r[2], r[3], r[4], r[5] or "", diag_cls_display), tags=(tag,))
+        """Reload for a new user; otherwise fetch only what changed since the last load."""
+        user = self.controller.user
+        if not DB_OK or not user:
+            self.model = None
+            self.generation += 1
+            self.tree.delete(*self.tree.get_children())
+            self.count_label.config(text="")
+            return
+        if self.model is None or self.model.user != user:
+            self.reset()
+            return
+        if self.loading:
+            # the model is not thread-safe: refresh once the current fetch is in
+            self.refresh_pending = True
+            return
+        generation = self.generation
+        self.loading = True
+        self.controller.run_in_background(
+            self.model.refresh, on_done=lambda ops, error: self.apply_changes(generation, ops, error))
+
+    def reset(self):
+        self.generation += 1
+        generation = self.generation
+        self.model = patient_list.PatientListModel(db, self.controller.user)
+        self.loading = True
+        self.refresh_pending = False
+        # enough for what is on screen plus one page of prefetch
+        rows_visible = max(int(self.tree.cget('height')), self.tree.winfo_height() // 20)
+        self.controller.run_in_background(
+            self.model.reset, self.search_var.get(), rows_visible + self.model.page_size,
+            on_done=lambda rows, error: self.show_page(generation, (rows, []), error, clear=True))
+
+    def load_more(self):
+        if self.loading or self.model is None or self.model.exhausted:
+            return
+        generation = self.generation
+        self.loading = True
+        self.controller.run_in_background(
+            self.model.load_more, on_done=lambda page, error: self.show_page(generation, page, error))
+
+    def load_previous(self):
+        if self.loading or self.model is None or self.model.at_start:
+            return
+        generation = self.generation
+        self.loading = True
+        self.controller.run_in_background(
+            self.model.load_previous,
+            on_done=lambda page, error: self.show_page(generation, page, error, before=True))
+
+    def on_search_changed(self, *_):
+        # wait for a pause in typing instead of querying on every key
+        if self.search_after is not None:
+            self.after_cancel(self.search_after)
+        self.search_after = self.after(300, self.run_search)
+
+    def run_search(self):
+        self.search_after = None
+        if DB_OK and self.controller.user:
+            self.reset()
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) > 0.9:
+            self.load_more()
+        elif float(first) < 0.1:
+            self.load_previous()
+
+    def row_values(self, r):
+        return (r[0], r[1], r[2], r[3], r[4], r[5] or "", r[6] if r[6] is not None else "")
+
+    def show_page(self, generation, page, error, clear=False, before=False):
+        """page: (rows to add at the end, or at the start when before, ids the model evicted)."""
+        if generation != self.generation:
+            return
+        self.loading = False
+        if error:
+            log.warning("patient load error: %s", error)
+            return
+        rows, evicted = page
+        if clear:
+            self.tree.delete(*self.tree.get_children())
+        # keep the same rows on screen while the window moves under them
+        children = self.tree.get_children()
+        top = round(float(self.tree.yview()[0]) * len(children)) if children else 0
+        if before:
+            for r in reversed(rows):
+                self.tree.insert('', 0, iid=str(r[0]), values=self.row_values(r))
+            top += len(rows)
+        else:
+            for r in rows:
+                self.tree.insert('', 'end', iid=str(r[0]), values=self.row_values(r))
+            top -= len(evicted)
+        if evicted:
+            self.tree.delete(*[str(pid) for pid in evicted if self.tree.exists(str(pid))])
+        children = self.tree.get_children()
+        for idx, iid in enumerate(children):
+            self.tree.item(iid, tags=('evenrow' if idx % 2 == 0 else 'oddrow',))
+        if (rows or evicted) and not clear and children:
+            self.tree.yview_moveto(max(0, top) / len(children))
+        self.update_count()
+        if self.refresh_pending:
+            self.refresh_pending = False
+            self.refresh()
+        # a first page that does not fill the view gets no scroll event
+        elif float(self.tree.yview()[1]) >= 1.0:
+            self.load_more()
+
+    def apply_changes(self, generation, ops, error):
+        if generation != self.generation:
+            return
+        self.loading = False
+        if error:
+            log.warning("patient refresh error: %s", error)
+            return
+        for op in ops:
+            if op[0] == "delete":
+                if self.tree.exists(str(op[1])):
+                    self.tree.delete(str(op[1]))
+            elif op[0] == "update":
+                self.tree.item(str(op[1][0]), values=self.row_values(op[1]))
+            else:
+                self.tree.insert('', op[1], iid=str(op[2][0]), values=self.row_values(op[2]))
+        if any(op[0] != "update" for op in ops):
+            for idx, iid in enumerate(self.tree.get_children()):
+                self.tree.item(iid, tags=('evenrow' if idx % 2 == 0 else 'oddrow',))
+        self.update_count()
+        if self.refresh_pending:
+            self.refresh_pending = False
+            self.refresh()
+
+    def update_count(self):
+        shown = len(self.model.rows)
+        whole = self.model.at_start and self.model.exhausted
+        self.count_label.config(text=f"{shown} shown" if whole else f"{shown} loaded, scroll for more")
 
     def logout(self):
         self.controller.user = None
@@ -601,8 +884,7 @@ class PatientListPage(BasePage):
         pid = self.get_selected_patient_id()
         if pid:
             try:
-                sql.execute("SELECT * FROM patients WHERE id = %s", (pid,))
-                p = sql.fetchone()
+                p = db.get_patient(pid)
             except Exception:
                 p = None
             self.controller.show_frame("PatientFormPage", patient=p)
@@ -611,26 +893,186 @@ class PatientListPage(BasePage):
         pid = self.get_selected_patient_id()
         if pid:
             try:
-                sql.execute("SELECT * FROM patients WHERE id = %s", (pid,))
-                p = sql.fetchone()
+                p = db.get_patient(pid)
             except Exception:
                 p = None
             self.controller.show_frame("UploadPage", patient=p)
 
+    def history_selected(self):
+        pid = self.get_selected_patient_id()
+        if pid:
+            try:
+                p = db.get_patient(pid)
+            except Exception:
+                p = None
+            self.controller.show_frame("HistoryPage", patient=p)
+
     def delete_selected(self):
         pid = self.get_selected_patient_id()
         if not pid:
             return
         if messagebox.askyesno("Confirm", "Delete selected patient?"):
             try:
-                sql.execute("DELETE FROM patients WHERE id = %s", (pid,))
-                connection.commit()
+                db.delete_patient(pid)
                 messagebox.showinfo("Deleted", "Patient deleted.")
                 self.refresh()
             except Exception as e:
                 messagebox.showerror("Error", f"Could not delete: {e}")
 
 
+# ----------------------------
+# HistoryPage (one patient's diagnoses over time)
+# ----------------------------
+HISTORY_PERIODS = {"All": None, "3 months": 3, "6 months": 6, "12 months": 12, "24 months": 24}
+
+
+class HistoryPage(BasePage):
+    def __init__(self, parent, controller):
+        super().__init__(parent, controller)
+        header = ttk.Frame(self)
+        header.pack(fill='x', padx=12, pady=10)
+        self.title_label = ttk.Label(header, text="Diagnosis History", style='Header.TLabel')
+        self.title_label.pack(side='left')
+        ttk.Button(header, text="Back", command=lambda: controller.show_frame("PatientListPage")).pack(side='right')
+        self.period_var = StringVar(value="All")
+        period = ttk.Combobox(header, textvariable=self.period_var, values=list(HISTORY_PERIODS), state='readonly', width=12)
+        period.pack(side='right', padx=8)
+        period.bind('<<ComboboxSelected>>', lambda e: self.load())
+
+        self.card_frame = self.card(self, padding=(10,10))
+        self.card_frame.pack(fill='both', expand=True, padx=20, pady=10)
+        self.card_frame.columnconfigure(0, weight=1)
+        self.card_frame.rowconfigure(0, weight=1)
+
+        cols = ("date", "diagnosis", "diag_class", "change", "image")
+        self.tree = ttk.Treeview(self.card_frame, columns=cols, show='headings', selectmode='browse')
+        for c, h, w in zip(cols, ["Date", "Diagnosis", "Class", "Change", "Image"], [160, 220, 70, 80, 360]):
+            self.tree.heading(c, text=h)
+            self.tree.column(c, width=w, anchor='w')
+        self.tree.grid(row=0, column=0, sticky='nsew', padx=(6,0), pady=6)
+        self.tree.tag_configure('up', foreground='#c0392b')
+        self.tree.tag_configure('down', foreground='#1e8449')
+        scrollbar = ttk.Scrollbar(self.card_frame, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscroll=scrollbar.set)
+        scrollbar.grid(row=0, column=1, sticky='ns', padx=(6,0), pady=6)
+
+        self.patient = None
+        self.generation = 0
+
+    def set_context(self, patient=None):
+        self.patient = patient
+        self.title_label.config(text=f"Diagnosis History: {patient[2]}" if patient else "Diagnosis History")
+        self.load()
+
+    def load(self):
+        self.generation += 1
+        generation = self.generation
+        self.tree.delete(*self.tree.get_children())
+        if not DB_OK or not self.patient:
+            return
+        months = HISTORY_PERIODS[self.period_var.get()]
+
+        def fetch(patient_id):
+            since = history.months_before(db.now(), months) if months else None
+            return db.patient_history(patient_id, since)
+        self.controller.run_in_background(
+            fetch, self.patient[0], on_done=lambda rows, error: self.show(generation, rows, error))
+
+    def show(self, generation, rows, error):
+        if generation != self.generation:
+            return
+        if error:
+            log.warning("history load error: %s", error)
+            return
+        # newest first
+        for tested_at, diagnosis, label, image, previous in reversed(rows):
+            change = history.class_change(diagnosis, previous)
+            mark = {"up": "\u25b2 worse", "down": "\u25bc better"}.get(change, "")
+            self.tree.insert('', 'end', values=(str(tested_at)[:19], "" if diagnosis is None else diagnosis,
+                                                "" if label is None else label, mark,
+                                                os.path.basename(image or "")), tags=(change,))
+
+
+# ----------------------------
+# ProgressionPage (patients whose class went up)
+# ----------------------------
+class ProgressionPage(BasePage):
+    def __init__(self, parent, controller):
+        super().__init__(parent, controller)
+        header = ttk.Frame(self)
+        header.pack(fill='x', padx=12, pady=10)
+        ttk.Label(header, text="Progression", style='Header.TLabel').pack(side='left')
+        ttk.Button(header, text="Back", command=lambda: controller.show_frame("PatientListPage")).pack(side='right')
+        ttk.Button(header, text="Show", command=self.load).pack(side='right', padx=8)
+        self.all_var = BooleanVar(value=False)
+        ttk.Checkbutton(header, text="All users", variable=self.all_var).pack(side='right', padx=8)
+        self.months_var = StringVar(value="6")
+        ttk.Spinbox(header, from_=1, to=120, textvariable=self.months_var, width=5).pack(side='right')
+        ttk.Label(header, text="Class increased in the last (months)").pack(side='right', padx=6)
+        self.count_label = ttk.Label(header, text="")
+        self.count_label.pack(side='left', padx=12)
+
+        self.card_frame = self.card(self, padding=(10,10))
+        self.card_frame.pack(fill='both', expand=True, padx=20, pady=10)
+        self.card_frame.columnconfigure(0, weight=1)
+        self.card_frame.rowconfigure(0, weight=1)
+
+        cols = ("id", "name", "contact", "from", "to", "last", "tests")
+        self.tree = ttk.Treeview(self.card_frame, columns=cols, show='headings', selectmode='browse')
+        headings = ["ID", "Name", "Contact", "From class", "To class", "Last test", "Tests"]
+        for c, h, w in zip(cols, headings, [60, 240, 140, 90, 90, 160, 60]):
+            self.tree.heading(c, text=h)
+            self.tree.column(c, width=w, anchor='w')
+        self.tree.grid(row=0, column=0, sticky='nsew', padx=(6,0), pady=6)
+        self.tree.bind('<Double-1>', self.open_history)
+        scrollbar = ttk.Scrollbar(self.card_frame, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscroll=scrollbar.set)
+        scrollbar.grid(row=0, column=1, sticky='ns', padx=(6,0), pady=6)
+
+        self.generation = 0
+
+    def set_context(self, **kwargs):
+        self.load()
+
+    def load(self):
+        self.generation += 1
+        generation = self.generation
+        self.tree.delete(*self.tree.get_children())
+        self.count_label.config(text="")
+        if not DB_OK or not self.controller.user:
+            return
+        try:
+            months = max(1, int(self.months_var.get()))
+        except ValueError:
+            messagebox.showwarning("Progression", "Enter the number of months.")
+            return
+        user = None if self.all_var.get() else self.controller.user
+        self.controller.run_in_background(
+            history.progression_report, db, user, months,
+            on_done=lambda rows, error: self.show(generation, rows, error))
+
+    def show(self, generation, rows, error):
+        if generation != self.generation:
+            return
+        if error:
+            log.warning("progression report error: %s", error)
+            return
+        for patient_id, name, contact, baseline, current, last_at, tests in rows:
+            self.tree.insert('', 'end', iid=str(patient_id),
+                             values=(patient_id, name, contact or "", baseline, current, str(last_at)[:19], tests))
+        self.count_label.config(text=f"{len(rows)} patients")
+
+    def open_history(self, event=None):
+        sel = self.tree.selection()
+        if not sel:
+            return
+        try:
+            p = db.get_patient(int(sel[0]))
+        except Exception:
+            p = None
+        self.controller.show_frame("HistoryPage", patient=p)
+
+
 # ----------------------------
 # PatientFormPage
 # ----------------------------
@@ -717,19 +1159,15 @@ class PatientFormPage(BasePage):
         try:
             if self.current_patient:
                 pid = self.current_patient[0]
-                sql.execute("""UPDATE patients SET name=%s, age=%s, gender=%s, contact=%s, notes=%s WHERE id=%s""",
-                            (name, age, gender, contact, notes, pid))
-                connection.commit()
+                db.update_patient(pid, name, age, gender, contact, notes)
                 messagebox.showinfo("Saved", "Patient updated.")
             else:
-                sql.execute("""INSERT INTO patients (user, name, age, gender, contact, notes) VALUES (%s,%s,%s,%s,%s,%s)""",
-                            (self.controller.user, name, age, gender, contact, notes))
-                connection.commit()
+                db.add_patient(self.controller.user, name, age, gender, contact, notes)
                 messagebox.showinfo("Saved", "Patient added.")
             self.controller.show_frame("PatientListPage")
         except Exception as e:
             messagebox.showerror("DB Error", f"Could not save patient: {e}")
-            print("Save patient error:", e)
+            log.warning("save patient error: %s", e)
 
 # ----------------------------
 # UploadPage
@@ -764,7 +1202,18 @@ class UploadPage(BasePage):
         self.preview_lbl = ttk.Label(preview_frame)
         self.preview_lbl.pack()
 
+        # queued / running diagnoses (several patients can be queued at once)
+        ttk.Label(frm, text="Diagnosis queue", font=("Segoe UI", 12)).grid(row=5, column=0, columnspan=3, sticky='w', pady=(16,4))
+        cols = ("patient", "image", "status")
+        self.jobs_tree = ttk.Treeview(frm, columns=cols, show='headings', height=6)
+        for c, h, w in zip(cols, ["Patient", "Image", "Status"], [200, 360, 260]):
+            self.jobs_tree.heading(c, text=h)
+            self.jobs_tree.column(c, width=w, anchor='w')
+        self.jobs_tree.grid(row=6, column=0, columnspan=3, sticky='nsew')
+        frm.rowconfigure(6, weight=1)
+
         self.current_patient = None
+        self.last_job_id = None
 
     def set_context(self, patient=None):
         self.current_patient = patient
@@ -787,78 +1236,82 @@ class UploadPage(BasePage):
         if path:
             self.img_path_var.set(path)
             try:
-                pil = Image.open(path)
-                pil.thumbnail((320,320))
+                pil = preprocessing.load_preview(path, (320,320))
                 tkii = ImageTk.PhotoImage(pil)
                 self.preview_lbl.image = tkii
                 self.preview_lbl.config(image=tkii)
             except Exception as e:
-                print("Preview error:", e)
+                log.warning("preview error: %s", e)
 
     def run_diagnosis(self):
         path = self.img_path_var.get()
         if not path or not os.path.exists(path):
             messagebox.showwarning("Select Image", "Please select an image first.")
             return
-        value, classes = predict_image(path)
-        cls_str = str(classes) if classes is not None else ""
-        display_text = f"Diagnosis: {value}"
-        if classes is not None:
-            display_text += f" (class {cls_str})"
-        self.result_label.config(text=display_text)
-
-        try:
-            patient_row = self.current_patient
-            if not patient_row:
+        patient_row = self.current_patient
+        if not patient_row:
+            try:
                 pl = self.controller.frames.get("PatientListPage")
                 if pl:
                     pid = pl.get_selected_patient_id()
                     if pid:
-                        sql.execute("SELECT * FROM patients WHERE id = %s", (pid,))
-                        patient_row = sql.fetchone()
-            if patient_row:
-                pid = patient_row[0]
-                sql.execute("UPDATE patients SET diagnosis=%s, diagnosis_class=%s WHERE id=%s", (str(value), cls_str, pid))
-                sql.execute("INSERT INTO diagnosis_history (patient_id, diagnosis, diagnosis_class) VALUES (%s, %s, %s)", (pid, str(value), cls_str))
-                connection.commit()
-        except Exception as e:
-            print("[DB] Could not update patient diagnosis:", e)
-
-        try:
-            if self.controller.user:
-                ensure_predict_column()
-                sql.execute("UPDATE THEGREAT SET PREDICT=%s WHERE USERNAME=%s", (str(value), self.controller.user))
-                connection.commit()
-        except Exception as e:
-            print("[DB] Could not update THEGREAT.PREDICT:", e)
+                        patient_row = db.get_patient(pid)
+            except Exception as e:
+                log.warning("could not load selected patient: %s", e)
+        job = DiagnosisJob(path, patient_row, self.controller.user)
+        self.last_job_id = job.id
+        self.jobs_tree.insert('', 'end', iid=str(job.id), values=(job.patient_name, os.path.basename(path), "queued"))
+        if model_ready():
+            self.result_label.config(text="Diagnosis queued...")
+        else:
+            self.result_label.config(text="Queued — waiting for the model to finish loading...")
+        self.controller.pipeline.submit(job)
+
+    def on_job_event(self, kind, job, payload):
+        iid = str(job.id)
+        if kind == "stage":
+            status = payload
+        elif kind == "done":
+            status = f"done: {job.value} (class {job.cls_str})"
+        else:
+            status = f"error: {payload}"
+        if self.jobs_tree.exists(iid):
+            self.jobs_tree.set(iid, "status", status)
+        is_latest = job.id == self.last_job_id
+
+        if kind == "stage":
+            if is_latest:
+                self.result_label.config(text=f"Running diagnosis: {payload}...")
+            return
+        if kind == "error":
+            if is_latest:
+                self.result_label.config(text=f"Diagnosis failed: {payload}")
+            messagebox.showerror("Diagnosis error", f"{job.patient_name}: {payload}")
+            return
 
-        try:
-            reports_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), "reports")
-            os.makedirs(reports_dir, exist_ok=True)
-            safe_name = (patient_row[2] if patient_row and len(patient_row) > 2 else (self.controller.user or "patient")).replace(" ", "_")
-            ts = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            out_file = os.path.join(reports_dir, f"report_{safe_name}_{ts}.pdf")
-            ok, err = generate_report_pdf(patient_row, path, str(value), cls_str, out_file)
-            if ok:
-                try:
-                    if sys.platform.startswith('win'):
-                        os.startfile(out_file)
-                    else:
-                        webbrowser.open_new(out_file)
-                except Exception:
-                    pass
-                messagebox.showinfo("Report saved", f"PDF report created:\n{out_file}")
-            else:
-                messagebox.showwarning("PDF error", f"Could not create report: {err}")
-        except Exception as e:
-            print("Report generation error:", e)
-            traceback.print_exc()
+        if is_latest:
+            display_text = f"Diagnosis: {job.value}"
+            if job.cls_str:
+                display_text += f" (class {job.cls_str})"
+            self.result_label.config(text=display_text)
+        if job.report:
+            try:
+                if sys.platform.startswith('win'):
+                    os.startfile(job.report)
+                else:
+                    webbrowser.open_new(job.report)
+            except Exception:
+                pass
+        elif payload:
+            messagebox.showwarning("PDF error", payload)
 
 
 # ----------------------------
 # Start app
 # ----------------------------
 def main():
+    setup_logging()
+    metrics.start_exporters()
     app = App()
     app.mainloop()
 
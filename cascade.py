@@ -0,0 +1,207 @@
+# cascade.py
+# Two-stage inference: a small screening model (ResNet18 by default, same
+# 5-class LogSoftmax head) scores every image, and only the images it is not
+# confident about (max probability below the threshold) go through ResNet152.
+#
+#   python train.py --data data/train_224 --arch resnet18 --lr 1e-4 --out screen.pt
+#   set DR_CASCADE=1                      # the app / server / score.py now use the cascade
+#   python cascade.py train.csv --image-dir train_images --thresholds 0.8 0.9 0.95
+#
+# Settings: DR_SCREEN_MODEL (default screen.infer.pt), DR_CASCADE_THRESHOLD
+# (default 0.9). A Cascade is called like the classifier itself (NCHW batch in,
+# log-probabilities out), so model.inference_batch, predict_tensors, the
+# prediction cache and the backends all work unchanged. With test-time
+# augmentation each view is screened on its own.
+#
+# The CLI compares the cascade against ResNet152-only scoring on a set of
+# images: fraction escalated, average latency per image and agreement (plus
+# accuracy / QWK when the CSV has labels).
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+import model
+import metrics
+import settings
+from log_config import setup_logging
+
+SCREEN_MODEL_PATH = settings.resolve_path(settings.get("screen_model", "screen.infer.pt"))
+THRESHOLD = settings.get_float("cascade_threshold", 0.9)
+
+
+def load_screen_model(path=None):
+    """Slim or training checkpoint of a model.ARCHS network (see train.py --arch)."""
+    path = path or SCREEN_MODEL_PATH
+    if not os.path.exists(path):
+        raise FileNotFoundError("screening model %s not found (train one with train.py --arch resnet18)" % path)
+    net = model.load_model(path).eval()
+    return model.to_channels_last(net)
+
+
+class Cascade:
+    """Screening model first, the full classifier only for uncertain rows."""
+
+    def __init__(self, screen, full, threshold=THRESHOLD, screen_version=None):
+        self.screen = screen
+        self.screen_version = screen_version or "in-memory:%x" % id(screen)
+        self.full = full
+        self.threshold = float(threshold)
+        self._lock = threading.Lock()
+        self.images = 0
+        self.escalated = 0
+
+    @property
+    def version_tag(self):
+        return "cascade:%s:%.3f" % (self.screen_version, self.threshold)
+
+    def eval(self):
+        self.screen.eval()
+        self.full.eval()
+        return self
+
+    def __call__(self, batch):
+        with metrics.timer("cascade.screen"):
+            out = self.screen(batch)
+        confidence = torch.exp(out).max(dim=1).values
+        uncertain = torch.nonzero(confidence < self.threshold).flatten()
+        if uncertain.numel():
+            with metrics.timer("cascade.full"):
+                full_out = self.full(batch[uncertain])
+            out = out.clone()
+            out[uncertain] = full_out.to(out.dtype)
+        with self._lock:
+            self.images += batch.shape[0]
+            self.escalated += uncertain.numel()
+        metrics.inc("cascade.images", batch.shape[0])
+        metrics.inc("cascade.escalated", uncertain.numel())
+        return out
+
+    def stats(self):
+        with self._lock:
+            return {"images": self.images, "escalated": self.escalated,
+                    "escalated_fraction": self.escalated / self.images if self.images else 0.0}
+
+
+# ----------------------------
+# Comparison against ResNet152-only
+# ----------------------------
+def _decode_all(paths, workers=None):
+    with ThreadPoolExecutor(max_workers=workers or model.DECODE_WORKERS) as pool:
+        tensors, errors = model.collect_decoded(model.decode_chunk(pool, paths, None))
+    return tensors, errors
+
+
+def _run(net, tensors, batch_size):
+    """(log-probs for every tensor, seconds of model time)."""
+    outs, seconds = [], 0.0
+    with torch.no_grad():
+        for i in range(0, len(tensors), batch_size):
+            batch = torch.stack(tensors[i:i + batch_size]).to(model.device)
+            if model.CHANNELS_LAST:
+                batch = batch.contiguous(memory_format=torch.channels_last)
+            t0 = time.perf_counter()
+            outs.append(net(batch).float().cpu())
+            seconds += time.perf_counter() - t0
+    return torch.cat(outs).numpy(), seconds
+
+
+def compare(screen, full, tensors, thresholds=(THRESHOLD,), batch_size=16, labels=None):
+    """Escalation, latency and agreement with full-only scoring, one row per threshold.
+
+    The screening and full outputs are computed once for every image; each
+    threshold then picks rows from them. Latency per image is measured by
+    actually running a Cascade at every threshold.
+    """
+    full_lp, full_seconds = _run(full, tensors, batch_size)
+    screen_lp, screen_seconds = _run(screen, tensors, batch_size)
+    full_pred = full_lp.argmax(axis=1)
+    confidence = np.exp(screen_lp).max(axis=1)
+    n = len(tensors)
+    rows = [{"name": "full only", "threshold": None, "escalated": 1.0, "ms_per_image": 1000 * full_seconds / n,
+             "agreement": 1.0, "pred": full_pred}]
+    rows.append({"name": "screen only", "threshold": None, "escalated": 0.0, "ms_per_image": 1000 * screen_seconds / n,
+                 "agreement": float((screen_lp.argmax(axis=1) == full_pred).mean()), "pred": screen_lp.argmax(axis=1)})
+    for t in thresholds:
+        escalate = confidence < t
+        pred = np.where(escalate, full_pred, screen_lp.argmax(axis=1))
+        _, seconds = _run(Cascade(screen, full, t), tensors, batch_size)
+        rows.append({"name": "cascade", "threshold": float(t), "escalated": float(escalate.mean()),
+                     "ms_per_image": 1000 * seconds / n, "agreement": float((pred == full_pred).mean()), "pred": pred})
+    if labels is not None:
+        import evaluate
+        known = labels >= 0
+        for row in rows:
+            if known.any():
+                m = evaluate.metrics(labels[known], row["pred"][known])
+                row.update(accuracy=m["accuracy"], qwk=m["qwk"])
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'mode':<14}{'threshold':>10}{'escalated':>11}{'ms/image':>10}{'speedup':>9}{'agreement':>11}"
+          + (f"{'accuracy':>10}{'QWK':>8}" if "qwk" in rows[0] else ""))
+    base = rows[0]["ms_per_image"]
+    for r in rows:
+        t = f"{r['threshold']:.2f}" if r["threshold"] is not None else "-"
+        line = (f"{r['name']:<14}{t:>10}{100 * r['escalated']:>10.1f}%{r['ms_per_image']:>10.1f}"
+                f"{base / r['ms_per_image']:>8.2f}x{100 * r['agreement']:>10.1f}%")
+        if "qwk" in r:
+            line += f"{r['accuracy']:>10.4f}{r['qwk']:>8.4f}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the screening cascade with ResNet152-only scoring")
+    parser.add_argument("source", help="folder, glob or CSV of image ids (labels are used when the CSV has them)")
+    parser.add_argument("--image-dir", default=None, help="CSV only")
+    parser.add_argument("--id-column", default="id_code")
+    parser.add_argument("--label-column", default="diagnosis")
+    parser.add_argument("--ext", default=".png")
+    parser.add_argument("--screen", default=None, help="screening checkpoint (default DR_SCREEN_MODEL)")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[THRESHOLD])
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--limit", type=int, default=None, help="only the first N images")
+    parser.add_argument("--random-weights", action="store_true",
+                        help="untrained resnet18 / resnet152 (latency only; agreement is meaningless)")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    import score
+    items = list(score.iter_inputs(args.source, args.image_dir, args.id_column, args.ext))[:args.limit]
+    if not items:
+        print("[CASCADE] no images found")
+        return 1
+    labels = None
+    if args.source.lower().endswith(".csv"):
+        from dataset import read_rows
+        by_id = dict(read_rows(args.source, args.id_column, args.label_column))
+        labels = np.array([by_id.get(image_id, -1) for image_id, _ in items])
+    if args.random_weights:
+        full, screen = model.build_model().eval(), model.build_model(arch="resnet18").eval()
+    else:
+        full = model.load_for_backend(model.resolve_checkpoint_path()).eval()
+        screen = load_screen_model(args.screen)
+    full, screen = model.to_channels_last(full), model.to_channels_last(screen)
+
+    tensors, errors = _decode_all([path for _, path in items])
+    keep = [k for k, err in enumerate(errors) if err is None]
+    if len(keep) < len(items):
+        print(f"[CASCADE] {len(items) - len(keep)} images could not be decoded, skipped")
+    tensors = [tensors[k] for k in keep]
+    if labels is not None:
+        labels = labels[keep]
+    print(f"[CASCADE] {len(tensors)} images")
+    rows = compare(screen, full, tensors, args.thresholds, args.batch_size or model.DEFAULT_BATCH_SIZE, labels)
+    print_comparison(rows)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+# dataset.py
+# Training datasets.
+#
+# CreateDataset is the loader from training.ipynb: every sample is decoded from
+# the full-size PNG and resized again on every epoch, which dominates epoch
+# time on CPU.
+#
+# build_memmap does that work once: a CSV + image folder becomes
+#   <out>/images.npy   uint8 N x H x W x 3 (RGB, already resized)
+#   <out>/labels.npy   int64 N (-1 where the CSV has no label column)
+#   <out>/meta.json    ids, size and the preprocessing signature
+# and MemmapDataset reads samples from that file without copying them,
+# applying only the cheap augmentations (flip) and normalization.
+#
+#   python dataset.py build train.csv --image-dir train_images --out data/train_224
+#   python dataset.py info data/train_224
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+import torchvision
+from PIL import Image
+
+import preprocessing
+import settings
+
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+
+# the notebook's per-epoch pipeline for CreateDataset (input: cv2 BGR array)
+train_transforms = torchvision.transforms.Compose([
+    torchvision.transforms.ToPILImage(),
+    torchvision.transforms.Resize((224, 224)),
+    torchvision.transforms.RandomHorizontalFlip(p=0.4),
+    torchvision.transforms.ToTensor(),
+    torchvision.transforms.Normalize(mean=MEAN, std=STD)
+])
+
+
+def read_rows(csv_path, id_column="id_code", label_column="diagnosis"):
+    """[(image_id, label)] from a CSV; label is -1 when the column is missing (test sets)."""
+    with open(csv_path, newline="", encoding="utf-8") as fh:
+        return [(row[id_column], int(row[label_column]) if row.get(label_column, "") != "" else -1)
+                for row in csv.DictReader(fh)]
+
+
+def _imread(path):
+    # cv2.imread when OpenCV is installed (as in the notebook), same BGR array via PIL otherwise
+    try:
+        import cv2
+    except ImportError:
+        with Image.open(path) as im:
+            return np.ascontiguousarray(np.asarray(im.convert("RGB"))[:, :, ::-1])
+    return cv2.imread(path)
+
+
+class CreateDataset(Dataset):
+    def __init__(self, df_data, data_dir='../input/', transform=None, ext='.png'):
+        super().__init__()
+        # a pandas DataFrame (as in the notebook) or a list of (id, label)
+        self.df = df_data.values if hasattr(df_data, "values") else df_data
+        self.data_dir = data_dir
+        self.transform = transform
+        self.ext = ext
+
+    def __len__(self):
+        return len(self.df)
+
+    def __getitem__(self, index):
+        img_name, label = self.df[index]
+        img_path = os.path.join(self.data_dir, img_name + self.ext)
+        image = _imread(img_path)
+        if self.transform is not None:
+            image = self.transform(image)
+        return image, label
+
+
+# ----------------------------
+# Memory-mapped build
+# ----------------------------
+def build_memmap(csv_path, image_dir, out_dir, size=224, id_column="id_code", label_column="diagnosis",
+                 ext=".png", crop=None, workers=None, progress=None):
+    """Decode + resize every image once into out_dir/images.npy. Returns the meta dict."""
+    crop = settings.get_bool("crop_border", False) if crop is None else crop
+    rows = read_rows(csv_path, id_column, label_column)
+    os.makedirs(out_dir, exist_ok=True)
+    images_path = os.path.join(out_dir, "images.npy")
+    tmp_path = images_path + ".tmp.npy"
+    images = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(len(rows), size, size, 3))
+    labels = np.array([label for _, label in rows], dtype=np.int64)
+
+    def decode(i):
+        name = rows[i][0]
+        path = os.path.join(image_dir, name if os.path.splitext(name)[1] else name + ext)
+        images[i] = np.asarray(preprocessing.load_fundus(path, size, crop))
+        return i
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as pool:
+        for n, _ in enumerate(pool.map(decode, range(len(rows))), 1):
+            if progress is not None:
+                progress(n, len(rows))
+    images.flush()
+    del images
+    os.replace(tmp_path, images_path)
+    np.save(os.path.join(out_dir, "labels.npy"), labels)
+    meta = {"ids": [name for name, _ in rows], "size": size, "count": len(rows),
+            "source": os.path.abspath(csv_path), "preprocess": preprocessing.signature(size, crop),
+            "build_seconds": time.perf_counter() - t0}
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+    return meta
+
+
+def load_meta(root):
+    with open(os.path.join(root, "meta.json"), "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+class MemmapDataset(Dataset):
+    """Samples from a build_memmap directory.
+
+    The array is opened lazily in each DataLoader worker (copy-on-write
+    mapping, so nothing is read until a sample is touched and the file is
+    never modified). Returns (normalized float CHW tensor, label).
+    """
+
+    # on the 0..255 scale of the stored uint8 pixels
+    _MEAN = torch.tensor(MEAN).view(3, 1, 1) * 255.0
+    _STD = torch.tensor(STD).view(3, 1, 1) * 255.0
+
+    def __init__(self, root, indices=None, flip_p=0.0):
+        self.root = root
+        self.labels = np.load(os.path.join(root, "labels.npy"))
+        self.indices = np.arange(len(self.labels)) if indices is None else np.asarray(indices)
+        self.flip_p = flip_p
+        self._images = None
+
+    def __getstate__(self):
+        # workers get the path, not a pickled copy of the mapping
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = np.load(os.path.join(self.root, "images.npy"), mmap_mode="c")
+        return self._images
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        i = int(self.indices[index])
+        img = torch.from_numpy(self.images[i]).permute(2, 0, 1)
+        if self.flip_p and torch.rand(()) < self.flip_p:
+            img = img.flip(2)
+        return (img.float() - self._MEAN) / self._STD, int(self.labels[i])
+
+
+class SyntheticDataset(Dataset):
+    """Deterministic random images for smoke tests and throughput runs.
+
+    Same output as MemmapDataset: (normalized float CHW tensor, label).
+    """
+
+    def __init__(self, count=64, size=224, num_classes=5, seed=0):
+        self.count = count
+        self.size = size
+        self.num_classes = num_classes
+        self.seed = seed
+        self.labels = np.arange(count) % num_classes
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        g = torch.Generator().manual_seed(self.seed * 1000003 + index)
+        img = torch.randint(0, 256, (3, self.size, self.size), dtype=torch.uint8, generator=g)
+        return (img.float() - MemmapDataset._MEAN) / MemmapDataset._STD, int(self.labels[index])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build / inspect memory-mapped training datasets")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="CSV + image folder -> images.npy / labels.npy")
+    build.add_argument("csv")
+    build.add_argument("--image-dir", required=True)
+    build.add_argument("--out", required=True)
+    build.add_argument("--size", type=int, default=224)
+    build.add_argument("--id-column", default="id_code")
+    build.add_argument("--label-column", default="diagnosis")
+    build.add_argument("--ext", default=".png")
+    build.add_argument("--workers", type=int, default=None)
+    info = sub.add_parser("info", help="print a built dataset's summary")
+    info.add_argument("root")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        def progress(n, total):
+            if n % 500 == 0 or n == total:
+                print(f"[DATA] {n}/{total}")
+        meta = build_memmap(args.csv, args.image_dir, args.out, args.size, args.id_column, args.label_column,
+                            args.ext, workers=args.workers, progress=progress)
+        print(f"[DATA] {meta['count']} images -> {args.out} in {meta['build_seconds']:.1f}s")
+    else:
+        meta = load_meta(args.root)
+        labels = np.load(os.path.join(args.root, "labels.npy"))
+        print(f"{meta['count']} images, {meta['size']}px, {meta['preprocess']}")
+        print("labels:", dict(zip(*[v.tolist() for v in np.unique(labels, return_counts=True)])))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+# evaluate.py
+# Offline evaluation on a labeled CSV (e.g. APTOS train.csv).
+#
+#   python evaluate.py train.csv --image-dir train_images --logits cache/train_logits.npz
+#   python evaluate.py train.csv --image-dir train_images --logits cache/train_logits.npz \
+#                      --thresholds-out thresholds.json
+#
+# The model runs once: the per-image log-probabilities are cached in an .npz
+# (with the model version and preprocessing signature, so a changed model or
+# pipeline re-runs it). Everything after that is vectorized NumPy on the
+# cached array:
+#   - accuracy, confusion matrix and quadratic-weighted kappa (QWK)
+#   - ordinal thresholds: the expected grade sum(p_k * k) is cut into classes
+#     with np.digitize, and the cut points are searched to maximize QWK
+#     (the notebook's round_off_preds with coef=[0.5, 1.5, 2.5, 3.5] is the
+#     starting point)
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import model
+from log_config import setup_logging
+from dataset import read_rows
+
+NUM_CLASSES = len(model.classes)
+DEFAULT_THRESHOLDS = (0.5, 1.5, 2.5, 3.5)
+
+
+# ----------------------------
+# Logits
+# ----------------------------
+def collect_logits(csv_path, image_dir, batch_size=32, tta=None, id_column="id_code",
+                   label_column="diagnosis", ext=".png", progress=None):
+    """Run the model over every CSV row. Returns dict(ids, labels, log_probs, ok)."""
+    rows = read_rows(csv_path, id_column, label_column)
+    paths = [os.path.join(image_dir, name if os.path.splitext(name)[1] else name + ext) for name, _ in rows]
+    log_probs = np.zeros((len(rows), NUM_CLASSES), dtype=np.float32)
+    ok = np.zeros(len(rows), dtype=bool)
+    # chunks keep the decoded tensors of only one slice of the CSV in memory
+    chunk = batch_size * 16
+    for start in range(0, len(paths), chunk):
+        results = model.inference_batch(paths[start:start + chunk], batch_size=batch_size, tta=tta)
+        for k, res in enumerate(results, start):
+            if not res.get('error'):
+                log_probs[k] = np.log(np.clip(res['probs'], 1e-12, None))
+                ok[k] = True
+        if progress is not None:
+            progress(min(start + chunk, len(paths)), len(paths))
+    return {"ids": np.array([name for name, _ in rows]), "labels": np.array([label for _, label in rows]),
+            "log_probs": log_probs, "ok": ok}
+
+
+def cache_key(csv_path, tta=None):
+    # the version is only known once the background load has finished
+    model.get_model()
+    return json.dumps({"csv": os.path.abspath(csv_path), "model": model.model_version(),
+                       "preprocess": model.preprocess_signature(tta)}, sort_keys=True)
+
+
+def load_or_collect(cache_path, csv_path, image_dir, batch_size=32, tta=None, **kwargs):
+    key = cache_key(csv_path, tta)
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as data:
+            if str(data["key"]) == key:
+                return {k: data[k] for k in ("ids", "labels", "log_probs", "ok")}
+        print(f"[EVAL] {cache_path} was made with another model / CSV / preprocessing, re-running")
+    data = collect_logits(csv_path, image_dir, batch_size, tta, **kwargs)
+    if cache_path:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        np.savez(cache_path, key=np.array(key), **data)
+    return data
+
+
+# ----------------------------
+# Metrics (vectorized)
+# ----------------------------
+def confusion_matrix(y_true, y_pred, num_classes=NUM_CLASSES):
+    """Rows: true class, columns: predicted class."""
+    idx = np.asarray(y_true, dtype=np.int64) * num_classes + np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(idx, minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+
+
+_WEIGHTS = {}
+
+
+def _qwk_weights(num_classes):
+    if num_classes not in _WEIGHTS:
+        grades = np.arange(num_classes)
+        _WEIGHTS[num_classes] = (grades[:, None] - grades[None, :]) ** 2 / float((num_classes - 1) ** 2)
+    return _WEIGHTS[num_classes]
+
+
+def qwk_from_confusion(cm):
+    """Quadratic-weighted Cohen's kappa (same value as sklearn's cohen_kappa_score(weights='quadratic'))."""
+    cm = np.asarray(cm, dtype=np.float64)
+    total = cm.sum()
+    if total == 0:
+        return 0.0
+    expected = np.outer(cm.sum(axis=1), cm.sum(axis=0)) / total
+    w = _qwk_weights(cm.shape[0])
+    denom = (w * expected).sum()
+    return 1.0 - (w * cm).sum() / denom if denom else 1.0
+
+
+def quadratic_weighted_kappa(y_true, y_pred, num_classes=NUM_CLASSES):
+    return qwk_from_confusion(confusion_matrix(y_true, y_pred, num_classes))
+
+
+def expected_grade(log_probs):
+    """Continuous ordinal score: sum_k p_k * k."""
+    return np.exp(log_probs) @ np.arange(log_probs.shape[1], dtype=log_probs.dtype)
+
+
+def round_off_preds(preds, coef=DEFAULT_THRESHOLDS):
+    """Vectorized round_off_preds from inference.ipynb: class = number of cut points <= pred."""
+    return np.digitize(preds, coef)
+
+
+def metrics(y_true, y_pred, num_classes=NUM_CLASSES):
+    cm = confusion_matrix(y_true, y_pred, num_classes)
+    return {"accuracy": float(np.trace(cm) / max(1, cm.sum())), "qwk": float(qwk_from_confusion(cm)),
+            "confusion": cm.tolist()}
+
+
+def optimize_thresholds(scores, y_true, init=DEFAULT_THRESHOLDS, grid=None, passes=3, num_classes=NUM_CLASSES):
+    """Coordinate search for the cut points that maximize QWK.
+
+    Each candidate is scored with one np.digitize + np.bincount over all
+    images, so no Python-level loop touches individual predictions.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    y_true = np.asarray(y_true, dtype=np.int64)
+    grid = np.linspace(0.0, num_classes - 1, 161) if grid is None else np.asarray(grid)
+    thresholds = np.array(init, dtype=np.float64)
+    best = quadratic_weighted_kappa(y_true, np.digitize(scores, thresholds), num_classes)
+    for _ in range(passes):
+        improved = False
+        for k in range(len(thresholds)):
+            lo = thresholds[k - 1] if k > 0 else -np.inf
+            hi = thresholds[k + 1] if k + 1 < len(thresholds) else np.inf
+            for candidate in grid[(grid > lo) & (grid < hi)]:
+                trial = thresholds.copy()
+                trial[k] = candidate
+                q = quadratic_weighted_kappa(y_true, np.digitize(scores, trial), num_classes)
+                if q > best + 1e-12:
+                    best, thresholds, improved = q, trial, True
+        if not improved:
+            break
+    return thresholds, best
+
+
+def evaluate(data, thresholds=None, optimize=True):
+    ok = data["ok"] & (data["labels"] >= 0)
+    y = data["labels"][ok]
+    log_probs = data["log_probs"][ok]
+    report = {"images": int(ok.sum()), "skipped": int((~ok).sum())}
+    if not ok.any():
+        return report
+    t0 = time.perf_counter()
+    report["argmax"] = metrics(y, log_probs.argmax(axis=1))
+    scores = expected_grade(log_probs)
+    fixed = np.asarray(thresholds if thresholds is not None else DEFAULT_THRESHOLDS)
+    report["thresholded"] = dict(metrics(y, round_off_preds(scores, fixed)), thresholds=fixed.tolist())
+    if optimize:
+        best, _ = optimize_thresholds(scores, y, init=fixed)
+        report["optimized"] = dict(metrics(y, round_off_preds(scores, best)), thresholds=best.tolist())
+    report["metric_seconds"] = time.perf_counter() - t0
+    return report
+
+
+def print_report(report):
+    print(f"[EVAL] {report['images']} images ({report['skipped']} skipped)")
+    for name in ("argmax", "thresholded", "optimized"):
+        if name not in report:
+            continue
+        r = report[name]
+        extra = "  thresholds " + ", ".join(f"{t:.3f}" for t in r["thresholds"]) if "thresholds" in r else ""
+        print(f"{name:<12} accuracy {r['accuracy']:.4f}  QWK {r['qwk']:.4f}{extra}")
+    if "argmax" in report:
+        print("confusion (argmax; rows true, cols predicted):")
+        for i, row in enumerate(report["argmax"]["confusion"]):
+            print(f"{i:>4}" + "".join(f"{v:>7}" for v in row))
+        print(f"[EVAL] metrics + threshold search took {report['metric_seconds']:.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline evaluation with QWK and threshold optimisation")
+    parser.add_argument("csv", help="labeled CSV (id_code, diagnosis)")
+    parser.add_argument("--image-dir", required=True)
+    parser.add_argument("--logits", default=None, help="cache the model outputs in this .npz")
+    parser.add_argument("--id-column", default="id_code")
+    parser.add_argument("--label-column", default="diagnosis")
+    parser.add_argument("--ext", default=".png")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--tta", choices=model.TTA_MODES, default=None)
+    parser.add_argument("--thresholds", type=float, nargs=NUM_CLASSES - 1, default=None,
+                        help="cut points for the expected grade (default 0.5 1.5 2.5 3.5)")
+    parser.add_argument("--no-optimize", action="store_true")
+    parser.add_argument("--thresholds-out", default=None, help="write the optimized cut points to this JSON file")
+    parser.add_argument("--report", default=None, help="write the full report to this JSON file")
+    parser.add_argument("--random-weights", action="store_true", help="evaluate an untrained model (testing)")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    if args.random_weights:
+        model.registry.use(model.build_model())
+    else:
+        model.warm_up()
+
+    def progress(n, total):
+        print(f"[EVAL] {n}/{total} images")
+    data = load_or_collect(args.logits, args.csv, args.image_dir, args.batch_size, args.tta,
+                           id_column=args.id_column, label_column=args.label_column, ext=args.ext,
+                           progress=progress)
+    report = evaluate(data, args.thresholds, not args.no_optimize)
+    print_report(report)
+    if args.thresholds_out and "optimized" in report:
+        with open(args.thresholds_out, "w") as fh:
+            json.dump({"thresholds": report["optimized"]["thresholds"], "qwk": report["optimized"]["qwk"]}, fh)
+    if args.report:
+        with open(args.report, "w") as fh:
+            json.dump(report, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
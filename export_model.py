@@ -0,0 +1,132 @@
+# export_model.py
+# Turn a training checkpoint (classifier.pt) into inference artifacts.
+#
+#   python export_model.py slim --src classifier.pt --dst classifier.infer.pt [--dtype bf16]
+#   python export_model.py torchscript --src classifier.pt            -> classifier.ts.pt
+#   python export_model.py onnx --src classifier.pt                   -> classifier.onnx
+#   python export_model.py parity --src classifier.pt                 -> compare every exported backend with eager
+#
+# Select the backend at load time with DR_BACKEND=eager|torchscript|onnxruntime.
+
+import argparse
+import glob
+import os
+import sys
+
+import model
+from log_config import setup_logging
+import backends
+
+
+def cmd_slim(args):
+    dst = args.dst or os.path.splitext(args.src)[0] + (".infer.pt" if args.dtype == "fp32" else ".infer-bf16.pt")
+    model.export_inference_checkpoint(args.src, dst, dtype=args.dtype)
+    src_mb = os.path.getsize(args.src) / 1e6
+    dst_mb = os.path.getsize(dst) / 1e6
+    print(f"Wrote {dst} ({args.dtype}, {dst_mb:.1f} MB, training checkpoint was {src_mb:.1f} MB)")
+
+
+def _source_model(args):
+    if getattr(args, "random_weights", False):
+        return model.build_model().eval()
+    return model.load_model(args.src).eval()
+
+
+def cmd_torchscript(args):
+    dst = args.dst or backends.default_artifact_path("torchscript", args.src)
+    backends.export_torchscript(_source_model(args), dst)
+    print(f"Wrote {dst}")
+
+
+def cmd_onnx(args):
+    dst = args.dst or backends.default_artifact_path("onnxruntime", args.src)
+    backends.export_onnx(_source_model(args), dst, opset=args.opset)
+    print(f"Wrote {dst}")
+
+
+def parity_report(eager, candidates, paths, batch_size=8):
+    """Compare each backend's outputs with eager on the same images."""
+    ref = model.inference_batch(paths, batch_size=batch_size, model=eager, tta="off")
+    report = {}
+    for name, net in candidates.items():
+        out = model.inference_batch(paths, batch_size=batch_size, model=net, tta="off")
+        max_diff = 0.0
+        agree = compared = 0
+        for a, b in zip(ref, out):
+            # images that failed to decode have no probs on either side
+            if a.get('error') or b.get('error'):
+                continue
+            compared += 1
+            max_diff = max(max_diff, max(abs(x - y) for x, y in zip(a['probs'], b['probs'])))
+            agree += a['class'] == b['class']
+        report[name] = {"images": compared, "max_abs_prob_diff": max_diff,
+                        "class_agreement": (agree / compared) if compared else None}
+    return report
+
+
+def cmd_parity(args):
+    eager = _source_model(args)
+    paths = sorted(glob.glob(os.path.join(args.images, "*")))
+    candidates = {}
+    for name in ("torchscript", "onnxruntime"):
+        path = backends.default_artifact_path(name, args.src)
+        if not os.path.exists(path):
+            print(f"[PARITY] {name}: {path} not found, skipped")
+            continue
+        candidates[name] = backends.load_backend(name, path)
+    failed = False
+    for name, r in parity_report(eager, candidates, paths).items():
+        if not r["images"]:
+            print(f"[PARITY] {name:<12} no image could be decoded")
+            failed = True
+            continue
+        ok = r["max_abs_prob_diff"] <= args.tolerance and r["class_agreement"] == 1.0
+        failed |= not ok
+        print(f"[PARITY] {name:<12} {r['images']} images  max |dp| = {r['max_abs_prob_diff']:.2e}  "
+              f"class agreement = {100 * r['class_agreement']:.0f}%  {'OK' if ok else 'MISMATCH'}")
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Export inference artifacts from a training checkpoint")
+    sub = parser.add_subparsers(dest="command")
+
+    slim = sub.add_parser("slim", help="weights-only checkpoint that can be memory-mapped")
+    slim.add_argument("--src", default=model.DEFAULT_MODEL_PATH)
+    slim.add_argument("--dst", default=None)
+    slim.add_argument("--dtype", choices=["fp32", "bf16"], default="fp32")
+    slim.set_defaults(func=cmd_slim)
+
+    ts = sub.add_parser("torchscript", help="traced and frozen TorchScript module")
+    ts.add_argument("--src", default=model.DEFAULT_MODEL_PATH)
+    ts.add_argument("--dst", default=None)
+    ts.add_argument("--random-weights", action="store_true")
+    ts.set_defaults(func=cmd_torchscript)
+
+    onnx = sub.add_parser("onnx", help="ONNX model for onnxruntime")
+    onnx.add_argument("--src", default=model.DEFAULT_MODEL_PATH)
+    onnx.add_argument("--dst", default=None)
+    onnx.add_argument("--opset", type=int, default=17)
+    onnx.add_argument("--random-weights", action="store_true")
+    onnx.set_defaults(func=cmd_onnx)
+
+    parity = sub.add_parser("parity", help="check exported backends against eager on sample images")
+    parity.add_argument("--src", default=model.DEFAULT_MODEL_PATH)
+    parity.add_argument("--images", default=os.path.join(model.settings.BASE_DIR, "sampleimages"))
+    parity.add_argument("--tolerance", type=float, default=1e-4)
+    parity.set_defaults(func=cmd_parity)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    setup_logging()
+    if not getattr(args, "func", None):
+        parser.print_help()
+        return 1
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+# feature_cache.py
+# Fine-tuning from cached frozen-layer activations.
+#
+# freeze_layers() keeps conv1 / bn1 / layer1 fixed, but a normal epoch still
+# runs them for every image. With a frozen stem in eval mode its output only
+# depends on (image, augmentation), so it can be computed once:
+#
+#   tail mode  - stem activations (256 x 56 x 56, fp16) for every image and
+#                augmentation are written to an on-disk memmap; each epoch
+#                then runs only layer2..layer4 + fc.
+#   head mode  - pooled layer4 features (2048 floats) are cached and only the
+#                fc Sequential is trained, which takes seconds.
+#
+#   python feature_cache.py --data data/train_224 --cache cache/stem --mode tail --epochs 5
+#   python feature_cache.py --data data/train_224 --cache cache/pooled --mode head --epochs 30
+#
+# --data is a dataset.build_memmap directory. The stem cache needs about
+# 1.6 MB per image per augmentation (~12 GB for APTOS train with flips).
+# The frozen BatchNorm layers run in eval mode (running statistics), unlike
+# the notebook loop where model.train() also put them in batch-stat mode.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from torch import nn
+from torch.utils.data import DataLoader, Dataset
+
+import model
+from log_config import setup_logging
+from dataset import MemmapDataset
+
+AUGMENTATIONS = ("none", "hflip")
+STEM_LAYERS = ("conv1", "bn1", "relu", "maxpool", "layer1")
+TAIL_LAYERS = ("layer2", "layer3", "layer4", "avgpool")
+
+
+def stem_of(net):
+    return nn.Sequential(*[getattr(net, name) for name in STEM_LAYERS])
+
+
+class Tail(nn.Module):
+    """layer2..fc of a ResNet, sharing the modules (and weights) of net."""
+
+    def __init__(self, net):
+        super().__init__()
+        for name in TAIL_LAYERS + ("fc",):
+            setattr(self, name, getattr(net, name))
+
+    def forward(self, x):
+        for name in TAIL_LAYERS:
+            x = getattr(self, name)(x)
+        return self.fc(torch.flatten(x, 1))
+
+
+def _augment(batch, aug):
+    return batch.flip(3) if aug == "hflip" else batch
+
+
+# ----------------------------
+# Cache build
+# ----------------------------
+def build_cache(net, data_root, cache_dir, mode="tail", augmentations=AUGMENTATIONS, batch_size=32,
+                workers=0, progress=None, weights=None):
+    """Run the frozen part of net once per (image, augmentation) into cache_dir/features.npy.
+
+    weights identifies the checkpoint net came from (see model.checkpoint_version)
+    and is stored in meta.json so a cache from other weights is not reused.
+
+    tail: stem activations, fp16, shape (A, N, 256, 56, 56)
+    head: pooled layer4 features, fp32, shape (A, N, 2048)
+    """
+    if mode not in ("tail", "head"):
+        raise ValueError("mode must be 'tail' or 'head'")
+    net = net.eval()
+    ds = MemmapDataset(data_root)
+    frozen = stem_of(net) if mode == "tail" else nn.Sequential(stem_of(net), *[getattr(net, n) for n in TAIL_LAYERS])
+    with torch.no_grad():
+        probe = frozen(torch.zeros(1, 3, 224, 224, device=model.device))
+    feat_shape = tuple(probe.shape[1:]) if mode == "tail" else (probe.shape[1],)
+    dtype = np.float16 if mode == "tail" else np.float32
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, "features.npy")
+    tmp = path + ".tmp.npy"
+    out = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=(len(augmentations), len(ds)) + feat_shape)
+    loader = DataLoader(ds, batch_size=batch_size, shuffle=False, num_workers=workers)
+    t0 = time.perf_counter()
+    start = 0
+    with torch.no_grad():
+        for images, _ in loader:
+            images = images.to(model.device)
+            for a, aug in enumerate(augmentations):
+                feats = frozen(_augment(images, aug))
+                out[a, start:start + len(images)] = feats.reshape((len(images),) + feat_shape).cpu().numpy().astype(dtype)
+            start += len(images)
+            if progress is not None:
+                progress(start, len(ds))
+    out.flush()
+    del out
+    os.replace(tmp, path)
+    np.save(os.path.join(cache_dir, "labels.npy"), ds.labels)
+    meta = {"mode": mode, "augmentations": list(augmentations), "count": len(ds), "shape": list(feat_shape),
+            "data": os.path.abspath(data_root), "weights": weights, "build_seconds": time.perf_counter() - t0}
+    with open(os.path.join(cache_dir, "meta.json"), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+    return meta
+
+
+def load_cache_meta(cache_dir):
+    path = os.path.join(cache_dir, "meta.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+class CachedFeatureDataset(Dataset):
+    """(features, label) from a build_cache directory.
+
+    Each item picks the flipped variant with probability flip_p (the same
+    RandomHorizontalFlip(p=0.4) as the training notebook) or the plain one.
+    """
+
+    def __init__(self, cache_dir, indices=None, flip_p=0.0):
+        self.cache_dir = cache_dir
+        self.meta = load_cache_meta(cache_dir)
+        self.labels = np.load(os.path.join(cache_dir, "labels.npy"))
+        self.indices = np.arange(len(self.labels)) if indices is None else np.asarray(indices)
+        augs = self.meta["augmentations"]
+        self.flip_index = augs.index("hflip") if "hflip" in augs else None
+        self.flip_p = flip_p if self.flip_index is not None else 0.0
+        self._features = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_features"] = None
+        return state
+
+    @property
+    def features(self):
+        if self._features is None:
+            self._features = np.load(os.path.join(self.cache_dir, "features.npy"), mmap_mode="c")
+        return self._features
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        i = int(self.indices[index])
+        a = self.flip_index if self.flip_p and torch.rand(()) < self.flip_p else 0
+        return torch.from_numpy(self.features[a, i]).float(), int(self.labels[i])
+
+
+# ----------------------------
+# Training
+# ----------------------------
+def split_indices(n, valid_size=0.2, seed=0):
+    rng = np.random.RandomState(seed)
+    indices = rng.permutation(n)
+    split = int(np.floor(valid_size * n))
+    return indices[split:], indices[:split]
+
+
+def trainable_part(net, mode):
+    """The module trained from the cache, with requires_grad set to match."""
+    for param in net.parameters():
+        param.requires_grad = False
+    part = Tail(net) if mode == "tail" else net.fc
+    for param in part.parameters():
+        param.requires_grad = True
+    return part
+
+
+def run_epoch(part, loader, criterion, optimizer=None):
+    """One pass over loader; trains when an optimizer is given. Returns (loss, accuracy)."""
+    training = optimizer is not None
+    part.train(training)
+    total_loss = torch.zeros((), device=model.device)
+    correct = torch.zeros((), dtype=torch.long, device=model.device)
+    seen = 0
+    with torch.set_grad_enabled(training):
+        for feats, labels in loader:
+            feats, labels = feats.to(model.device), labels.to(model.device)
+            out = part(feats)
+            loss = criterion(out, labels)
+            if training:
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+            total_loss += loss.detach() * len(labels)
+            correct += (out.argmax(1) == labels).sum()
+            seen += len(labels)
+    seen = max(1, seen)
+    return total_loss.item() / seen, correct.item() / seen
+
+
+def train_from_cache(net, cache_dir, mode, epochs=5, batch_size=64, lr=None, valid_size=0.2, flip_p=0.4,
+                     workers=0, save_path=None):
+    meta = load_cache_meta(cache_dir)
+    if meta is None or meta["mode"] != mode:
+        raise ValueError("%s is not a %s-mode feature cache" % (cache_dir, mode))
+    train_idx, valid_idx = split_indices(meta["count"], valid_size)
+    train_ds = CachedFeatureDataset(cache_dir, train_idx, flip_p)
+    valid_ds = CachedFeatureDataset(cache_dir, valid_idx)
+    if mode == "head":
+        # the whole pooled cache fits in memory; skip the worker processes
+        workers = 0
+    trainloader = DataLoader(train_ds, batch_size=batch_size, shuffle=True, num_workers=workers,
+                             persistent_workers=workers > 0)
+    validloader = DataLoader(valid_ds, batch_size=batch_size, num_workers=workers, persistent_workers=workers > 0)
+
+    part = trainable_part(net, mode)
+    criterion = nn.NLLLoss()
+    # the notebook's fine-tuning lr for the tail; a fresh head needs a larger one
+    lr = lr if lr is not None else (1e-6 if mode == "tail" else 1e-3)
+    optimizer = torch.optim.Adam([p for p in part.parameters() if p.requires_grad], lr=lr)
+    history = []
+    valid_loss_min = np.inf
+    for epoch in range(epochs):
+        t0 = time.perf_counter()
+        train_loss, _ = run_epoch(part, trainloader, criterion, optimizer)
+        valid_loss, valid_acc = run_epoch(part, validloader, criterion) if len(valid_ds) else (0.0, 0.0)
+        seconds = time.perf_counter() - t0
+        history.append({"epoch": epoch + 1, "train_loss": train_loss, "valid_loss": valid_loss,
+                        "valid_accuracy": valid_acc, "seconds": seconds})
+        print(f"[TRAIN:{mode}] epoch {epoch + 1}/{epochs} train loss {train_loss:.3f} "
+              f"valid loss {valid_loss:.3f} valid acc {valid_acc:.3f} ({seconds:.1f}s)")
+        if save_path and valid_loss <= valid_loss_min:
+            valid_loss_min = valid_loss
+            torch.save({'epoch': epoch, 'model_state_dict': net.state_dict(),
+                        'optimizer_state_dict': optimizer.state_dict(), 'loss': valid_loss}, save_path)
+    return history
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fine-tune from cached frozen-layer features")
+    parser.add_argument("--data", required=True, help="dataset.build_memmap directory")
+    parser.add_argument("--cache", required=True, help="feature cache directory (built if missing)")
+    parser.add_argument("--mode", choices=("tail", "head"), default="tail")
+    parser.add_argument("--checkpoint", default=None, help="starting weights (default: random init)")
+    parser.add_argument("--save", default=None, help="write the best checkpoint here (training format)")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--lr", type=float, default=None)
+    parser.add_argument("--valid-size", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--rebuild", action="store_true", help="recompute the cache even if it exists")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    net = model.load_training_checkpoint(args.checkpoint) if args.checkpoint else model.build_model().to(model.device)
+    weights = model.checkpoint_version(args.checkpoint) if args.checkpoint else "random"
+    meta = load_cache_meta(args.cache)
+    if args.rebuild or meta is None or meta["mode"] != args.mode or meta.get("weights") != weights \
+            or meta["data"] != os.path.abspath(args.data):
+        def progress(n, total):
+            print(f"[CACHE] {n}/{total}")
+        meta = build_cache(net, args.data, args.cache, args.mode, workers=args.workers, progress=progress,
+                           weights=weights)
+    print(f"[CACHE] {meta['mode']} cache: {meta['count']} images x {len(meta['augmentations'])} augmentations, "
+          f"built in {meta['build_seconds']:.1f}s")
+    train_from_cache(net, args.cache, args.mode, args.epochs, args.batch_size, args.lr, args.valid_size,
+                     workers=args.workers, save_path=args.save)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# history.py
+# Diagnosis history: one patient's timeline and the progression report
+# ("patients whose class went up in the last N months").
+#
+#   python history.py --months 6                 # every patient in the database
+#   python history.py --months 12 --user doctor1
+#   python history.py --patient 42               # one patient's timeline
+#
+# Both are index range queries (see storage.py): the timeline reads one
+# patient's rows from the (patient_id, date) index, and the report starts
+# from patient_progress, the per-patient summary kept up to date on every
+# save_diagnosis, so neither scans the history table.
+
+import argparse
+import datetime
+import sys
+
+import settings
+from log_config import setup_logging
+
+TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+
+
+def months_before(now, months):
+    """The timestamp `months` calendar months before now (a datetime or a stored timestamp string)."""
+    if not isinstance(now, datetime.datetime):
+        now = datetime.datetime.strptime(str(now)[:19], TIMESTAMP)
+    month = now.month - 1 - months
+    year = now.year + month // 12
+    month = month % 12 + 1
+    # 31 March - 1 month is the last day of February
+    for day in range(now.day, 0, -1):
+        try:
+            return now.replace(year=year, month=month, day=day).strftime(TIMESTAMP)
+        except ValueError:
+            continue
+
+
+def progression_report(db, user=None, months=6, limit=500):
+    """storage.progression for the last `months` months, measured on the database clock."""
+    return db.progression(user, months_before(db.now(), months), limit)
+
+
+def class_change(cls, previous):
+    """'up', 'down' or '' between two class numbers as stored in diagnosis ('' when either is unknown)."""
+    try:
+        cls, previous = int(cls), int(previous)
+    except (TypeError, ValueError):
+        return ""
+    return "up" if cls > previous else "down" if cls < previous else ""
+
+
+def main(argv=None):
+    import storage
+    parser = argparse.ArgumentParser(description="Diagnosis timelines and progression report")
+    parser.add_argument("--backend", choices=storage.BACKENDS, default=None, help="default DR_DB_BACKEND")
+    parser.add_argument("--db", default=None, help="SQLite file (default DR_DB_PATH)")
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--user", default=None, help="only this user's patients (default: all)")
+    parser.add_argument("--patient", type=int, default=None, help="print this patient's timeline instead")
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    name = args.backend or settings.get("db_backend", "mysql")
+    backend = storage.SQLiteBackend(args.db) if name == "sqlite" else storage.make_backend(name)
+    db = storage.Storage(backend, pool_size=1)
+    try:
+        if args.patient is not None:
+            print(f"{'tested':<24}{'class':>6}{'change':>8}  label")
+            for tested_at, cls, label, _, previous in db.patient_history(args.patient):
+                shown = '-' if cls is None else cls
+                print(f"{str(tested_at)[:19]:<24}{shown:>6}{class_change(cls, previous):>8}  {label or ''}")
+            return 0
+        rows = progression_report(db, args.user, args.months, args.limit)
+        print(f"[HISTORY] {len(rows)} patients whose class went up in the last {args.months} months")
+        print(f"{'id':>8}  {'name':<28}{'from':>6}{'to':>4}  last test")
+        for patient_id, patient_name, _, baseline, current, last_at, _ in rows:
+            print(f"{patient_id:>8}  {str(patient_name)[:27]:<28}{baseline:>6}{current:>4}  {str(last_at)[:19]}")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# inference_client.py
+# Client for inference_server.py. InferenceClient.inference_batch mirrors
+# model.inference_batch, so callers can switch between the in-process model
+# and a shared server by setting DR_INFERENCE_URL.
+
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+class InferenceClient:
+    def __init__(self, url, timeout=120.0, health_ttl=30.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        # the server can swap models: /health is re-read after health_ttl
+        # seconds, and on every call while it reports no version (still loading)
+        self.health_ttl = health_ttl
+        self._health = None
+        self._health_at = 0.0
+
+    def health(self, refresh=False):
+        stale = (self._health is None or self._health.get("version") is None
+                 or time.monotonic() - self._health_at > self.health_ttl)
+        if stale or refresh:
+            with urllib.request.urlopen(self.url + "/health", timeout=self.timeout) as resp:
+                self._health = json.loads(resp.read().decode("utf-8"))
+            self._health_at = time.monotonic()
+        return self._health
+
+    def version(self, reported=None):
+        """Cache identity of the server's model; `reported` is the version a /predict response carried."""
+        return "remote:%s:%s" % (self.url, reported or self.health().get("version"))
+
+    def preprocess_signature(self):
+        return self.health().get("preprocess")
+
+    def predict_bytes(self, data):
+        req = urllib.request.Request(self.url + "/predict", data=data, method="POST",
+                                     headers={"Content-Type": "application/octet-stream"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                res = json.loads(resp.read().decode("utf-8"))
+            if self._health is not None and res.get("version") not in (None, self._health.get("version")):
+                # the server moved to another model since /health was read
+                self._health = dict(self._health, version=res["version"])
+            return res
+        except urllib.error.HTTPError as e:
+            try:
+                payload = json.loads(e.read().decode("utf-8"))
+            except Exception:
+                payload = {}
+            return {'class': None, 'label': None, 'probs': None,
+                    'error': payload.get("error") or "HTTP %d" % e.code}
+
+    def _predict_one(self, item):
+        try:
+            if hasattr(item, "read"):
+                data = item.read()
+            else:
+                with open(item, "rb") as fh:
+                    data = fh.read()
+            return self.predict_bytes(data)
+        except Exception as e:
+            return {'class': None, 'label': None, 'probs': None, 'error': str(e)}
+
+    def inference_batch(self, inputs, batch_size=16, progress=None, **_):
+        """Send the images concurrently so the server can batch them together."""
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        if progress:
+            progress("inference")
+        with ThreadPoolExecutor(max_workers=max(1, min(batch_size, len(inputs)))) as pool:
+            return list(pool.map(self._predict_one, inputs))
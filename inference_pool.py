@@ -0,0 +1,182 @@
+# inference_pool.py
+# Multi-process CPU inference: one PyTorch process does not scale well over
+# many cores for concurrent requests (one big intra-op pool, the GIL around
+# decode). InferencePool loads the checkpoint once in the parent, moves the
+# weights to shared memory and starts N worker processes that all use that
+# single copy. Each worker gets its own intra-op thread count.
+#
+#   pool = InferencePool(num_workers=4, threads_per_worker=2).start()
+#   results = pool.map(paths)          # same dicts as model.inference_batch
+#   pool.close()
+#
+# Requests go through one multiprocessing queue; a worker takes the first
+# request it sees plus whatever else is already queued (up to batch_size)
+# and runs them as one batch. A collector thread in the parent matches the
+# results back to the callers' futures. Each worker runs one forward pass
+# before it takes requests and then signals that it is ready; wait_ready()
+# blocks until all of them have, so the first requests (or a benchmark's
+# timer) do not pay for process start-up.
+
+import io
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+import torch.multiprocessing as mp
+
+import model as dr_model
+import settings
+
+
+def _read(item):
+    if isinstance(item, (bytes, bytearray)):
+        return bytes(item)
+    if hasattr(item, "read"):
+        return item.read()
+    with open(item, "rb") as fh:
+        return fh.read()
+
+
+def _worker_main(net, requests, results, ready, threads, batch_size, tta):
+    torch.set_num_threads(max(1, threads))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    net.eval()
+    try:
+        # the first forward pass sets up the thread pool and kernels
+        size = dr_model.INPUT_SIZE
+        dr_model.predict_tensors([torch.zeros(3, size, size)], model=net, tta=tta)
+    finally:
+        ready.release()
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        batch = [item]
+        stop = False
+        while len(batch) < batch_size:
+            try:
+                nxt = requests.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is None:
+                stop = True
+                break
+            batch.append(nxt)
+        try:
+            out = dr_model.inference_batch([io.BytesIO(data) for _, data in batch], batch_size=len(batch),
+                                           model=net, workers=1, tta=tta)
+        except Exception as e:
+            out = [{'class': None, 'label': None, 'probs': None, 'error': str(e)}] * len(batch)
+        for (req_id, _), res in zip(batch, out):
+            results.put((req_id, os.getpid(), res))
+        if stop:
+            break
+
+
+class InferencePool:
+    def __init__(self, num_workers=None, threads_per_worker=None, net=None, batch_size=8,
+                 start_method=None, tta=None):
+        cores = os.cpu_count() or 1
+        self.num_workers = num_workers or settings.get_int("pool_workers", max(1, cores // 2))
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.num_workers)
+        self.batch_size = max(1, batch_size)
+        self.tta = tta or dr_model.TTA_MODE
+        default_method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        self.start_method = start_method or settings.get("pool_start_method", default_method)
+        self._net = net
+        self._ids = itertools.count()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._procs = []
+        self._collector = None
+        self.served_by = {}
+
+    def start(self):
+        net = self._net if self._net is not None else dr_model.get_model()
+        net.eval()
+        # one copy of the weights in shared memory for every worker
+        # (with fork they would be copy-on-write anyway; this also covers spawn)
+        net.share_memory()
+        ctx = mp.get_context(self.start_method)
+        self._requests = ctx.Queue()
+        self._results = ctx.Queue()
+        self._ready = ctx.Semaphore(0)
+        for _ in range(self.num_workers):
+            p = ctx.Process(target=_worker_main, daemon=True,
+                            args=(net, self._requests, self._results, self._ready, self.threads_per_worker,
+                                  self.batch_size, self.tta))
+            p.start()
+            self._procs.append(p)
+        self._collector = threading.Thread(target=self._collect, name="pool-collector", daemon=True)
+        self._collector.start()
+        return self
+
+    def wait_ready(self, timeout=None):
+        """Block until every worker has started and run its warm-up pass."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for _ in range(self.num_workers):
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._ready.acquire(timeout=left):
+                raise TimeoutError("inference pool workers did not start in time")
+        return self
+
+    def _collect(self):
+        while True:
+            msg = self._results.get()
+            if msg is None:
+                break
+            req_id, pid, res = msg
+            self.served_by[pid] = self.served_by.get(pid, 0) + 1
+            with self._lock:
+                fut = self._pending.pop(req_id, None)
+            if fut is not None:
+                fut.set_result(res)
+
+    def submit(self, item):
+        """item: path, file object or raw bytes. Returns a Future of the result dict."""
+        fut = Future()
+        try:
+            data = _read(item)
+        except Exception as e:
+            fut.set_result({'class': None, 'label': None, 'probs': None, 'error': str(e)})
+            return fut
+        req_id = next(self._ids)
+        with self._lock:
+            self._pending[req_id] = fut
+        self._requests.put((req_id, data))
+        return fut
+
+    def map(self, items, timeout=None):
+        futures = [self.submit(i) for i in items]
+        return [f.result(timeout=timeout) for f in futures]
+
+    def inference_batch(self, inputs, batch_size=16, progress=None, **_):
+        # same call shape as model.inference_batch / InferenceClient
+        if progress:
+            progress("inference")
+        return self.map(inputs)
+
+    def close(self):
+        for _ in self._procs:
+            self._requests.put(None)
+        for p in self._procs:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+        self._results.put(None)
+        if self._collector is not None:
+            self._collector.join(timeout=5)
+        self._procs = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,201 @@
+# inference_server.py
+# Standalone HTTP inference service around model.py, so several workstations
+# can share one loaded ResNet152 instead of each loading their own.
+#
+#   python inference_server.py --port 8765 --max-batch 16 --max-wait-ms 10
+#
+#   POST /predict   body = raw image file bytes
+#                   -> {"class": 2, "label": "Moderate", "probs": [...], "version": "..."}
+#   GET  /health    -> model state, version, preprocessing and batching stats
+#   GET  /metrics   -> per-stage latency histograms, Prometheus text format
+#                      (with DR_METRICS=1, see metrics.py)
+#
+# Requests are handled on a thread pool (ThreadingHTTPServer). Each handler
+# puts its image on a queue and waits; a single batcher thread takes up to
+# --max-batch queued images, waiting at most --max-wait-ms after the first
+# one arrives, and runs them through model.inference_batch in one pass.
+
+import argparse
+import io
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import model
+import metrics
+import settings
+from log_config import setup_logging
+
+log = logging.getLogger("dr.server")
+
+
+class MicroBatcher:
+    def __init__(self, max_batch=16, max_wait_ms=10.0):
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._stop = threading.Event()
+        self.batches = 0
+        self.images = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._queue.put(None)
+
+    def submit(self, image_bytes):
+        fut = Future()
+        self._queue.put((image_bytes, fut))
+        return fut
+
+    def _gather(self):
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stop.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        while not self._stop.is_set():
+            batch = self._gather()
+            if not batch:
+                continue
+            try:
+                results = model.inference_batch([io.BytesIO(b) for b, _ in batch], batch_size=len(batch))
+                for (_, fut), res in zip(batch, results):
+                    fut.set_result(res)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            self.batches += 1
+            self.images += len(batch)
+
+    def stats(self):
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "images": self.images,
+            "mean_batch": (self.images / self.batches) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    server_version = "DRInference/1.0"
+    batcher = None
+    request_timeout = 120.0
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._send_json(200, {
+                "state": model.registry.state,
+                "version": model.model_version(),
+                "preprocess": model.preprocess_signature(),
+                "batching": self.batcher.stats(),
+            })
+        elif self.path.rstrip("/") == "/metrics":
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/predict":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            self._send_json(400, {"error": "empty body: POST the image file bytes"})
+            return
+        data = self.rfile.read(length)
+        try:
+            model.get_model(timeout=self.request_timeout)
+            with metrics.timer("server.request"):
+                res = self.batcher.submit(data).result(timeout=self.request_timeout)
+        except Exception as e:
+            self._send_json(503, {"error": str(e)})
+            return
+        if res.get("error"):
+            self._send_json(400, res)
+        else:
+            # lets clients key cached results by the model that produced them
+            self._send_json(200, dict(res, version=model.model_version()))
+
+    def log_message(self, fmt, *args):
+        if settings.get_bool("server_access_log", False):
+            super().log_message(fmt, *args)
+
+
+def make_server(host="127.0.0.1", port=8765, max_batch=16, max_wait_ms=10.0):
+    batcher = MicroBatcher(max_batch, max_wait_ms).start()
+    handler = type("BoundInferenceHandler", (InferenceHandler,), {"batcher": batcher})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    httpd.batcher = batcher
+    return httpd
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diabetic retinopathy inference server")
+    parser.add_argument("--host", default=settings.get("server_host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=settings.get_int("server_port", 8765))
+    parser.add_argument("--max-batch", type=int, default=settings.get_int("server_max_batch", model.DEFAULT_BATCH_SIZE))
+    parser.add_argument("--max-wait-ms", type=float, default=settings.get_float("server_max_wait_ms", 10.0))
+    parser.add_argument("--random-weights", action="store_true", help="serve an untrained model (testing)")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    metrics.start_exporters()
+    if args.random_weights:
+        model.registry.use(model.build_model())
+    else:
+        model.warm_up()
+    httpd = make_server(args.host, args.port, args.max_batch, args.max_wait_ms)
+    log.info("listening", extra={"url": f"http://{args.host}:{args.port}", "max_batch": args.max_batch,
+                                 "max_wait_ms": args.max_wait_ms})
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.batcher.stop()
+        httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
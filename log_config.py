@@ -0,0 +1,65 @@
+# log_config.py
+# Structured logging for the app, the model loader and the servers.
+#
+# Records are one line each, either logfmt-style text (default)
+#   ts=2024-05-01T10:00:00 level=INFO logger=dr.model msg="model loaded" seconds=2.31
+# or JSON with DR_LOG_FORMAT=json. Extra fields passed as
+# log.info("...", extra={"seconds": 2.31}) become keys on the line.
+# DR_LOG_LEVEL sets the level (default INFO).
+
+import json
+import logging
+import sys
+import time
+
+import settings
+
+# attributes every LogRecord has; anything else came in through extra=
+_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _STANDARD and not k.startswith("_")}
+
+
+def _quote(value):
+    text = str(value)
+    if not text or any(c in text for c in ' "='):
+        return '"%s"' % text.replace('"', '\\"')
+    return text
+
+
+class StructuredFormatter(logging.Formatter):
+    def __init__(self, as_json=False):
+        super().__init__()
+        self.as_json = as_json
+
+    def format(self, record):
+        out = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)),
+               "level": record.levelname, "logger": record.name, "msg": record.getMessage()}
+        out.update(_fields(record))
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        if self.as_json:
+            return json.dumps(out, default=str)
+        exc = out.pop("exc", None)
+        line = " ".join("%s=%s" % (k, _quote(v)) for k, v in out.items())
+        return line + ("\n" + exc if exc else "")
+
+
+_configured = False
+
+
+def setup_logging(level=None, fmt=None):
+    """Configure the root logger once (later calls are no-ops)."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    level = level or settings.get("log_level", "INFO")
+    fmt = fmt or settings.get("log_format", "text")
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructuredFormatter(as_json=(fmt == "json")))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
@@ -0,0 +1,229 @@
+# metrics.py
+# Per-stage latency histograms and counters for the diagnosis path.
+#
+#   with metrics.timer("decode"):
+#       ...
+#   @metrics.timed("report_pdf")
+#   def generate_report_pdf(...): ...
+#   metrics.inc("prediction_cache_hits")
+#
+# Off by default (DR_METRICS=1 to enable). When off, timer() hands back one
+# shared no-op context manager and timed() functions do a single flag check,
+# so the hooks can stay in hot code.
+#
+# Export (see start_exporters):
+#   DR_METRICS_PORT=9108       Prometheus text format on http://127.0.0.1:9108/metrics
+#   DR_METRICS_JSONL=path      a JSON snapshot appended every DR_METRICS_INTERVAL seconds (60)
+
+import bisect
+import contextlib
+import functools
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import settings
+
+log = logging.getLogger("dr.metrics")
+
+ENABLED = settings.get_bool("metrics", False)
+# seconds; Prometheus convention
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = bool(on)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def snapshot(self):
+        cumulative = []
+        total = 0
+        for c in self.counts:
+            total += c
+            cumulative.append(total)
+        return {"count": self.count, "sum": self.sum, "errors": self.errors,
+                "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], cumulative))}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+
+    def observe(self, stage, seconds, error=False):
+        with self._lock:
+            h = self.histograms.get(stage)
+            if h is None:
+                h = self.histograms[stage] = Histogram()
+            h.observe(seconds)
+            if error:
+                h.errors += 1
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            return {"time": time.time(), "uptime": time.time() - self.started,
+                    "stages": {k: h.snapshot() for k, h in self.histograms.items()},
+                    "counters": dict(self.counters)}
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+registry = Registry()
+
+
+class _Timer:
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        registry.observe(self.stage, time.perf_counter() - self.t0, exc_type is not None)
+        return False
+
+
+_NULL = contextlib.nullcontext()
+
+
+def timer(stage):
+    return _Timer(stage) if ENABLED else _NULL
+
+
+def timed(stage):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def observe(stage, seconds, error=False):
+    if ENABLED:
+        registry.observe(stage, seconds, error)
+
+
+def inc(name, n=1):
+    if ENABLED:
+        registry.inc(name, n)
+
+
+# ----------------------------
+# Export
+# ----------------------------
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text(snapshot=None):
+    snap = snapshot or registry.snapshot()
+    lines = ["# HELP dr_stage_duration_seconds Time spent per diagnosis stage.",
+             "# TYPE dr_stage_duration_seconds histogram"]
+    for stage, h in sorted(snap["stages"].items()):
+        for le, n in h["buckets"].items():
+            lines.append('dr_stage_duration_seconds_bucket{stage="%s",le="%s"} %d' % (_label(stage), le, n))
+        lines.append('dr_stage_duration_seconds_sum{stage="%s"} %.6f' % (_label(stage), h["sum"]))
+        lines.append('dr_stage_duration_seconds_count{stage="%s"} %d' % (_label(stage), h["count"]))
+    lines += ["# HELP dr_stage_errors_total Stage calls that raised.",
+              "# TYPE dr_stage_errors_total counter"]
+    for stage, h in sorted(snap["stages"].items()):
+        lines.append('dr_stage_errors_total{stage="%s"} %d' % (_label(stage), h["errors"]))
+    lines += ["# HELP dr_events_total Event counters.", "# TYPE dr_events_total counter"]
+    for name, n in sorted(snap["counters"].items()):
+        lines.append('dr_events_total{name="%s"} %d' % (_label(name), n))
+    return "\n".join(lines) + "\n"
+
+
+def dump_jsonl(path, snapshot=None):
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(snapshot or registry.snapshot()) + "\n")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        log.debug("metrics http: " + fmt, *args)
+
+
+def start_http_exporter(port, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    log.info("metrics exporter listening", extra={"host": host, "port": int(port)})
+    return server
+
+
+def start_jsonl_dumper(path, interval=60.0):
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                dump_jsonl(path)
+            except OSError as e:
+                log.warning("could not write metrics snapshot: %s", e)
+
+    threading.Thread(target=loop, name="metrics-jsonl", daemon=True).start()
+    return stop
+
+
+_exporters_started = False
+
+
+def start_exporters():
+    """Start whatever exporters the settings ask for (no-op when metrics are off)."""
+    global _exporters_started
+    if not ENABLED or _exporters_started:
+        return
+    _exporters_started = True
+    port = settings.get_int("metrics_port", 0)
+    if port:
+        try:
+            start_http_exporter(port, settings.get("metrics_host", "127.0.0.1"))
+        except OSError as e:
+            log.warning("metrics exporter not started: %s", e)
+    path = settings.get("metrics_jsonl")
+    if path:
+        start_jsonl_dumper(settings.resolve_path(path), settings.get_float("metrics_interval", 60.0))
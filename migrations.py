@@ -0,0 +1,343 @@
+# migrations.py
+# Versioned schema migrations for the app database (see storage.py).
+#
+#   python migrations.py              # apply pending migrations to the configured backend
+#   python migrations.py --status     # show the current and latest version
+#   python migrations.py --backend sqlite --db app_data.db
+#
+# Each backend has an ordered list of (version, description, steps). The
+# applied versions are recorded in a schema_version table. ensure_current()
+# runs at App start: it reads MAX(version) once per Storage object and only
+# does any DDL or INFORMATION_SCHEMA / PRAGMA work when a migration is
+# pending, so normal operation issues no metadata queries at all.
+#
+# The first migrations bring databases made by older versions of the app
+# (which added tables and columns on every start) to a known state, so their
+# steps check for existing columns / indexes before adding them.
+
+import argparse
+import datetime
+import logging
+import sqlite3
+import sys
+
+import settings
+from log_config import setup_logging
+
+log = logging.getLogger("dr.migrations")
+
+
+class _Context:
+    """What a migration step gets: the connection and a few helpers."""
+
+    def __init__(self, conn, backend):
+        self.conn = conn
+        self.backend = backend
+        self.param = "?" if backend == "sqlite" else "%s"
+
+    def run(self, statement, params=()):
+        cur = self.conn.cursor()
+        try:
+            cur.execute(statement, params)
+            return cur.fetchall() if cur.description else None
+        finally:
+            cur.close()
+
+    def has_column(self, table, column):
+        if self.backend == "sqlite":
+            return any(row[1] == column for row in self.run("PRAGMA table_info(%s)" % table))
+        return self.run("""
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s""", (table, column))[0][0] > 0
+
+    def has_index(self, table, name=None, column=None, unique=False):
+        """Is there an index called `name`, or a (unique) one whose first column is `column`?"""
+        if self.backend == "sqlite":
+            for _, index, is_unique, *_ in self.run("PRAGMA index_list(%s)" % table):
+                first = self.run("PRAGMA index_info(%s)" % index)
+                if index == name or (column and first and first[0][2] == column and (is_unique or not unique)):
+                    return True
+            return False
+        if name:
+            return self.run("""
+                SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s""", (table, name))[0][0] > 0
+        return self.run("""
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+              AND SEQ_IN_INDEX = 1""" + (" AND NON_UNIQUE = 0" if unique else ""), (table, column))[0][0] > 0
+
+
+# ----------------------------
+# Steps
+# ----------------------------
+def sql(statement):
+    return lambda ctx: ctx.run(statement)
+
+
+def add_column(table, column, kind):
+    def step(ctx):
+        if not ctx.has_column(table, column):
+            ctx.run("ALTER TABLE %s ADD COLUMN %s %s" % (table, column, kind))
+    return step
+
+
+def add_index(name, table, columns, unique=False):
+    def step(ctx):
+        if not ctx.has_index(table, name=name):
+            ctx.run("CREATE %sINDEX %s ON %s (%s)" % ("UNIQUE " if unique else "", name, table, ", ".join(columns)))
+    return step
+
+
+def _mysql_unique_username(ctx):
+    if ctx.has_index("THEGREAT", column="USERNAME", unique=True):
+        return
+    error = None
+    # a TEXT column needs a key prefix, a VARCHAR must not be given a longer one
+    for key in ("USERNAME", "USERNAME(191)"):
+        try:
+            ctx.run("CREATE UNIQUE INDEX ux_thegreat_username ON THEGREAT (%s)" % key)
+            return
+        except Exception as e:
+            error = e
+    # e.g. duplicate usernames from before signup checked for them; logins
+    # still work, they are just not index lookups
+    log.warning("could not add a unique index on THEGREAT.USERNAME: %s", error)
+
+
+# patient_progress from the history recorded so far (storage.save_diagnosis
+# keeps it current afterwards). The class is the number in diagnosis;
+# diagnosis_class holds its label.
+_SQLITE_PROGRESS_BACKFILL = """
+    INSERT INTO patient_progress
+    WITH classed AS (
+        SELECT patient_id, CAST(diagnosis AS INTEGER) AS c, created_at,
+               ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY created_at, id) AS first_rank,
+               ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY created_at DESC, id DESC) AS last_rank,
+               LAG(CAST(diagnosis AS INTEGER)) OVER (PARTITION BY patient_id ORDER BY created_at, id) AS previous
+        FROM records WHERE diagnosis GLOB '[0-9]*')
+    SELECT k.patient_id, MAX(p.user_id), COUNT(*),
+           MAX(CASE WHEN first_rank = 1 THEN k.c END), MAX(CASE WHEN first_rank = 1 THEN k.created_at END),
+           MAX(CASE WHEN last_rank = 1 THEN k.c END), MAX(CASE WHEN last_rank = 1 THEN k.created_at END),
+           MAX(CASE WHEN previous IS NULL OR previous <> k.c THEN k.created_at END), MAX(k.c)
+    FROM classed k JOIN patients p ON p.id = k.patient_id
+    GROUP BY k.patient_id"""
+
+_MYSQL_PROGRESS_BACKFILL = """
+    INSERT INTO patient_progress
+    WITH classed AS (
+        SELECT patient_id, CAST(diagnosis AS SIGNED) AS c, test_date,
+               ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY test_date, id) AS first_rank,
+               ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY test_date DESC, id DESC) AS last_rank,
+               LAG(CAST(diagnosis AS SIGNED)) OVER (PARTITION BY patient_id ORDER BY test_date, id) AS previous
+        FROM diagnosis_history WHERE diagnosis REGEXP '^[0-9]+$')
+    SELECT k.patient_id, MAX(p.user), COUNT(*),
+           MAX(CASE WHEN first_rank = 1 THEN k.c END), MAX(CASE WHEN first_rank = 1 THEN k.test_date END),
+           MAX(CASE WHEN last_rank = 1 THEN k.c END), MAX(CASE WHEN last_rank = 1 THEN k.test_date END),
+           MAX(CASE WHEN previous IS NULL OR previous <> k.c THEN k.test_date END), MAX(k.c)
+    FROM classed k JOIN patients p ON p.id = k.patient_id
+    GROUP BY k.patient_id"""
+
+
+SQLITE = [
+    (1, "app tables", [
+        # as shipped in app_data.db
+        sql("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, username TEXT UNIQUE, "
+            "password_hash TEXT, created_at TEXT)"),
+        sql("CREATE TABLE IF NOT EXISTS patients (id INTEGER PRIMARY KEY, user_id INTEGER, name TEXT, "
+            "age INTEGER, gender TEXT, contact TEXT, notes TEXT, created_at TEXT, updated_at TEXT)"),
+        sql("CREATE TABLE IF NOT EXISTS records (id INTEGER PRIMARY KEY, patient_id INTEGER, "
+            "filename TEXT, diagnosis TEXT, created_at TEXT)"),
+    ]),
+    (2, "diagnosis and legacy password columns", [
+        add_column("users", "password", "TEXT"),
+        add_column("users", "predict", "TEXT"),
+        add_column("patients", "diagnosis", "TEXT"),
+        add_column("patients", "diagnosis_class", "TEXT"),
+        add_column("records", "diagnosis_class", "TEXT"),
+    ]),
+    (3, "indexes for patient lists and history", [
+        sql("CREATE INDEX IF NOT EXISTS idx_patients_user ON patients (user_id)"),
+        sql("CREATE INDEX IF NOT EXISTS idx_records_patient_date ON records (patient_id, created_at)"),
+    ]),
+    (4, "patient list paging, prefix search and change tracking", [
+        sql("CREATE INDEX IF NOT EXISTS idx_patients_user_name ON patients (user_id, name COLLATE NOCASE)"),
+        sql("CREATE INDEX IF NOT EXISTS idx_patients_user_contact ON patients (user_id, contact)"),
+        sql("UPDATE patients SET updated_at = COALESCE(created_at, strftime('%Y-%m-%d %H:%M:%f', 'now')) "
+            "WHERE updated_at IS NULL"),
+        sql("CREATE INDEX IF NOT EXISTS idx_patients_user_updated ON patients (user_id, updated_at)"),
+        sql("CREATE TABLE IF NOT EXISTS deleted_patients (patient_id INTEGER, user_id INTEGER, deleted_at TEXT)"),
+        sql("CREATE INDEX IF NOT EXISTS idx_deleted_patients_user ON deleted_patients (user_id, deleted_at)"),
+    ]),
+    (5, "per-patient diagnosis progress summary", [
+        sql("CREATE TABLE IF NOT EXISTS patient_progress (patient_id INTEGER PRIMARY KEY, user_id INTEGER, "
+            "tests INTEGER, first_class INTEGER, first_at TEXT, last_class INTEGER, last_at TEXT, changed_at TEXT, "
+            "worst_class INTEGER)"),
+        sql("CREATE INDEX IF NOT EXISTS idx_progress_user_changed ON patient_progress (user_id, changed_at)"),
+        sql("CREATE INDEX IF NOT EXISTS idx_progress_changed ON patient_progress (changed_at)"),
+        # summarise the history recorded so far; storage.save_diagnosis keeps it current
+        sql("DELETE FROM patient_progress"),
+        sql(_SQLITE_PROGRESS_BACKFILL),
+    ]),
+]
+
+MYSQL = [
+    (1, "app tables", [
+        sql("""
+            CREATE TABLE IF NOT EXISTS patients (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                user VARCHAR(255),
+                name VARCHAR(255),
+                age INT,
+                gender VARCHAR(20),
+                contact VARCHAR(50),
+                notes TEXT
+            )"""),
+        sql("""
+            CREATE TABLE IF NOT EXISTS diagnosis_history (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                patient_id INT,
+                diagnosis VARCHAR(255),
+                diagnosis_class VARCHAR(64),
+                test_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (patient_id) REFERENCES patients(id)
+            )"""),
+    ]),
+    (2, "diagnosis, prediction and password hash columns", [
+        add_column("patients", "diagnosis", "VARCHAR(255) NULL"),
+        add_column("patients", "diagnosis_class", "VARCHAR(64) NULL"),
+        add_column("THEGREAT", "PREDICT", "VARCHAR(255) NULL"),
+        add_column("THEGREAT", "PASSWORD_HASH", "VARCHAR(255) NULL"),
+        add_column("diagnosis_history", "image_path", "VARCHAR(1024) NULL"),
+    ]),
+    (3, "indexes for logins, patient lists and history", [
+        _mysql_unique_username,
+        add_index("idx_patients_user", "patients", ["user"]),
+        # the FOREIGN KEY already indexes patient_id alone; this one serves date ranges per patient
+        add_index("idx_history_patient_date", "diagnosis_history", ["patient_id", "test_date"]),
+    ]),
+    (4, "patient list paging, prefix search and change tracking", [
+        add_index("idx_patients_user_name", "patients", ["user", "name"]),
+        add_index("idx_patients_user_contact", "patients", ["user", "contact"]),
+        # existing rows get the current time; later writes maintain it
+        add_column("patients", "updated_at",
+                   "DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)"),
+        add_index("idx_patients_user_updated", "patients", ["user", "updated_at"]),
+        sql("""
+            CREATE TABLE IF NOT EXISTS deleted_patients (
+                patient_id INT,
+                user VARCHAR(255),
+                deleted_at DATETIME(3)
+            )"""),
+        add_index("idx_deleted_patients_user", "deleted_patients", ["user", "deleted_at"]),
+    ]),
+    (5, "per-patient diagnosis progress summary", [
+        sql("""
+            CREATE TABLE IF NOT EXISTS patient_progress (
+                patient_id INT PRIMARY KEY,
+                user VARCHAR(255),
+                tests INT,
+                first_class INT,
+                first_at DATETIME,
+                last_class INT,
+                last_at DATETIME,
+                changed_at DATETIME,
+                worst_class INT
+            )"""),
+        add_index("idx_progress_user_changed", "patient_progress", ["user", "changed_at"]),
+        add_index("idx_progress_changed", "patient_progress", ["changed_at"]),
+        sql("DELETE FROM patient_progress"),
+        sql(_MYSQL_PROGRESS_BACKFILL),
+    ]),
+]
+
+MIGRATIONS = {"sqlite": SQLITE, "mysql": MYSQL}
+
+_VERSION_TABLE = {
+    "sqlite": "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, description TEXT, applied_at TEXT)",
+    "mysql": "CREATE TABLE IF NOT EXISTS schema_version (version INT PRIMARY KEY, description VARCHAR(255), "
+             "applied_at DATETIME)",
+}
+
+
+def latest_version(backend):
+    return MIGRATIONS[backend][-1][0]
+
+
+def current_version(db):
+    """Highest applied version (0 for a database that has never been migrated)."""
+    try:
+        with db.transaction() as conn:
+            return _Context(conn, db.name).run("SELECT MAX(version) FROM schema_version")[0][0] or 0
+    except Exception as e:
+        if _missing_table(e):
+            return 0
+        raise
+
+
+def _missing_table(exc):
+    if isinstance(exc, sqlite3.OperationalError):
+        return "no such table" in str(exc)
+    return getattr(exc, "errno", None) == 1146  # MySQL ER_NO_SUCH_TABLE
+
+
+def migrate(db, target=None):
+    """Apply pending migrations in order. Returns the versions applied."""
+    migrations = MIGRATIONS[db.name]
+    target = target or migrations[-1][0]
+    version = current_version(db)
+    applied = []
+    for number, description, steps in migrations:
+        if number <= version or number > target:
+            continue
+        # SQLite runs each migration in one transaction; MySQL commits DDL
+        # implicitly, so a failed step there leaves earlier steps applied
+        # and the migration is re-run (its steps check before they change)
+        with db.transaction() as conn:
+            ctx = _Context(conn, db.name)
+            if db.name == "sqlite":
+                # sqlite3 would otherwise run the DDL in autocommit mode
+                ctx.run("BEGIN")
+            ctx.run(_VERSION_TABLE[db.name])
+            for step in steps:
+                step(ctx)
+            ctx.run("INSERT INTO schema_version (version, description, applied_at) VALUES (%s, %s, %s)"
+                    .replace("%s", ctx.param),
+                    (number, description, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        log.info("applied migration", extra={"version": number, "description": description, "backend": db.name})
+        applied.append(number)
+    return applied
+
+
+def ensure_current(db):
+    """Bring the schema up to date once per Storage; later calls cost nothing."""
+    if getattr(db, "schema_current", False):
+        return []
+    applied = migrate(db)
+    db.schema_current = True
+    return applied
+
+
+def main(argv=None):
+    import storage
+    parser = argparse.ArgumentParser(description="Apply the app database migrations")
+    parser.add_argument("--backend", choices=storage.BACKENDS, default=None, help="default DR_DB_BACKEND")
+    parser.add_argument("--db", default=None, help="SQLite file (default DR_DB_PATH)")
+    parser.add_argument("--status", action="store_true", help="only print the schema version")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    name = args.backend or settings.get("db_backend", "mysql")
+    backend = storage.SQLiteBackend(args.db) if name == "sqlite" else storage.make_backend(name)
+    db = storage.Storage(backend, pool_size=1)
+    version = current_version(db)
+    print(f"[MIGRATE] {name}: schema version {version}, latest {latest_version(name)}")
+    if not args.status:
+        applied = migrate(db)
+        print(f"[MIGRATE] applied {', '.join(map(str, applied))}" if applied else "[MIGRATE] up to date")
+    db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
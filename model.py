@@ -1,4 +1,4 @@
-# Importing all packages 
+# Importing all packages
 import numpy as np
 import matplotlib.pyplot as plt
 from torch.utils import data
@@ -13,88 +13,573 @@ from PIL import Image, ImageFile
 import json
 from torch.optim import lr_scheduler
 import random
+import logging
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-print('Imported packages')
+import settings
+import preprocessing
+import metrics
+
+log = logging.getLogger("dr.model")
+log.debug('Imported packages')
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = models.resnet152(pretrained=False)
-num_ftrs = model.fc.in_features
 out_ftrs = 5
-model.fc = nn.Sequential(nn.Linear(num_ftrs, 512),nn.ReLU(),nn.Linear(512,out_ftrs),nn.LogSoftmax(dim=1))
-criterion = nn.NLLLoss()
-optimizer = torch.optim.Adam(filter(lambda p:p.requires_grad,model.parameters()) , lr = 0.00001)
+DEFAULT_MODEL_PATH = os.path.join(settings.BASE_DIR, "classifier.pt")
 
-scheduler = lr_scheduler.StepLR(optimizer, step_size=5, gamma=0.1)
-model.to(device);
-# to unfreeze more layers
 
+# ----------------------------
+# Runtime profile (see autotune.py)
+# ----------------------------
+# Threads, memory layout, batch size and backend picked for this machine by
+# `python autotune.py`. Explicit settings (DR_TORCH_THREADS, DR_BACKEND, ...)
+# win over the profile; a profile made on a different machine is ignored.
+RUNTIME_PROFILE_PATH = settings.resolve_path(settings.get("runtime_profile", "runtime_profile.json"))
+
+
+def machine_fingerprint():
+    return {"cpus": os.cpu_count(), "torch": torch.__version__.split("+")[0], "device": device.type}
+
+
+def load_runtime_profile(path=None):
+    path = RUNTIME_PROFILE_PATH if path is None else path
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError) as e:
+        log.warning("could not read runtime profile %s: %s", path, e)
+        return {}
+    if data.get("machine") != machine_fingerprint():
+        log.warning("runtime profile %s was tuned on another machine (%s), ignoring it; re-run autotune.py",
+                    path, data.get("machine"))
+        return {}
+    return data.get("settings", {})
+
+
+def apply_runtime_profile(profile):
+    threads = settings.get_int("torch_threads", profile.get("threads", 0))
+    interop = settings.get_int("interop_threads", profile.get("interop_threads", 0))
+    if threads:
+        torch.set_num_threads(threads)
+    if interop:
+        try:
+            torch.set_num_interop_threads(interop)
+        except RuntimeError as e:
+            # only possible before any inter-op parallel work has started
+            log.warning("interop threads not applied: %s", e)
+
+
+RUNTIME_PROFILE = load_runtime_profile()
+apply_runtime_profile(RUNTIME_PROFILE)
+CHANNELS_LAST = settings.get_bool("channels_last", RUNTIME_PROFILE.get("channels_last", False))
+DEFAULT_BATCH_SIZE = settings.get_int("batch_size", RUNTIME_PROFILE.get("batch_size", 16))
+
+
+# ResNet variants that take the same head (and the same freeze_layers split);
+# the smaller ones are used as the screening model of cascade.py
+ARCHS = ("resnet18", "resnet34", "resnet50", "resnet152")
+
+
+def build_model(num_classes=out_ftrs, arch="resnet152"):
+    if arch not in ARCHS:
+        raise ValueError("unknown architecture %r (expected one of %s)" % (arch, ", ".join(ARCHS)))
+    model = getattr(models, arch)(pretrained=False)
+    num_ftrs = model.fc.in_features
+    model.fc = nn.Sequential(nn.Linear(num_ftrs, 512),nn.ReLU(),nn.Linear(512,num_classes),nn.LogSoftmax(dim=1))
+    return model
 
-for name,child in model.named_children():
-    if name in ['layer2','layer3','layer4','fc']:
-        #print(name + 'is unfrozen')
-        for param in child.parameters():
-            param.requires_grad = True
-    else:
-        #print(name + 'is frozen')
-        for param in child.parameters():
-            param.requires_grad = False
-optimizer = torch.optim.Adam(filter(lambda p:p.requires_grad,model.parameters()) , lr = 0.000001)
-scheduler = lr_scheduler.StepLR(optimizer, step_size=5, gamma=0.1)
 
-def load_model(path):
+def freeze_layers(model):
+    # to unfreeze more layers
+    for name,child in model.named_children():
+        if name in ['layer2','layer3','layer4','fc']:
+            #print(name + 'is unfrozen')
+            for param in child.parameters():
+                param.requires_grad = True
+        else:
+            #print(name + 'is frozen')
+            for param in child.parameters():
+                param.requires_grad = False
+    return model
+
+
+def build_optimizer(model):
+    # Only needed for training / resuming from a training checkpoint.
+    criterion = nn.NLLLoss()
+    optimizer = torch.optim.Adam(filter(lambda p:p.requires_grad,model.parameters()) , lr = 0.000001)
+    scheduler = lr_scheduler.StepLR(optimizer, step_size=5, gamma=0.1)
+    return criterion, optimizer, scheduler
+
+
+def resolve_checkpoint_path(backend=None):
+    backend = backend or BACKEND
+    if backend != "eager":
+        path = settings.get(backend + "_path")
+        if path:
+            return settings.resolve_path(path)
+        import backends
+        return backends.default_artifact_path(backend, DEFAULT_MODEL_PATH)
+    path = settings.get("model_path")
+    if not path:
+        # prefer the slim inference artifact when it has been exported
+        path = DEFAULT_SLIM_PATH if os.path.exists(DEFAULT_SLIM_PATH) else DEFAULT_MODEL_PATH
+    return settings.resolve_path(path)
+
+
+def _profile_backend():
+    # the tuned backend only if its exported artifact is actually there
+    name = RUNTIME_PROFILE.get("backend", "eager")
+    if name == "eager":
+        return name
+    if os.path.exists(resolve_checkpoint_path(name)):
+        return name
+    log.warning("runtime profile prefers the %s backend but its model file is missing; using eager", name)
+    return "eager"
+
+
+# eager / torchscript / onnxruntime, see backends.py
+BACKEND = settings.get("backend") or _profile_backend()
+
+
+def load_training_checkpoint(path, model=None, optimizer=None):
     #checkpoint = torch.load(path,map_location='cpu')
-    checkpoint = torch.load(path, map_location='cpu', weights_only=False)
+    return training_model_from(torch.load(path, map_location='cpu', weights_only=False), model, optimizer)
+
+
+def training_model_from(checkpoint, model=None, optimizer=None):
+    """The model (and optimizer state) of an already loaded training checkpoint."""
+    if model is None:
+        model = build_model(arch=checkpoint.get('arch', "resnet152"))
     model.load_state_dict(checkpoint['model_state_dict'])
-    optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+    if optimizer is not None and 'optimizer_state_dict' in checkpoint:
+        optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+    model.to(device)
+    return model
 
+
+# ----------------------------
+# Slim inference checkpoint
+# ----------------------------
+# A weights-only file ({'format', 'dtype', 'arch', 'state_dict'}) without the Adam
+# moments or the pickled model object of a training checkpoint. It is saved
+# in torch's zip format so it can be memory-mapped: the weights then live in
+# the page cache and are shared by every process that loads the same file.
+SLIM_FORMAT = "dr-inference-v1"
+DEFAULT_SLIM_PATH = os.path.join(settings.BASE_DIR, "classifier.infer.pt")
+
+
+def export_inference_checkpoint(src, dst, dtype="fp32"):
+    checkpoint = torch.load(src, map_location='cpu', weights_only=False)
+    return save_inference_checkpoint(checkpoint.get('model_state_dict', checkpoint), dst, dtype)
+
+
+def save_inference_checkpoint(state_dict, dst, dtype="fp32", arch="resnet152"):
+    if dtype not in ("fp32", "bf16"):
+        raise ValueError("dtype must be 'fp32' or 'bf16'")
+    slim = {}
+    for k, v in state_dict.items():
+        v = v.detach().cpu()
+        if dtype == "bf16" and v.is_floating_point():
+            v = v.to(torch.bfloat16)
+        slim[k] = v.contiguous().clone()
+    torch.save({'format': SLIM_FORMAT, 'dtype': dtype, 'arch': arch, 'state_dict': slim}, dst)
+    return dst
+
+
+def _build_empty_model(arch="resnet152"):
+    # parameters on the meta device: no RAM and no random init, the real
+    # tensors are attached by load_state_dict(assign=True)
+    try:
+        with torch.device("meta"):
+            return build_model(arch=arch), True
+    except (AttributeError, TypeError, RuntimeError):
+        return build_model(arch=arch), False
+
+
+def read_checkpoint(path, mmap=True):
+    """torch.load a checkpoint of either kind once (weights-only and memory-mapped where the file allows)."""
+    try:
+        return torch.load(path, map_location='cpu', weights_only=True, mmap=mmap)
+    except TypeError:
+        # older torch without mmap support
+        return torch.load(path, map_location='cpu')
+    except Exception:
+        # a training checkpoint in the legacy (non-zip) format or with pickled objects
+        return torch.load(path, map_location='cpu', weights_only=False)
+
+
+def is_slim_checkpoint(checkpoint):
+    return isinstance(checkpoint, dict) and checkpoint.get('format') == SLIM_FORMAT
+
+
+def load_inference_checkpoint(path, mmap=True):
+    try:
+        checkpoint = torch.load(path, map_location='cpu', weights_only=True, mmap=mmap)
+    except TypeError:
+        # older torch without mmap support
+        checkpoint = torch.load(path, map_location='cpu')
+    if not is_slim_checkpoint(checkpoint):
+        raise ValueError("%s is not a slim inference checkpoint" % path)
+    return inference_model_from(checkpoint)
+
+
+def inference_model_from(checkpoint):
+    """The frozen model of an already loaded slim checkpoint."""
+    model, on_meta = _build_empty_model(checkpoint.get('arch', "resnet152"))
+    if on_meta:
+        model.load_state_dict(checkpoint['state_dict'], assign=True)
+    else:
+        model.load_state_dict(checkpoint['state_dict'])
+    if checkpoint.get('dtype') == "bf16":
+        # weights are stored in bf16 to halve the file; compute stays fp32
+        # (this makes a private copy, so bf16 files are not page-cache shared)
+        model.float()
+    for param in model.parameters():
+        param.requires_grad = False
+    model.to(device)
     return model
-def inference(model, file, transform, classes):
-    file = Image.open(file).convert('RGB')
-    img = transform(file).unsqueeze(0)
-    print('Transforming your image...')
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model.eval()
-    with torch.no_grad():
-        print('Passing your image to the model....')
-        out = model(img.to(device))
-        ps = torch.exp(out)
-        top_p, top_class = ps.topk(1, dim=1)
-        value = top_class.item()
-        print("Predicted Severity Value: ", value)
-        print("class is: ", classes[value])
-        print('Your image is printed:')
-        return value, classes[value]
-        # plt.imshow(np.array(file))
-        # plt.show()
-
-
-model = load_model(r"C:\Users\Narendra\Documents\Diabetic Retinopathy\Retinal_blindness_detection_Pytorch\classifier.pt")
-#model = load_model(r"C:\Users\Narendra\Documents\Diabetic Retinopathy\Retinal_blindness_detection_Pytorch\classifier.pt", num_classes=5, device="cpu")                
-
-print("Model loaded Succesfully")
+
+
+def load_model(path, model=None, optimizer=None):
+    """Load either a slim inference checkpoint or a full training checkpoint (the file is read once)."""
+    checkpoint = read_checkpoint(path)
+    if model is None and optimizer is None and is_slim_checkpoint(checkpoint):
+        return inference_model_from(checkpoint)
+    return training_model_from(checkpoint, model, optimizer)
+
+
+def load_for_backend(path, backend=None):
+    """Load whatever the configured backend runs: an nn.Module or a backends.* wrapper."""
+    backend = backend or BACKEND
+    if backend == "eager":
+        return load_model(path)
+    import backends
+    return backends.load_backend(backend, path, settings.get_int("ort_threads", RUNTIME_PROFILE.get("threads", 0)) or None)
+
+
+# DR_CASCADE=1 serves the classifier behind a small screening model (cascade.py)
+CASCADE = settings.get_bool("cascade", False)
+
+
+def load_serving_model(path):
+    """What the registry serves: the classifier, or the screening cascade around it."""
+    net = load_for_backend(path)
+    if not CASCADE:
+        return net
+    import cascade
+    return cascade.Cascade(cascade.load_screen_model(), to_channels_last(net.eval()),
+                           screen_version=checkpoint_version(cascade.SCREEN_MODEL_PATH))
+
+
+def to_channels_last(model):
+    """model in channels-last memory format when CHANNELS_LAST is on (eager nn.Modules only)."""
+    if CHANNELS_LAST and isinstance(model, nn.Module) and not isinstance(model, torch.jit.ScriptModule):
+        return model.to(memory_format=torch.channels_last)
+    return model
+
+
+class ModelRegistry:
+    """Loads the classifier once, on a background thread, and hands it out.
+
+    state goes idle -> loading -> warming -> ready (or failed). Callers that
+    need the model call get(), which blocks until loading has finished.
+    """
+
+    def __init__(self, loader=None, path_resolver=resolve_checkpoint_path):
+        self._loader = loader or load_serving_model
+        self._path_resolver = path_resolver
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        self._model = None
+        self._error = None
+        self.path = None
+        self.version = None
+        self.state = "idle"
+        self.load_seconds = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.state = "loading"
+            self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+            self._thread.start()
+
+    def _load(self):
+        t0 = time.perf_counter()
+        try:
+            self.path = self._path_resolver()
+            log.info("loading checkpoint", extra={"path": self.path})
+            model = self._loader(self.path)
+            model = to_channels_last(model.eval())
+            self.state = "warming"
+            self._warm_up(model)
+            self._model = model
+            self.version = checkpoint_version(self.path)
+            if getattr(model, "version_tag", None):
+                # e.g. the cascade's screening model and threshold
+                self.version += "+" + model.version_tag
+            self.load_seconds = time.perf_counter() - t0
+            metrics.observe("model.load", self.load_seconds)
+            self.state = "ready"
+            log.info("model loaded", extra={"seconds": round(self.load_seconds, 3), "version": self.version})
+        except Exception as e:
+            self._error = e
+            self.state = "failed"
+            log.error("could not load model: %s", e, extra={"path": self.path})
+        finally:
+            self._done.set()
+
+    def _warm_up(self, model):
+        # one dummy pass so the first real diagnosis does not pay for
+        # lazy allocator / kernel selection work
+        with torch.no_grad():
+            model(torch.zeros(1, 3, 224, 224, device=device))
+
+    def is_ready(self):
+        return self.state == "ready"
+
+    def wait(self, timeout=None):
+        self.start()
+        return self._done.wait(timeout)
+
+    def get(self, timeout=None):
+        if not self.wait(timeout):
+            raise TimeoutError("model is still loading")
+        if self._error is not None:
+            raise RuntimeError("model failed to load: %s" % self._error)
+        return self._model
+
+    def use(self, model):
+        """Serve an already built model (tests, benchmarks, random weights)."""
+        model.eval()
+        with self._lock:
+            self._thread = self._thread or threading.current_thread()
+            self._model = model
+            self._error = None
+            self.path = None
+            self.version = "in-memory:%x" % id(model)
+            self.state = "ready"
+            self._done.set()
+
+
+def checkpoint_version(path):
+    # cheap identity for a checkpoint file: name, size and mtime
+    st = os.stat(path)
+    return "%s:%d:%d" % (os.path.basename(path), st.st_size, int(st.st_mtime))
+
+
+registry = ModelRegistry()
+
+
+def warm_up():
+    """Start loading the model in the background (safe to call repeatedly)."""
+    registry.start()
+
+
+def get_model(timeout=None):
+    return registry.get(timeout)
+
+
+def model_version():
+    return registry.version
+
+
 classes = ['No DR', 'Mild', 'Moderate', 'Severe', 'Proliferative DR']
+INPUT_SIZE = 224
+# off by default: classifier.pt was trained on uncropped images
+CROP_BORDER = settings.get_bool("crop_border", False)
+# applied to the 224x224 image from preprocessing.load_fundus
+tensor_transforms = torchvision.transforms.Compose([
+    torchvision.transforms.ToTensor(),
+    torchvision.transforms.Normalize(mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225))
+])
+# full-resolution pipeline, kept for callers that pass their own PIL images.
+# deterministic: flips are done by test-time augmentation instead (see TTA_MODES)
 test_transforms = torchvision.transforms.Compose([
     torchvision.transforms.Resize((224, 224)),
-    torchvision.transforms.RandomHorizontalFlip(p=0.5),
     torchvision.transforms.ToTensor(),
     torchvision.transforms.Normalize(mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225))
 ])
+
+
+# ----------------------------
+# Test-time augmentation
+# ----------------------------
+# All views of a batch go through the model in a single forward pass and
+# their log-probabilities are averaged. "off" is the default, so plain
+# inference is deterministic.
+TTA_MODES = ("off", "flip", "flip_rot")
+TTA_MODE = settings.get("tta_mode", "off")
+
+
+def preprocess_signature(tta=None):
+    """Everything besides the weights that changes what a prediction looks like."""
+    return json.dumps({"decode": preprocessing.signature(INPUT_SIZE, CROP_BORDER),
+                       "transforms": repr(tensor_transforms), "tta": tta or TTA_MODE}, sort_keys=True)
+
+
+def tta_views(batch, mode):
+    """Stack the augmented views of an NCHW batch: returns (V*N, C, H, W), V."""
+    if mode not in TTA_MODES:
+        raise ValueError("unknown TTA mode %r (expected one of %s)" % (mode, ", ".join(TTA_MODES)))
+    views = [batch]
+    if mode in ("flip", "flip_rot"):
+        views.append(torch.flip(batch, dims=[3]))
+    if mode == "flip_rot":
+        # fundus images have no canonical orientation
+        for k in (1, 2, 3):
+            views.append(torch.rot90(batch, k, dims=[2, 3]))
+    return torch.cat(views, dim=0), len(views)
+
+
+def forward_tta(model, batch, mode="off"):
+    """Log-probabilities for an NCHW batch, averaged over the TTA views."""
+    if mode == "off":
+        return model(batch)
+    stacked, n_views = tta_views(batch, mode)
+    out = model(stacked)
+    out = out.view(n_views, batch.shape[0], -1).mean(dim=0)
+    # renormalise the averaged log-probabilities
+    return torch.log_softmax(out, dim=1)
+
+
+DECODE_WORKERS = settings.get_int("decode_workers", min(4, os.cpu_count() or 1))
+
+
+@metrics.timed("decode")
+def load_input(item, transform=None):
+    # paths, file objects and PIL images are all accepted
+    if transform is None:
+        # fast path: reduced-resolution decode, optional border crop, one resize
+        return tensor_transforms(preprocessing.load_fundus(item, INPUT_SIZE, CROP_BORDER))
+    if isinstance(item, Image.Image):
+        img = item.convert('RGB')
+    else:
+        with Image.open(item) as im:
+            img = im.convert('RGB')
+    return transform(img)
+
+
+def decode_chunk(pool, chunk, transform):
+    """Submit load_input for every item of chunk to pool; returns the futures."""
+    return [pool.submit(load_input, item, transform) for item in chunk]
+
+
+def collect_decoded(futures):
+    """(tensors, errors) from decode_chunk futures; a failed item has tensor None and its exception."""
+    tensors, errors = [], []
+    for f in futures:
+        try:
+            tensors.append(f.result())
+            errors.append(None)
+        except Exception as e:
+            tensors.append(None)
+            errors.append(e)
+    return tensors, errors
+
+
+def predict_tensors(tensors, errors=None, model=None, tta=None):
+    """Run one forward pass over already transformed CHW tensors.
+
+    errors (optional, same length) marks inputs that failed to decode; those
+    get an error entry and are left out of the batch.
+    """
+    if model is None:
+        model = get_model()
+    if tta is None:
+        tta = TTA_MODE
+    if errors is None:
+        errors = [None] * len(tensors)
+    good = [t for t, err in zip(tensors, errors) if err is None]
+    probs = None
+    if good:
+        batch = torch.stack(good).to(device)
+        if CHANNELS_LAST:
+            batch = batch.contiguous(memory_format=torch.channels_last)
+        with torch.no_grad(), metrics.timer("forward"):
+            out = forward_tta(model, batch, tta)
+            probs = torch.exp(out).cpu()
+    results = []
+    k = 0
+    for err in errors:
+        if err is not None:
+            results.append({'class': None, 'label': None, 'probs': None, 'error': str(err)})
+            continue
+        p = probs[k]
+        k += 1
+        value = int(p.argmax())
+        results.append({'class': value, 'label': classes[value], 'probs': p.tolist()})
+    return results
+
+
+def inference_batch(inputs, batch_size=None, model=None, transform=None, workers=None, tta=None, progress=None):
+    """Classify many images with one forward pass per batch.
+
+    inputs may be paths or PIL images. Images are decoded on a thread pool
+    (see preprocessing.load_fundus; pass transform to use a torchvision
+    pipeline on the full-resolution image instead),
+    and the next batch is decoded while the current one is in the model.
+    Returns one dict per input, in order:
+    {'class': int, 'label': str, 'probs': [p0..p4]} or {'error': str, ...}
+    for inputs that could not be decoded. tta overrides TTA_MODE; batch_size
+    defaults to DEFAULT_BATCH_SIZE (the runtime profile's, or 16).
+    progress, if given, is called with "decoding" / "inference" per batch.
+    """
+    inputs = list(inputs)
+    if model is None:
+        model = get_model()
+    if tta is None:
+        tta = TTA_MODE
+    batch_size = max(1, int(batch_size or DEFAULT_BATCH_SIZE))
+    results = []
+    if not inputs:
+        return results
+    model.eval()
+    chunks = [inputs[i:i + batch_size] for i in range(0, len(inputs), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers or DECODE_WORKERS) as pool:
+        pending = decode_chunk(pool, chunks[0], transform)
+        for n in range(len(chunks)):
+            if progress:
+                progress("decoding")
+            tensors, errors = collect_decoded(pending)
+            if n + 1 < len(chunks):
+                pending = decode_chunk(pool, chunks[n + 1], transform)
+            if progress:
+                progress("inference")
+            results.extend(predict_tensors(tensors, errors, model=model, tta=tta))
+    return results
+
+
 def main(path):
-    x, y = inference(model, path, test_transforms, classes)
-    return x, y
-# if __name__ == '__model__':
-#     # test_dir = '../Desktop/eye'
-#     # folders = os.listdir(test_dir)
-#     # for num in range(len(folders)):
-#     #     path = test_dir+"/"+folders[num]
-#     #     print(path)
-#     #     inference(model, path, test_transforms, classes)
-#     l = sys.argv
-#     if(len(l)>1):
-#         for i in range(1, len(l)):
-#             print(l[i])
-#             path = l[i]
-#             inference(model, path, test_transforms, classes)
-#     else:
-#         print('please provide the exact path of image !')
+    res = inference_batch([path], batch_size=1)[0]
+    if res.get('error'):
+        raise RuntimeError(res['error'])
+    log.info("prediction", extra={"path": str(path), "value": res['class'], "label": res['label']})
+    return res['class'], res['label']
+
+
+def main_batch(paths, batch_size=None):
+    return [(r['class'], r['label']) for r in inference_batch(paths, batch_size=batch_size)]
+
+
+if __name__ == '__main__':
+    # python model.py eye1.png eye2.jpg ...   (score.py handles folders, globs and CSVs)
+    l = sys.argv
+    if(len(l)>1):
+        from log_config import setup_logging
+        setup_logging()
+        warm_up()
+        for path, res in zip(l[1:], inference_batch(l[1:])):
+            if res.get('error'):
+                print(path, "-> error:", res['error'])
+            else:
+                print(path, "->", res['class'], res['label'])
+    else:
+        print('please provide the exact path of image !')
@@ -0,0 +1,189 @@
+# patient_list.py
+# What the patient list screen shows, kept apart from the Tk widgets so it
+# can be benchmarked (and reasoned about) without a display.
+#
+#   - rows are fetched in keyset pages (storage.patients_page /
+#     search_patients): the first page covers the visible rows plus a
+#     prefetch window, and the next (or previous) page is fetched only when
+#     the user scrolls near the end (or the start) of what is loaded
+#   - only a bounded window of pages around the viewport is kept: a page
+#     fetched at one end evicts rows from the other, so scrolling through
+#     the whole list never holds more than max_rows patients (in the model
+#     or in the Treeview)
+#   - a search text switches to a prefix search on name (or on contact when
+#     it starts with a digit or '+'), also paged
+#   - refresh() asks the database only for rows changed (and ids deleted)
+#     since the previous fetch and returns the edits to apply to the table,
+#     instead of reloading everything
+#
+# DR_PATIENT_PAGE_SIZE sets the page / prefetch size (default 100) and
+# DR_PATIENT_WINDOW_PAGES how many pages are kept (default 5).
+
+import bisect
+
+import settings
+
+PAGE_SIZE = settings.get_int("patient_page_size", 100)
+WINDOW_PAGES = settings.get_int("patient_window_pages", 5)
+
+
+def search_field(text):
+    return "contact" if text[:1] in tuple("+0123456789") else "name"
+
+
+class PatientListModel:
+    """The window of one user's patient list that is loaded, in display order."""
+
+    def __init__(self, db, user, page_size=PAGE_SIZE, window_pages=WINDOW_PAGES):
+        self.db = db
+        self.user = user
+        self.page_size = page_size
+        self.window_rows = page_size * max(2, window_pages)
+        self.max_rows = self.window_rows
+        self.search = ""
+        self.rows = []
+        self._keys = []
+        self._by_id = {}
+        # the window reaches the start / the end of the list
+        self.at_start = True
+        self.exhausted = False
+        self.since = None
+
+    # order: by id, or by (name, id) / (contact, id) while searching
+    def key(self, row):
+        if not self.search:
+            return (row[0],)
+        if search_field(self.search) == "contact":
+            return (row[4] or "", row[0])
+        return ((row[1] or "").lower(), row[0])
+
+    def matches(self, row):
+        if not self.search:
+            return True
+        if search_field(self.search) == "contact":
+            return (row[4] or "").startswith(self.search)
+        return (row[1] or "").lower().startswith(self.search.lower())
+
+    def reset(self, search="", count=None):
+        """Start over (new user or new search text). Returns the first page."""
+        self.search = search.strip()
+        self.rows, self._keys, self._by_id = [], [], {}
+        self.at_start, self.exhausted = True, False
+        # taken before the first page, so nothing changed in between is missed
+        self.since = self.db.now()
+        # a first page larger than the window would evict itself
+        self.max_rows = max(self.window_rows, (count or 0) + self.page_size)
+        return self.load_more(count)[0]
+
+    def _fetch(self, count, forward):
+        # the keyset position: the last row for the next page, the first for the previous one
+        edge = (self.rows[-1] if forward else self.rows[0]) if self.rows else None
+        if not self.search:
+            if forward:
+                return self.db.patients_page(self.user, edge[0] if edge else 0, count)
+            return self.db.patients_page(self.user, limit=count, before_id=edge[0])
+        field = search_field(self.search)
+        key = ((edge[1] if field == "name" else edge[4]) or "", edge[0]) if edge else ("", 0)
+        if forward:
+            return self.db.search_patients(self.user, self.search, field, after=key, limit=count)
+        return self.db.search_patients(self.user, self.search, field, limit=count, before=key)
+
+    def load_more(self, count=None):
+        """Fetch the next page. Returns (rows appended, ids evicted from the start)."""
+        if self.exhausted:
+            return [], []
+        count = count or self.page_size
+        page = self._fetch(count, forward=True)
+        if len(page) < count:
+            self.exhausted = True
+        page = [row for row in page if row[0] not in self._by_id]
+        for row in page:
+            self._keys.append(self.key(row))
+            self.rows.append(row)
+            self._by_id[row[0]] = row
+        evicted = self._evict(len(self.rows) - self.max_rows, from_start=True)
+        return page, evicted
+
+    def load_previous(self, count=None):
+        """Fetch the page before the window. Returns (rows prepended, ids evicted from the end)."""
+        if self.at_start or not self.rows:
+            return [], []
+        count = count or self.page_size
+        page = self._fetch(count, forward=False)
+        if len(page) < count:
+            self.at_start = True
+        page = [row for row in page if row[0] not in self._by_id]
+        self._keys[:0] = [self.key(row) for row in page]
+        self.rows[:0] = page
+        self._by_id.update((row[0], row) for row in page)
+        evicted = self._evict(len(self.rows) - self.max_rows, from_start=False)
+        return page, evicted
+
+    def _evict(self, count, from_start):
+        if count <= 0:
+            return []
+        if from_start:
+            gone, self.rows, self._keys = self.rows[:count], self.rows[count:], self._keys[count:]
+            self.at_start = False
+        else:
+            gone, self.rows, self._keys = self.rows[-count:], self.rows[:-count], self._keys[:-count]
+            self.exhausted = False
+        for row in gone:
+            del self._by_id[row[0]]
+        return [row[0] for row in gone]
+
+    def _remove(self, patient_id):
+        row = self._by_id.pop(patient_id)
+        i = bisect.bisect_left(self._keys, self.key(row))
+        del self._keys[i]
+        del self.rows[i]
+
+    def _insert(self, row):
+        key = self.key(row)
+        i = bisect.bisect_left(self._keys, key)
+        self._keys.insert(i, key)
+        self.rows.insert(i, row)
+        self._by_id[row[0]] = row
+        return i
+
+    def refresh(self):
+        """Apply the changes since the last fetch. Returns [("update", row) | ("insert", index, row) | ("delete", id)]."""
+        if self.since is None:
+            return []
+        now = self.db.now()
+        changed, deleted = self.db.patients_changed(self.user, self.since)
+        self.since = now
+        ops = []
+        for patient_id in deleted:
+            if patient_id in self._by_id:
+                self._remove(patient_id)
+                ops.append(("delete", patient_id))
+        first_key = self._keys[0] if self._keys else None
+        last_key = self._keys[-1] if self._keys else None
+        for row in changed:
+            old = self._by_id.get(row[0])
+            if old is not None:
+                if tuple(old) == tuple(row):
+                    continue
+                if self.matches(row) and self.key(old) == self.key(row):
+                    i = bisect.bisect_left(self._keys, self.key(row))
+                    self.rows[i] = row
+                    self._by_id[row[0]] = row
+                    ops.append(("update", row))
+                    continue
+                # renamed: it moves (or leaves the search results)
+                self._remove(row[0])
+                ops.append(("delete", row[0]))
+            if not self.matches(row):
+                continue
+            # rows outside the loaded window arrive with the page that covers them
+            key = self.key(row)
+            after_start = self.at_start or (first_key is not None and key >= first_key)
+            before_end = self.exhausted or (last_key is not None and key <= last_key)
+            if after_start and before_end:
+                ops.append(("insert", self._insert(row), row))
+        # inserts must not grow the window past its bound; at the end of the
+        # list the new rows are the ones on screen, so trim the other side
+        trim = self._evict(len(self.rows) - self.max_rows, from_start=self.exhausted and not self.at_start)
+        ops.extend(("delete", patient_id) for patient_id in trim)
+        return ops
@@ -0,0 +1,135 @@
+# prediction_cache.py
+# Content-addressed cache for model predictions.
+#
+# The key is sha256(image bytes + model version + preprocessing config), so a
+# re-run on an unchanged file with the same model and settings is a hit, and
+# anything that could change the output (new checkpoint, different TTA mode,
+# different transforms) is a miss. Two tiers:
+#   - an in-memory LRU (OrderedDict) for the current session
+#   - a table in a local SQLite file that survives restarts
+# Both are bounded; the disk tier evicts least-recently-used rows.
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import settings
+
+log = logging.getLogger("dr.cache")
+
+DEFAULT_DB_PATH = os.path.join(settings.BASE_DIR, "app_data.db")
+
+
+def make_key(image_bytes, model_version, preprocess):
+    h = hashlib.sha256()
+    h.update(image_bytes)
+    h.update(b"\0")
+    h.update(str(model_version).encode("utf-8"))
+    h.update(b"\0")
+    h.update(str(preprocess).encode("utf-8"))
+    return h.hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, db_path=DEFAULT_DB_PATH, memory_size=256, disk_size=20000):
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self._db = None
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS prediction_cache (
+                        key TEXT PRIMARY KEY,
+                        result TEXT NOT NULL,
+                        created_at REAL,
+                        last_used REAL
+                    )""")
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_prediction_cache_last_used ON prediction_cache(last_used)")
+                self._db.commit()
+            except Exception as e:
+                log.warning("disk tier disabled: %s", e)
+                self._db = None
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return self._memory[key]
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT result FROM prediction_cache WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        self._db.execute("UPDATE prediction_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+                        self._db.commit()
+                        result = json.loads(row[0])
+                        self._remember(key, result)
+                        self.hits_disk += 1
+                        return result
+                except Exception as e:
+                    log.warning("read failed: %s", e)
+            self.misses += 1
+            return None
+
+    def put(self, key, result):
+        with self._lock:
+            self._remember(key, result)
+            if self._db is None:
+                return
+            try:
+                now = time.time()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO prediction_cache (key, result, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(result), now, now))
+                self._puts += 1
+                # the COUNT is cheap at these sizes, but there is no need to do it on every put
+                if self._puts % 32 == 0:
+                    self._evict()
+                self._db.commit()
+            except Exception as e:
+                log.warning("write failed: %s", e)
+
+    def _evict(self):
+        count = self._db.execute("SELECT COUNT(*) FROM prediction_cache").fetchone()[0]
+        extra = count - self.disk_size
+        if extra > 0:
+            self._db.execute("""
+                DELETE FROM prediction_cache WHERE key IN (
+                    SELECT key FROM prediction_cache ORDER BY last_used ASC LIMIT ?
+                )""", (extra,))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM prediction_cache")
+                self._db.commit()
+
+    def stats(self):
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        hits = self.hits_memory + self.hits_disk
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": (hits / lookups) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
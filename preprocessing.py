@@ -0,0 +1,101 @@
+# preprocessing.py
+# Fast decode + preprocessing for fundus photographs, shared by the model
+# input path and the UI preview.
+#
+# Retinal camera images are often 3000-4000 px wide but the model only sees
+# 224x224. Instead of decoding at full resolution and resizing once at the end:
+#   1. JPEG: Image.draft() lets libjpeg decode at 1/2, 1/4 or 1/8 scale
+#      directly (less work, much less memory). Other formats are decoded
+#      normally and shrunk with Image.reduce(), a cheap integer box filter.
+#   2. Optionally, the dark border around the fundus circle is cropped with a
+#      vectorized NumPy mask computed on a small grayscale copy. The model
+#      input only crops when DR_CROP_BORDER=1 (classifier.pt was trained on
+#      uncropped images; check agreement with bench_preprocess.py --agreement
+#      first), the UI preview always does.
+#   3. One final resize to the target size.
+
+import numpy as np
+from PIL import Image
+
+# The reduced decode keeps about 2x the target size so the final resize
+# still has real pixels to average over.
+DECODE_FACTOR = 2
+BORDER_THRESHOLD = 10
+# short side of the grayscale copy the border mask is computed on
+MASK_SIZE = 128
+
+
+def open_reduced(src, target):
+    """Open src (path / file object / PIL image) as RGB, at least ~target px on its short side."""
+    opened = not isinstance(src, Image.Image)
+    src_img = Image.open(src) if opened else src
+    try:
+        if src_img.format == "JPEG":
+            # draft picks the largest DCT scale that keeps the image >= requested size
+            w, h = src_img.size
+            scale = target / float(min(w, h))
+            if scale < 1.0:
+                src_img.draft("RGB", (int(w * scale) + 1, int(h * scale) + 1))
+        img = src_img.convert("RGB")
+    finally:
+        if opened:
+            src_img.close()
+    factor = min(img.size) // max(1, target)
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img
+
+
+def border_box(arr, threshold=BORDER_THRESHOLD, min_bright=0.01):
+    """Bounding box (left, top, right, bottom) of the rows / columns of a
+    grayscale array that have more than min_bright (a fraction) of their
+    pixels brighter than threshold (so a few noisy JPEG pixels in the border
+    do not count)."""
+    mask = arr > threshold
+    h, w = mask.shape
+    rows = np.flatnonzero(np.count_nonzero(mask, axis=1) > min_bright * w)
+    cols = np.flatnonzero(np.count_nonzero(mask, axis=0) > min_bright * h)
+    if rows.size == 0 or cols.size == 0:
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def crop_border(img, threshold=BORDER_THRESHOLD, min_size=0.25):
+    # the box is found on a small grayscale copy and scaled back up
+    w, h = img.size
+    step = max(1, min(w, h) // MASK_SIZE)
+    small = img.convert("L")
+    if step > 1:
+        small = small.reduce(step)
+    box = border_box(np.asarray(small), threshold)
+    if box is None:
+        return img
+    left, top, right, bottom = (min(v * step, lim) for v, lim in zip(box, (w, h, w, h)))
+    # a box smaller than min_size of the image (nearly black, or a tiny
+    # bright speck) is not a fundus: keep it whole
+    if (right - left) < min_size * w or (bottom - top) < min_size * h:
+        return img
+    if (left, top, right, bottom) == (0, 0, w, h):
+        return img
+    return img.crop((left, top, right, bottom))
+
+
+def load_fundus(src, size=224, crop=False):
+    """Model input: RGB PIL image of exactly size x size."""
+    img = open_reduced(src, size * DECODE_FACTOR)
+    if crop:
+        img = crop_border(img)
+    return img.resize((size, size), Image.BILINEAR)
+
+
+def load_preview(src, max_size=(320, 320), crop=True):
+    """UI thumbnail that keeps the aspect ratio, without a full-resolution decode."""
+    img = open_reduced(src, max(max_size))
+    if crop:
+        img = crop_border(img)
+    img.thumbnail(max_size)
+    return img
+
+
+def signature(size=224, crop=False):
+    return "fundus(size=%d,crop=%s,decode_factor=%d,threshold=%d)" % (size, crop, DECODE_FACTOR, BORDER_THRESHOLD)
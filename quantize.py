@@ -0,0 +1,151 @@
+# quantize.py
+# Post-training int8 quantization of the model.py network for CPU inference.
+#
+#   python quantize.py --src classifier.pt --calib-dir calib_images/ --eval-dir sampleimages/ \
+#                      --dst classifier.int8.pt --report int8_report.json
+#
+# - conv backbone: static int8 quantization (FX graph mode), activation ranges
+#   calibrated on a folder of fundus images
+# - fc head (the two Linear layers): dynamic int8 quantization
+# - LogSoftmax stays in float
+#
+# The result is saved as a frozen TorchScript module and loads through the
+# normal path with DR_BACKEND=int8 (default file classifier.int8.pt).
+# Before enabling it at a site, read the agreement report: class agreement and
+# a confusion matrix of fp32 (rows) against int8 (columns) on --eval-dir.
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import torch
+
+import model
+from log_config import setup_logging
+import backends
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+
+def list_images(folder, limit=None):
+    paths = sorted(p for p in glob.glob(os.path.join(folder, "*")) if p.lower().endswith(IMAGE_EXTS))
+    return paths[:limit] if limit else paths
+
+
+def select_engine():
+    engines = torch.backends.quantized.supported_engines
+    for name in ("x86", "fbgemm", "qnnpack"):
+        if name in engines:
+            torch.backends.quantized.engine = name
+            return name
+    raise RuntimeError("no quantized engine available in this torch build")
+
+
+def quantize_model(net, calib_paths, batch_size=8):
+    from torch.ao.quantization import get_default_qconfig_mapping, default_dynamic_qconfig
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    engine = select_engine()
+    net = net.cpu().eval()
+    qconfig_mapping = (get_default_qconfig_mapping(engine)
+                       .set_module_name("fc.0", default_dynamic_qconfig)
+                       .set_module_name("fc.2", default_dynamic_qconfig))
+    example = (torch.zeros(1, 3, 224, 224),)
+    prepared = prepare_fx(net, qconfig_mapping, example)
+    print(f"[QUANT] calibrating on {len(calib_paths)} images ({engine} engine)...")
+    # calibration only needs the forward pass through the observers
+    model.inference_batch(calib_paths, batch_size=batch_size, model=prepared, tta="off")
+    return convert_fx(prepared)
+
+
+def save_quantized(qnet, dst):
+    with torch.no_grad():
+        traced = torch.jit.trace(qnet, (torch.zeros(2, 3, 224, 224),))
+        frozen = torch.jit.freeze(traced)
+    torch.jit.save(frozen, dst)
+    return dst
+
+
+def agreement_report(fp32, int8, paths, batch_size=8):
+    t0 = time.perf_counter()
+    ref = model.inference_batch(paths, batch_size=batch_size, model=fp32, tta="off")
+    fp32_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    out = model.inference_batch(paths, batch_size=batch_size, model=int8, tta="off")
+    int8_s = time.perf_counter() - t0
+
+    n = len(model.classes)
+    confusion = [[0] * n for _ in range(n)]
+    agree = 0
+    max_diff = 0.0
+    disagreements = []
+    for path, a, b in zip(paths, ref, out):
+        if a.get('error') or b.get('error'):
+            continue
+        confusion[a['class']][b['class']] += 1
+        if a['class'] == b['class']:
+            agree += 1
+        else:
+            disagreements.append({"image": os.path.basename(path), "fp32": a['class'], "int8": b['class']})
+        max_diff = max(max_diff, max(abs(x - y) for x, y in zip(a['probs'], b['probs'])))
+    scored = sum(map(sum, confusion))
+    return {
+        "images": scored,
+        "class_agreement": (agree / scored) if scored else None,
+        "max_abs_prob_diff": max_diff,
+        "confusion_fp32_rows_int8_cols": confusion,
+        "classes": model.classes,
+        "disagreements": disagreements,
+        "ms_per_image": {"fp32": 1000 * fp32_s / max(1, len(paths)), "int8": 1000 * int8_s / max(1, len(paths))},
+    }
+
+
+def print_report(report):
+    print(f"[QUANT] class agreement: {100 * (report['class_agreement'] or 0):.1f}% over {report['images']} images, "
+          f"max |dp| {report['max_abs_prob_diff']:.3f}")
+    print(f"[QUANT] ms/image: fp32 {report['ms_per_image']['fp32']:.1f}, int8 {report['ms_per_image']['int8']:.1f}")
+    print("confusion (rows fp32, cols int8):")
+    print("      " + "".join(f"{i:>6}" for i in range(len(report['classes']))))
+    for i, row in enumerate(report['confusion_fp32_rows_int8_cols']):
+        print(f"{i:>6}" + "".join(f"{v:>6}" for v in row))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Post-training int8 quantization with an agreement report")
+    parser.add_argument("--src", default=model.DEFAULT_MODEL_PATH, help="fp32 checkpoint (training or slim)")
+    parser.add_argument("--dst", default=None, help="default: <src>.int8.pt")
+    parser.add_argument("--calib-dir", required=True, help="folder of fundus images for calibration")
+    parser.add_argument("--calib-limit", type=int, default=200)
+    parser.add_argument("--eval-dir", default=None, help="folder for the agreement report (default: calib dir)")
+    parser.add_argument("--report", default=None, help="write the agreement report to this JSON file")
+    parser.add_argument("--min-agreement", type=float, default=None,
+                        help="exit non-zero if class agreement is below this fraction (e.g. 0.98)")
+    parser.add_argument("--random-weights", action="store_true", help="quantize an untrained model (testing)")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    fp32 = model.build_model().eval() if args.random_weights else model.load_model(args.src).cpu().eval()
+    calib = list_images(args.calib_dir, args.calib_limit)
+    if not calib:
+        raise SystemExit("no calibration images in %s" % args.calib_dir)
+    int8 = quantize_model(fp32, calib)
+    dst = args.dst or backends.default_artifact_path("int8", args.src)
+    save_quantized(int8, dst)
+    print(f"[QUANT] wrote {dst} ({os.path.getsize(dst) / 1e6:.1f} MB)")
+
+    report = agreement_report(fp32, backends.load_backend("int8", dst), list_images(args.eval_dir or args.calib_dir))
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as fh:
+            json.dump(report, fh, indent=2)
+    if args.min_agreement is not None and (report["class_agreement"] or 0) < args.min_agreement:
+        print("[QUANT] agreement below --min-agreement; do not enable int8 for this site")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# score.py
+# Bulk scorer: classify a folder, a glob or a CSV of image ids and stream the
+# results to CSV or JSONL.
+#
+#   python score.py sampleimages/ -o results.csv
+#   python score.py "archive/2023/**/*.jpg" -o results.jsonl --batch-size 32
+#   python score.py test.csv --image-dir test_images/ --ext .png -o submission_scores.csv
+#
+# Memory stays bounded however many images there are: inputs are read lazily
+# (CSV rows are streamed; folders/globs are listed as sorted names only),
+# images are decoded by a small thread pool into a bounded prefetch queue,
+# and results are appended to the output after every batch.
+#
+# Progress is checkpointed next to the output (<output>.progress.json) after
+# each batch: the number of inputs done and the output size at that point.
+# Re-running the same command resumes from there; anything written after the
+# last checkpoint is truncated first, so no row is duplicated or lost. An
+# output without its checkpoint (or the other way round) is never touched:
+# pass --restart to start over.
+
+import argparse
+import collections
+import csv
+import glob
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import model
+from log_config import setup_logging
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+_DONE = object()
+
+
+# ----------------------------
+# Inputs
+# ----------------------------
+def iter_inputs(source, image_dir=None, id_column="id_code", ext=".png"):
+    """Yield (image_id, path) in a stable order, without loading everything."""
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(IMAGE_EXTS))
+        for name in names:
+            yield os.path.splitext(name)[0], os.path.join(source, name)
+    elif source.lower().endswith(".csv") and os.path.isfile(source):
+        base = image_dir or os.path.dirname(os.path.abspath(source))
+        with open(source, newline="", encoding="utf-8") as fh:
+            for row in csv.DictReader(fh):
+                image_id = row[id_column]
+                name = image_id if os.path.splitext(image_id)[1] else image_id + ext
+                yield image_id, os.path.join(base, name)
+    else:
+        for path in sorted(glob.iglob(source, recursive=True)):
+            if path.lower().endswith(IMAGE_EXTS):
+                yield os.path.splitext(os.path.basename(path))[0], path
+
+
+def _decode(path):
+    return model.load_input(path)
+
+
+def prefetch(inputs, skip, batch_size, prefetch_batches, workers):
+    """Decode images on a thread pool into a bounded queue of (id, path, tensor, error)."""
+    out = queue.Queue(maxsize=max(1, prefetch_batches) * batch_size)
+    window = max(1, prefetch_batches) * batch_size
+
+    def producer():
+        inflight = collections.deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                for n, (image_id, path) in enumerate(inputs):
+                    if n < skip:
+                        continue
+                    inflight.append((image_id, path, pool.submit(_decode, path)))
+                    if len(inflight) >= window:
+                        _emit(inflight.popleft())
+                while inflight:
+                    _emit(inflight.popleft())
+            except Exception as e:
+                out.put(("<input>", "", None, e))
+            finally:
+                out.put(_DONE)
+
+    def _emit(entry):
+        image_id, path, fut = entry
+        try:
+            out.put((image_id, path, fut.result(), None))
+        except Exception as e:
+            out.put((image_id, path, None, e))
+
+    threading.Thread(target=producer, name="score-prefetch", daemon=True).start()
+    return out
+
+
+# ----------------------------
+# Output + checkpoint
+# ----------------------------
+class ResultWriter:
+    def __init__(self, path, resume_bytes=0):
+        self.path = path
+        self.jsonl = path.lower().endswith((".jsonl", ".ndjson"))
+        exists = os.path.exists(path)
+        self.fh = open(path, "a+" if exists else "w", newline="", encoding="utf-8")
+        if exists:
+            # drop anything written after the last checkpoint
+            self.fh.truncate(resume_bytes)
+            self.fh.seek(resume_bytes)
+        self._csv = None
+        if not self.jsonl:
+            self._csv = csv.writer(self.fh)
+            if self.fh.tell() == 0:
+                self._csv.writerow(["id", "path", "class", "label"]
+                                   + ["p%d" % i for i in range(len(model.classes))] + ["error"])
+
+    def write(self, image_id, path, res):
+        if self.jsonl:
+            row = {"id": image_id, "path": path}
+            row.update(res)
+            self.fh.write(json.dumps(row) + "\n")
+        else:
+            probs = res.get("probs") or [""] * len(model.classes)
+            self._csv.writerow([image_id, path, res.get("class"), res.get("label")]
+                               + ["%.6f" % p if p != "" else "" for p in probs] + [res.get("error") or ""])
+
+    def sync(self):
+        self.fh.flush()
+        os.fsync(self.fh.fileno())
+        return self.fh.tell()
+
+    def close(self):
+        self.fh.close()
+
+
+def load_checkpoint(path, source):
+    if not os.path.exists(path):
+        return 0, 0
+    with open(path, "r", encoding="utf-8") as fh:
+        state = json.load(fh)
+    if state.get("source") != source:
+        raise SystemExit("checkpoint %s belongs to a different input (%s); use --restart" % (path, state.get("source")))
+    return state.get("done", 0), state.get("output_bytes", 0)
+
+
+def save_checkpoint(path, source, done, output_bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"source": source, "done": done, "output_bytes": output_bytes, "updated": time.time()}, fh)
+    os.replace(tmp, path)
+
+
+# ----------------------------
+# Main loop
+# ----------------------------
+def score(source, output, batch_size=None, prefetch_batches=4, workers=None, image_dir=None,
+          id_column="id_code", ext=".png", restart=False, tta=None, report_every=30.0):
+    ckpt = output + ".progress.json"
+    batch_size = batch_size or model.DEFAULT_BATCH_SIZE
+    if restart:
+        for p in (output, ckpt):
+            if os.path.exists(p):
+                os.remove(p)
+    # resuming needs both files: an output without a checkpoint may be
+    # someone else's results, a checkpoint without its output would skip rows
+    if os.path.exists(output) and not os.path.exists(ckpt):
+        raise SystemExit("%s exists but has no checkpoint (%s); use --restart to overwrite it" % (output, ckpt))
+    if os.path.exists(ckpt) and not os.path.exists(output):
+        raise SystemExit("checkpoint %s has no output %s; use --restart to start over" % (ckpt, output))
+    done, out_bytes = load_checkpoint(ckpt, source)
+    if done and os.path.getsize(output) < out_bytes:
+        raise SystemExit("%s is shorter than checkpoint %s records; use --restart to start over" % (output, ckpt))
+    if done:
+        print(f"[SCORE] resuming after {done} images")
+    net = model.get_model()
+    net.eval()
+    writer = ResultWriter(output, out_bytes)
+    feed = prefetch(iter_inputs(source, image_dir, id_column, ext), done, batch_size,
+                    prefetch_batches, workers or model.DECODE_WORKERS)
+
+    scored = 0
+    t0 = last = time.perf_counter()
+    finished = False
+    try:
+        while not finished:
+            batch = []
+            while len(batch) < batch_size:
+                item = feed.get()
+                if item is _DONE:
+                    finished = True
+                    break
+                batch.append(item)
+            if not batch:
+                break
+            results = model.predict_tensors([b[2] for b in batch], [b[3] for b in batch], model=net, tta=tta)
+            for (image_id, path, _, _), res in zip(batch, results):
+                writer.write(image_id, path, res)
+            done += len(batch)
+            scored += len(batch)
+            save_checkpoint(ckpt, source, done, writer.sync())
+            now = time.perf_counter()
+            if now - last >= report_every:
+                print(f"[SCORE] {done} done, {scored / (now - t0):.1f} img/s")
+                last = now
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - t0
+    rate = scored / elapsed if elapsed > 0 else 0.0
+    print(f"[SCORE] finished: {scored} images this run ({done} total) in {elapsed:.1f}s, {rate:.2f} img/s -> {output}")
+    return {"scored": scored, "done": done, "seconds": elapsed, "images_per_sec": rate}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk diabetic retinopathy scoring")
+    parser.add_argument("source", help="image folder, glob pattern, or CSV of image ids")
+    parser.add_argument("-o", "--output", required=True, help="results file (.csv or .jsonl)")
+    parser.add_argument("--batch-size", type=int, default=None, help="default: the runtime profile's, or 16")
+    parser.add_argument("--prefetch", type=int, default=4, help="decoded batches kept ahead of the model")
+    parser.add_argument("--workers", type=int, default=None, help="decode threads")
+    parser.add_argument("--image-dir", default=None, help="CSV input: folder holding the images")
+    parser.add_argument("--id-column", default="id_code", help="CSV input: image id column")
+    parser.add_argument("--ext", default=".png", help="CSV input: extension added to ids without one")
+    parser.add_argument("--tta", choices=model.TTA_MODES, default=None)
+    parser.add_argument("--restart", action="store_true", help="ignore and remove an existing checkpoint/output")
+    parser.add_argument("--random-weights", action="store_true", help="score with an untrained model (testing)")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    if args.random_weights:
+        model.registry.use(model.build_model())
+    else:
+        model.warm_up()
+    score(args.source, args.output, args.batch_size, args.prefetch, args.workers, args.image_dir,
+          args.id_column, args.ext, args.restart, args.tta)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
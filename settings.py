@@ -0,0 +1,71 @@
+# settings.py
+# Runtime configuration shared by the GUI and the model loader.
+#
+# Every value is looked up in this order:
+#   1. environment variable DR_<NAME> (e.g. DR_MODEL_PATH)
+#   2. the JSON file pointed to by DR_CONFIG (default: dr_config.json next to this file)
+#   3. the default passed by the caller
+
+import os
+import json
+import logging
+
+log = logging.getLogger("dr.settings")
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+CONFIG_FILE = os.environ.get("DR_CONFIG", os.path.join(BASE_DIR, "dr_config.json"))
+
+
+def _load_config_file(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        return data if isinstance(data, dict) else {}
+    except Exception as e:
+        log.warning("could not read config file %s: %s", path, e)
+        return {}
+
+
+_file_values = _load_config_file(CONFIG_FILE)
+
+
+def get(name, default=None):
+    env_key = "DR_" + name.upper()
+    if env_key in os.environ:
+        return os.environ[env_key]
+    if name in _file_values:
+        return _file_values[name]
+    return default
+
+
+def get_bool(name, default=False):
+    value = get(name, default)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def get_int(name, default=0):
+    try:
+        return int(get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_float(name, default=0.0):
+    try:
+        return float(get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def resolve_path(value):
+    """Relative paths in the config are taken relative to the project folder."""
+    if not value:
+        return value
+    value = os.path.expanduser(str(value))
+    if not os.path.isabs(value):
+        value = os.path.join(BASE_DIR, value)
+    return value
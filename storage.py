@@ -0,0 +1,531 @@
+# storage.py
+# Database access for the app: the same operations on MySQL (the original
+# DR_Database schema) or on the bundled SQLite file app_data.db.
+#
+#   DR_DB_BACKEND   mysql (default) or sqlite
+#   DR_DB_PATH      SQLite file (default app_data.db)
+#   DR_MYSQL_HOST / DR_MYSQL_USER / DR_MYSQL_PASSWORD / DR_MYSQL_DATABASE
+#   DR_DB_POOL_SIZE maximum open connections (default 4)
+#
+# Connections come from a small pool: an operation checks one out, runs its
+# statements (one transaction) and puts it back, so the Tk thread and the
+# diagnosis workers can use the database at the same time without sharing a
+# cursor. Statements are parameterised and reused per connection: sqlite3
+# keeps its own prepared-statement cache, and on MySQL every statement gets
+# one server-side prepared cursor per connection. SQLite runs in WAL mode, so
+# readers are not blocked by a writer.
+#
+# The two schemas differ (THEGREAT / patients.user / diagnosis_history on
+# MySQL, users / patients.user_id / records in app_data.db); every query
+# returns rows in the same shape on both (the schemas themselves are created
+# and upgraded by migrations.py):
+#   patient row   (id, user, name, age, gender, contact, notes, diagnosis, diagnosis_class)
+#   patient list  (id, name, age, gender, contact, diagnosis, diagnosis_class)
+#   patient page  (id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at)
+#   history row   (tested_at, diagnosis, diagnosis_class, image, previous diagnosis)
+#   progression   (patient id, name, contact, class at start of window, current class, last test, tests)
+#
+# diagnosis holds the class number (model.classes index, as text) and
+# diagnosis_class its label ("Severe"); class comparisons use diagnosis.
+#
+# patient_progress holds one summary row per patient (first / latest /
+# worst class, when the class last changed, number of tests), updated in
+# the same transaction as every history insert, so reports start from the
+# patients whose class changed in a date range instead of scanning the
+# history.
+
+import contextlib
+import logging
+import queue
+import sqlite3
+import threading
+
+import settings
+
+log = logging.getLogger("dr.storage")
+
+BACKENDS = ("mysql", "sqlite")
+DEFAULT_DB_PATH = settings.resolve_path(settings.get("db_path", "app_data.db"))
+
+
+# ----------------------------
+# Backends
+# ----------------------------
+# millisecond timestamps: updated_at is compared against the last refresh
+NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+# patients whose latest class is above their class when the window opened.
+# Only a patient whose class changed inside the window can qualify, so this
+# is an index range on patient_progress.changed_at, and the class at the
+# start of the window is the first test if that falls inside the window,
+# else one index probe for the last test before it
+_SQLITE_PROGRESSION = """
+    SELECT * FROM (
+        SELECT s.patient_id, p.name, p.contact,
+               CASE WHEN s.first_at >= ? THEN s.first_class ELSE (
+                   SELECT CAST(r.diagnosis AS INTEGER) FROM records r
+                   WHERE r.patient_id = s.patient_id AND r.created_at < ? AND r.diagnosis GLOB '[0-9]*'
+                   ORDER BY r.created_at DESC, r.id DESC LIMIT 1) END AS baseline,
+               s.last_class, s.last_at, s.tests
+        FROM patient_progress s JOIN patients p ON p.id = s.patient_id
+        WHERE {scope} s.changed_at >= ? AND s.last_class > 0
+    ) AS t WHERE last_class > baseline
+    ORDER BY last_class - baseline DESC, last_at DESC LIMIT ?"""
+
+_MYSQL_PROGRESSION = """
+    SELECT * FROM (
+        SELECT s.patient_id, p.name, p.contact,
+               CASE WHEN s.first_at >= %s THEN s.first_class ELSE (
+                   SELECT CAST(h.diagnosis AS SIGNED) FROM diagnosis_history h
+                   WHERE h.patient_id = s.patient_id AND h.test_date < %s AND h.diagnosis REGEXP '^[0-9]+$'
+                   ORDER BY h.test_date DESC, h.id DESC LIMIT 1) END AS baseline,
+               s.last_class, s.last_at, s.tests
+        FROM patient_progress s JOIN patients p ON p.id = s.patient_id
+        WHERE {scope} s.changed_at >= %s AND s.last_class > 0
+    ) AS t WHERE last_class > baseline
+    ORDER BY last_class - baseline DESC, last_at DESC LIMIT %s"""
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    SQL = {
+        # username is UNIQUE: one index probe per login
+        "get_credentials": "SELECT password_hash, password FROM users WHERE username = ?",
+        "add_user": "INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, datetime('now'))",
+        "set_password_hash": "UPDATE users SET password_hash = ?, password = NULL WHERE username = ?",
+        "set_prediction": "UPDATE users SET predict = ? WHERE username = ?",
+        "list_patients": """
+            SELECT p.id, p.name, p.age, p.gender, p.contact, p.diagnosis, p.diagnosis_class
+            FROM patients p JOIN users u ON u.id = p.user_id
+            WHERE u.username = ? ORDER BY p.id""",
+        "get_patient": """
+            SELECT p.id, u.username, p.name, p.age, p.gender, p.contact, p.notes, p.diagnosis, p.diagnosis_class
+            FROM patients p LEFT JOIN users u ON u.id = p.user_id
+            WHERE p.id = ?""",
+        # keyset pages: the next page starts after the last key seen, never OFFSET
+        "patients_page": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user_id = (SELECT id FROM users WHERE username = ?) AND id > ?
+            ORDER BY id LIMIT ?""",
+        # ... and the page before the first key, walking the index backwards
+        "patients_page_before": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user_id = (SELECT id FROM users WHERE username = ?) AND id < ?
+            ORDER BY id DESC LIMIT ?""",
+        # prefix search: a range on the (user_id, name / contact) index, case-insensitive
+        "search_name": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user_id = (SELECT id FROM users WHERE username = ?)
+              AND name COLLATE NOCASE >= ? AND name COLLATE NOCASE < ?
+              AND (name COLLATE NOCASE > ? OR (name COLLATE NOCASE = ? AND id > ?))
+            ORDER BY name COLLATE NOCASE, id LIMIT ?""",
+        "search_name_before": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user_id = (SELECT id FROM users WHERE username = ?)
+              AND name COLLATE NOCASE >= ? AND name COLLATE NOCASE < ?
+              AND (name COLLATE NOCASE < ? OR (name COLLATE NOCASE = ? AND id < ?))
+            ORDER BY name COLLATE NOCASE DESC, id DESC LIMIT ?""",
+        "search_contact": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user_id = (SELECT id FROM users WHERE username = ?)
+              AND contact >= ? AND contact < ?
+              AND (contact > ? OR (contact = ? AND id > ?))
+            ORDER BY contact, id LIMIT ?""",
+        "search_contact_before": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user_id = (SELECT id FROM users WHERE username = ?)
+              AND contact >= ? AND contact < ?
+              AND (contact < ? OR (contact = ? AND id < ?))
+            ORDER BY contact DESC, id DESC LIMIT ?""",
+        "patients_changed": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user_id = (SELECT id FROM users WHERE username = ?) AND updated_at >= ?""",
+        "patients_deleted": """
+            SELECT patient_id FROM deleted_patients
+            WHERE user_id = (SELECT id FROM users WHERE username = ?) AND deleted_at >= ?""",
+        "now": "SELECT NOW_MS",
+        "add_patient": """
+            INSERT INTO patients (user_id, name, age, gender, contact, notes, created_at, updated_at)
+            VALUES ((SELECT id FROM users WHERE username = ?), ?, ?, ?, ?, ?, NOW_MS, NOW_MS)""",
+        "update_patient": """
+            UPDATE patients SET name = ?, age = ?, gender = ?, contact = ?, notes = ?, updated_at = NOW_MS
+            WHERE id = ?""",
+        # a tombstone, so other screens' incremental refresh sees the delete
+        "add_tombstone": """
+            INSERT INTO deleted_patients (patient_id, user_id, deleted_at)
+            SELECT id, user_id, NOW_MS FROM patients WHERE id = ?""",
+        "delete_patient": "DELETE FROM patients WHERE id = ?",
+        "delete_progress": "DELETE FROM patient_progress WHERE patient_id = ?",
+        "set_diagnosis": "UPDATE patients SET diagnosis = ?, diagnosis_class = ?, updated_at = NOW_MS WHERE id = ?",
+        "add_history": """
+            INSERT INTO records (patient_id, diagnosis, diagnosis_class, filename, created_at)
+            VALUES (?, ?, ?, ?, NOW_MS)""",
+        # folds the history row just inserted into the patient's summary
+        "update_progress": """
+            INSERT INTO patient_progress (patient_id, user_id, tests, first_class, first_at, last_class, last_at,
+                                          changed_at, worst_class)
+            SELECT r.patient_id, p.user_id, 1, r.c, r.created_at, r.c, r.created_at, r.created_at, r.c
+            FROM (SELECT patient_id, created_at, CAST(diagnosis AS INTEGER) AS c FROM records
+                  WHERE id = last_insert_rowid() AND diagnosis GLOB '[0-9]*') r
+            JOIN patients p ON p.id = r.patient_id
+            WHERE true
+            ON CONFLICT (patient_id) DO UPDATE SET tests = tests + 1,
+                changed_at = CASE WHEN excluded.last_class <> last_class THEN excluded.last_at ELSE changed_at END,
+                last_class = excluded.last_class, last_at = excluded.last_at,
+                worst_class = MAX(worst_class, excluded.worst_class)""",
+        # the patient's rows from the (patient_id, created_at) index; LAG runs
+        # over all of them, so the first row of a date range still sees the
+        # test before it, and the range is applied afterwards
+        "patient_history": """
+            SELECT created_at, diagnosis, diagnosis_class, filename, previous FROM (
+                SELECT id, created_at, diagnosis, diagnosis_class, filename,
+                       LAG(diagnosis) OVER (ORDER BY created_at, id) AS previous
+                FROM records WHERE patient_id = ?) h
+            WHERE created_at >= ? AND created_at < ?
+            ORDER BY created_at, id""",
+        "progression": _SQLITE_PROGRESSION.format(scope="s.user_id = (SELECT id FROM users WHERE username = ?) AND"),
+        "progression_all": _SQLITE_PROGRESSION.format(scope=""),
+    }
+    SQL = {k: v.replace("NOW_MS", NOW) for k, v in SQL.items()}
+
+    @staticmethod
+    def prefix(text, fold=True):
+        """Range bounds for every string starting with text (fold: compared COLLATE NOCASE)."""
+        low = text.lower() if fold else text
+        return low, low[:-1] + chr(ord(low[-1]) + 1)
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_DB_PATH
+
+    def connect(self):
+        # the pool hands connections to whichever thread needs one
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def execute(self, conn, statement, params=()):
+        return conn.execute(statement, params)
+
+    def is_duplicate(self, exc):
+        return isinstance(exc, sqlite3.IntegrityError)
+
+
+class MySQLBackend:
+    name = "mysql"
+
+    SQL = {
+        "get_credentials": "SELECT PASSWORD_HASH, PASSWORD FROM THEGREAT WHERE USERNAME = %s",
+        # PASSWORD (the old plaintext column) is kept empty for new accounts
+        "add_user": "INSERT INTO THEGREAT (USERNAME, PASSWORD_HASH, PASSWORD) VALUES (%s, %s, '')",
+        "set_password_hash": "UPDATE THEGREAT SET PASSWORD_HASH = %s, PASSWORD = '' WHERE USERNAME = %s",
+        "set_prediction": "UPDATE THEGREAT SET PREDICT = %s WHERE USERNAME = %s",
+        "list_patients": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class
+            FROM patients WHERE user = %s ORDER BY id""",
+        "get_patient": """
+            SELECT id, user, name, age, gender, contact, notes, diagnosis, diagnosis_class
+            FROM patients WHERE id = %s""",
+        "patients_page": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user = %s AND id > %s ORDER BY id LIMIT %s""",
+        "patients_page_before": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user = %s AND id < %s ORDER BY id DESC LIMIT %s""",
+        # LIKE 'prefix%' is a range scan on the (user, name / contact) index
+        "search_name": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user = %s AND name LIKE %s
+              AND (name > %s OR (name = %s AND id > %s))
+            ORDER BY name, id LIMIT %s""",
+        "search_name_before": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user = %s AND name LIKE %s
+              AND (name < %s OR (name = %s AND id < %s))
+            ORDER BY name DESC, id DESC LIMIT %s""",
+        "search_contact": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user = %s AND contact LIKE %s
+              AND (contact > %s OR (contact = %s AND id > %s))
+            ORDER BY contact, id LIMIT %s""",
+        "search_contact_before": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user = %s AND contact LIKE %s
+              AND (contact < %s OR (contact = %s AND id < %s))
+            ORDER BY contact DESC, id DESC LIMIT %s""",
+        "patients_changed": """
+            SELECT id, name, age, gender, contact, diagnosis, diagnosis_class, updated_at FROM patients
+            WHERE user = %s AND updated_at >= %s""",
+        "patients_deleted": "SELECT patient_id FROM deleted_patients WHERE user = %s AND deleted_at >= %s",
+        "now": "SELECT NOW(3)",
+        # updated_at is maintained by the column's ON UPDATE CURRENT_TIMESTAMP(3)
+        "add_patient": "INSERT INTO patients (user, name, age, gender, contact, notes) VALUES (%s, %s, %s, %s, %s, %s)",
+        "update_patient": "UPDATE patients SET name = %s, age = %s, gender = %s, contact = %s, notes = %s WHERE id = %s",
+        "add_tombstone": """
+            INSERT INTO deleted_patients (patient_id, user, deleted_at)
+            SELECT id, user, NOW(3) FROM patients WHERE id = %s""",
+        "delete_patient": "DELETE FROM patients WHERE id = %s",
+        "delete_progress": "DELETE FROM patient_progress WHERE patient_id = %s",
+        "set_diagnosis": "UPDATE patients SET diagnosis = %s, diagnosis_class = %s WHERE id = %s",
+        "add_history": """
+            INSERT INTO diagnosis_history (patient_id, diagnosis, diagnosis_class, image_path)
+            VALUES (%s, %s, %s, %s)""",
+        "update_progress": """
+            INSERT INTO patient_progress (patient_id, user, tests, first_class, first_at, last_class, last_at,
+                                          changed_at, worst_class)
+            SELECT h.patient_id, p.user, 1, CAST(h.diagnosis AS SIGNED), h.test_date,
+                   CAST(h.diagnosis AS SIGNED), h.test_date, h.test_date, CAST(h.diagnosis AS SIGNED)
+            FROM diagnosis_history h JOIN patients p ON p.id = h.patient_id
+            WHERE h.id = LAST_INSERT_ID() AND h.diagnosis REGEXP '^[0-9]+$'
+            ON DUPLICATE KEY UPDATE tests = tests + 1,
+                -- assigned left to right: changed_at must see the old last_class
+                changed_at = IF(VALUES(last_class) <> last_class, VALUES(last_at), changed_at),
+                last_class = VALUES(last_class), last_at = VALUES(last_at),
+                worst_class = GREATEST(worst_class, VALUES(worst_class))""",
+        # LAG over the patient's whole history, then the date range (as on SQLite)
+        "patient_history": """
+            SELECT test_date, diagnosis, diagnosis_class, image_path, previous FROM (
+                SELECT id, test_date, diagnosis, diagnosis_class, image_path,
+                       LAG(diagnosis) OVER (ORDER BY test_date, id) AS previous
+                FROM diagnosis_history WHERE patient_id = %s) h
+            WHERE test_date >= %s AND test_date < %s
+            ORDER BY test_date, id""",
+        "progression": _MYSQL_PROGRESSION.format(scope="s.user = %s AND"),
+        "progression_all": _MYSQL_PROGRESSION.format(scope=""),
+    }
+
+    def __init__(self, host=None, user=None, password=None, database=None):
+        self.params = dict(host=host or settings.get("mysql_host", "localhost"),
+                           user=user or settings.get("mysql_user", "root"),
+                           password=password or settings.get("mysql_password", "root@123"),
+                           database=database or settings.get("mysql_database", "DR_Database"))
+
+    def connect(self):
+        import mysql.connector
+        conn = mysql.connector.connect(**self.params)
+        # one prepared cursor per statement text, reused for the life of the connection
+        conn._dr_prepared = {}
+        return conn
+
+    def execute(self, conn, statement, params=()):
+        cur = conn._dr_prepared.get(statement)
+        if cur is None:
+            cur = conn._dr_prepared[statement] = conn.cursor(prepared=True)
+        cur.execute(statement, params)
+        return cur
+
+    @staticmethod
+    def prefix(text, fold=True):
+        # the column collation decides case sensitivity
+        escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return (escaped + "%",)
+
+    def is_duplicate(self, exc):
+        import mysql.connector
+        return isinstance(exc, mysql.connector.IntegrityError)
+
+
+# ----------------------------
+# Connection pool
+# ----------------------------
+class ConnectionPool:
+    """At most max_size connections; idle ones are reused, callers block when all are out."""
+
+    def __init__(self, connect, max_size=4):
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, int(max_size)))
+        self._lock = threading.Lock()
+        self._all = []
+
+    def acquire(self, timeout=None):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("no database connection available")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            conn = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def release(self, conn, broken=False):
+        if broken:
+            with self._lock:
+                if conn in self._all:
+                    self._all.remove(conn)
+            with contextlib.suppress(Exception):
+                conn.close()
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+    def close(self):
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            with contextlib.suppress(Exception):
+                conn.close()
+
+
+# ----------------------------
+# Storage
+# ----------------------------
+class Storage:
+    """The app's database operations. Safe to call from any thread."""
+
+    def __init__(self, backend, pool_size=4):
+        self.backend = backend
+        self.name = backend.name
+        self.pool = ConnectionPool(backend.connect, pool_size)
+        # set by migrations.ensure_current
+        self.schema_current = False
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """A pooled connection; committed on success, rolled back on error."""
+        conn = self.pool.acquire()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.pool.release(conn, broken)
+
+    def _fetchone(self, key, params):
+        # fetchall: a MySQL cursor must be drained before it is reused
+        rows = self._fetchall(key, params)
+        return rows[0] if rows else None
+
+    def _fetchall(self, key, params):
+        with self.transaction() as conn:
+            return self.backend.execute(conn, self.backend.SQL[key], params).fetchall()
+
+    def _write(self, key, params):
+        with self.transaction() as conn:
+            cur = self.backend.execute(conn, self.backend.SQL[key], params)
+            return cur.lastrowid
+
+    def close(self):
+        self.pool.close()
+
+    # users
+    def get_credentials(self, username):
+        """(password hash, legacy plaintext password) or None; see auth.py."""
+        return self._fetchone("get_credentials", (username,))
+
+    def add_user(self, username, password_hash):
+        """False if the username already exists."""
+        try:
+            self._write("add_user", (username, password_hash))
+        except Exception as e:
+            if self.backend.is_duplicate(e):
+                return False
+            raise
+        return True
+
+    def set_password_hash(self, username, password_hash):
+        self._write("set_password_hash", (password_hash, username))
+
+    def set_last_prediction(self, username, value):
+        self._write("set_prediction", (str(value), username))
+
+    # patients
+    def list_patients(self, user):
+        return self._fetchall("list_patients", (user,))
+
+    def patients_page(self, user, after_id=0, limit=200, before_id=None):
+        """The next `limit` patients (by id) after after_id, or the `limit` before before_id; in id order."""
+        if before_id is not None:
+            return self._fetchall("patients_page_before", (user, before_id, limit))[::-1]
+        return self._fetchall("patients_page", (user, after_id, limit))
+
+    def search_patients(self, user, text, field="name", after=("", 0), limit=200, before=None):
+        """Patients whose name (or contact) starts with text, in (field, id) order, after the key `after` (or before `before`)."""
+        if field not in ("name", "contact"):
+            raise ValueError("can only search by name or contact")
+        if not text:
+            raise ValueError("empty search text")
+        key, (value, last_id) = ("search_" + field, after) if before is None else ("search_%s_before" % field, before)
+        params = (user,) + self.backend.prefix(text, fold=(field == "name")) + (value, value, last_id, limit)
+        rows = self._fetchall(key, params)
+        return rows if before is None else rows[::-1]
+
+    def now(self):
+        """The database clock, in the format updated_at is stored in."""
+        return self._fetchone("now", ())[0]
+
+    def patients_changed(self, user, since):
+        """(rows changed at or after since, ids deleted at or after since)."""
+        with self.transaction() as conn:
+            changed = self.backend.execute(conn, self.backend.SQL["patients_changed"], (user, since)).fetchall()
+            deleted = self.backend.execute(conn, self.backend.SQL["patients_deleted"], (user, since)).fetchall()
+        return changed, [row[0] for row in deleted]
+
+    def get_patient(self, patient_id):
+        return self._fetchone("get_patient", (patient_id,))
+
+    def add_patient(self, user, name, age, gender, contact, notes):
+        return self._write("add_patient", (user, name, age, gender, contact, notes))
+
+    def update_patient(self, patient_id, name, age, gender, contact, notes):
+        self._write("update_patient", (name, age, gender, contact, notes, patient_id))
+
+    def delete_patient(self, patient_id):
+        with self.transaction() as conn:
+            self.backend.execute(conn, self.backend.SQL["add_tombstone"], (patient_id,))
+            self.backend.execute(conn, self.backend.SQL["delete_patient"], (patient_id,))
+            self.backend.execute(conn, self.backend.SQL["delete_progress"], (patient_id,))
+
+    # diagnosis history
+    def patient_history(self, patient_id, since=None, until=None):
+        """History rows of one patient, oldest first, optionally within [since, until)."""
+        return self._fetchall("patient_history", (patient_id, since or "0001-01-01 00:00:00",
+                                                  until or "9999-12-31 23:59:59"))
+
+    def progression(self, user, since, limit=500):
+        """Patients (of user, or all when user is None) whose class went up since `since`, biggest rise first."""
+        if user is None:
+            return self._fetchall("progression_all", (since, since, since, limit))
+        return self._fetchall("progression", (since, since, user, since, limit))
+
+    def save_diagnosis(self, patient_id, user, value, cls_str, image_path=None):
+        """Latest diagnosis on the patient, a history row and the user's PREDICT, in one transaction."""
+        with self.transaction() as conn:
+            sql = self.backend.SQL
+            if patient_id is not None:
+                self.backend.execute(conn, sql["set_diagnosis"], (str(value), cls_str, patient_id))
+                self.backend.execute(conn, sql["add_history"], (patient_id, str(value), cls_str, image_path))
+                self.backend.execute(conn, sql["update_progress"], ())
+            if user:
+                self.backend.execute(conn, sql["set_prediction"], (str(value), user))
+
+
+def make_backend(name=None):
+    name = name or settings.get("db_backend", "mysql")
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "mysql":
+        return MySQLBackend()
+    raise ValueError("unknown database backend %r (expected one of %s)" % (name, ", ".join(BACKENDS)))
+
+
+def open_storage(name=None, pool_size=None):
+    """Storage for the configured backend; connects once so a dead server fails here, not on first use."""
+    storage = Storage(make_backend(name), pool_size or settings.get_int("db_pool_size", 4))
+    with storage.transaction():
+        pass
+    return storage
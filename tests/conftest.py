@@ -0,0 +1,8 @@
+# tests/conftest.py
+# The app's modules live at the repository root (as for benchmarks/).
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
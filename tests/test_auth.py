@@ -0,0 +1,77 @@
+# tests/test_auth.py
+# auth.py: PBKDF2 hashing, logins against a temporary SQLite database and the
+# upgrade of accounts created before hashing.
+#
+#   python -m pytest tests/test_auth.py
+
+import pytest
+
+import auth
+import migrations
+import storage
+
+
+@pytest.fixture(autouse=True)
+def fast_hashes(monkeypatch):
+    # the real work factor makes every hash take a good fraction of a second
+    monkeypatch.setattr(auth, "ITERATIONS", 1000)
+    monkeypatch.setattr(auth, "_DUMMY_HASH", None)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = storage.Storage(storage.SQLiteBackend(str(tmp_path / "app_data.db")))
+    migrations.migrate(db)
+    yield db
+    db.close()
+
+
+def test_hash_round_trip():
+    stored = auth.hash_password("s3cret")
+    assert stored.startswith("pbkdf2_sha256$1000$")
+    assert auth.verify_password("s3cret", stored)
+    assert not auth.verify_password("s3cret ", stored)
+    # salted: the same password never hashes the same way twice
+    assert auth.hash_password("s3cret") != stored
+    assert not auth.verify_password("s3cret", "s3cret")
+
+
+def test_create_user_and_login(db):
+    assert auth.create_user(db, "doc", "s3cret")
+    assert not auth.create_user(db, "doc", "other")
+    assert db.get_credentials("doc")[0] != "s3cret"
+    assert auth.check_login(db, "doc", "s3cret")
+    assert not auth.check_login(db, "doc", "wrong")
+
+
+def test_unknown_user_verifies_the_dummy_hash(db, monkeypatch):
+    verified = []
+    verify = auth.verify_password
+    monkeypatch.setattr(auth, "verify_password", lambda password, stored: verified.append(stored) or verify(password, stored))
+    assert not auth.check_login(db, "nobody", "s3cret")
+    # as much work as a wrong password, against the same hash every time
+    assert verified == [auth._dummy_hash()]
+    assert not auth.check_login(db, "nobody", "other")
+    assert verified[1] == verified[0]
+
+
+def test_legacy_plaintext_is_rehashed_on_login(db):
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO users (username, password) VALUES ('old', 'plain')")
+    assert not auth.check_login(db, "old", "wrong")
+    assert db.get_credentials("old") == (None, "plain")
+    assert auth.check_login(db, "old", "plain")
+    stored = db.get_credentials("old")[0]
+    assert auth.verify_password("plain", stored)
+    # later logins go through the hash
+    assert auth.check_login(db, "old", "plain") and db.get_credentials("old")[0] == stored
+    assert not auth.check_login(db, "old", "wrong")
+
+
+def test_hash_upgraded_when_iterations_raised(db, monkeypatch):
+    auth.create_user(db, "doc", "s3cret")
+    monkeypatch.setattr(auth, "ITERATIONS", 2000)
+    assert not auth.check_login(db, "doc", "wrong")
+    assert db.get_credentials("doc")[0].startswith("pbkdf2_sha256$1000$")
+    assert auth.check_login(db, "doc", "s3cret")
+    assert db.get_credentials("doc")[0].startswith("pbkdf2_sha256$2000$")
@@ -0,0 +1,82 @@
+# tests/test_evaluate.py
+# evaluate.py: the bincount QWK and the np.digitize thresholds against
+# straightforward loop versions on random labels.
+#
+#   python -m pytest tests/test_evaluate.py
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("torch")
+
+import evaluate
+
+
+def qwk_by_loops(y_true, y_pred, n):
+    """Cohen's kappa with quadratic weights, written out as in its definition."""
+    observed = [[0.0] * n for _ in range(n)]
+    for t, p in zip(y_true, y_pred):
+        observed[t][p] += 1
+    total = float(len(y_true))
+    rows = [sum(observed[i]) for i in range(n)]
+    cols = [sum(observed[i][j] for i in range(n)) for j in range(n)]
+    num = den = 0.0
+    for i in range(n):
+        for j in range(n):
+            w = (i - j) ** 2 / (n - 1) ** 2
+            num += w * observed[i][j]
+            den += w * rows[i] * cols[j] / total
+    return 1.0 - num / den
+
+
+def round_off_by_loop(preds, coef):
+    """round_off_preds as in inference.ipynb."""
+    out = []
+    for pred in preds:
+        if pred < coef[0]:
+            out.append(0)
+        elif pred < coef[1]:
+            out.append(1)
+        elif pred < coef[2]:
+            out.append(2)
+        elif pred < coef[3]:
+            out.append(3)
+        else:
+            out.append(4)
+    return out
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_qwk_matches_loops(seed):
+    rnd = np.random.default_rng(seed)
+    y_true = rnd.integers(0, 5, 300)
+    # mostly right, some noise, so kappa is neither 0 nor 1
+    y_pred = np.where(rnd.random(300) < 0.6, y_true, rnd.integers(0, 5, 300))
+    if seed == 4:
+        y_pred[y_pred == 3] = 2  # a class that is never predicted
+    cm = evaluate.confusion_matrix(y_true, y_pred)
+    assert cm.sum() == 300 and cm[1, 1] == np.sum((y_true == 1) & (y_pred == 1))
+    assert evaluate.quadratic_weighted_kappa(y_true, y_pred) == pytest.approx(qwk_by_loops(y_true, y_pred, 5))
+
+
+def test_qwk_edge_cases():
+    y = np.array([0, 1, 2, 3, 4, 2])
+    assert evaluate.quadratic_weighted_kappa(y, y) == pytest.approx(1.0)
+    assert evaluate.quadratic_weighted_kappa([], []) == 0.0
+
+
+def test_thresholds_match_notebook():
+    rnd = np.random.default_rng(0)
+    scores = np.concatenate([rnd.uniform(-0.5, 4.5, 500), [0.5, 1.5, 2.5, 3.5, 4.0]])
+    for coef in (evaluate.DEFAULT_THRESHOLDS, (0.7, 1.2, 2.9, 3.1)):
+        assert evaluate.round_off_preds(scores, coef).tolist() == round_off_by_loop(scores, coef)
+
+
+def test_optimized_thresholds_score_what_they_claim():
+    rnd = np.random.default_rng(1)
+    y = rnd.integers(0, 5, 400)
+    scores = y + rnd.normal(0.3, 0.6, 400)
+    thresholds, best = evaluate.optimize_thresholds(scores, y)
+    assert np.all(np.diff(thresholds) > 0)
+    assert best == pytest.approx(qwk_by_loops(y, round_off_by_loop(scores, thresholds), 5))
+    assert best >= qwk_by_loops(y, round_off_by_loop(scores, evaluate.DEFAULT_THRESHOLDS), 5)
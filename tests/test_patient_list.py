@@ -0,0 +1,94 @@
+# tests/test_patient_list.py
+# patient_list.PatientListModel on a temporary SQLite file: scrolling through
+# the list in either direction keeps a bounded window of rows, and refresh
+# only touches rows inside that window.
+#
+#   python -m pytest tests/test_patient_list.py
+
+import pytest
+
+import migrations
+import patient_list
+import storage
+
+NAMES = ["Anita", "Arjun", "Bala", "Deepa", "Priya"]
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = storage.Storage(storage.SQLiteBackend(str(tmp_path / "app_data.db")))
+    migrations.migrate(db)
+    db.add_user("doc", "")
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO patients (user_id, name, age, gender, contact, notes, updated_at) "
+            "VALUES ((SELECT id FROM users WHERE username = 'doc'), ?, 40, 'F', ?, '', '2020-01-01 00:00:00')",
+            [("%s %03d" % (NAMES[i % 5], i), "9%05d" % (i * 7 % 1000)) for i in range(500)])
+    yield db
+    db.close()
+
+
+def scroll(model, step):
+    """Page in one direction until the end; returns the rows in the order they arrived and the largest window."""
+    seen, largest = [], len(model.rows)
+    while True:
+        rows, evicted = step()
+        if not rows:
+            return seen, largest
+        assert not set(evicted) & {row[0] for row in model.rows}
+        seen.append(rows)
+        largest = max(largest, len(model.rows))
+
+
+@pytest.mark.parametrize("search", ["", "priya", "9"])
+def test_window_stays_bounded_both_ways(db, search):
+    model = patient_list.PatientListModel(db, "doc", page_size=20, window_pages=3)
+    first = model.reset(search, count=30)
+    if search:
+        field = patient_list.search_field(search)
+        expected = [row[0] for row in sorted(
+            (row for row in db.list_patients("doc") if model.matches(row)),
+            key=lambda r: ((r[1].lower() if field == "name" else r[4]), r[0]))]
+    else:
+        expected = [row[0] for row in db.list_patients("doc")]
+    assert len(expected) > model.max_rows
+
+    pages, largest = scroll(model, model.load_more)
+    assert [row[0] for row in first + [row for page in pages for row in page]] == expected
+    assert largest <= model.max_rows == 60
+    assert model.exhausted and not model.at_start
+    assert [row[0] for row in model.rows] == expected[-len(model.rows):]
+
+    pages, largest = scroll(model, model.load_previous)
+    back = [row[0] for page in reversed(pages) for row in page]
+    assert largest <= model.max_rows
+    assert model.at_start and not model.exhausted
+    assert [row[0] for row in model.rows] == expected[:len(model.rows)]
+    # every row came back on the way up, in order
+    assert back == expected[:len(back)]
+
+
+def test_refresh_only_inside_the_window(db):
+    model = patient_list.PatientListModel(db, "doc", page_size=20, window_pages=3)
+    model.reset(count=20)
+    for _ in range(10):
+        model.load_more()
+    ids = [row[0] for row in model.rows]
+    assert not model.at_start and not model.exhausted
+    before_window, inside = ids[0] - 5, ids[10]
+    db.update_patient(before_window, "Edited", 41, "F", "1", "")
+    db.update_patient(inside, "Edited", 41, "F", "1", "")
+    db.delete_patient(ids[11])
+    new = db.add_patient("doc", "New", 30, "M", "", "")
+    ops = model.refresh()
+    assert ops == [("delete", ids[11]), ("update", db.patients_page("doc", inside - 1, 1)[0])]
+    assert new not in [row[0] for row in model.rows]
+
+    # once the window reaches the end, new patients are inserted (and the window stays bounded)
+    while not model.exhausted:
+        model.load_more()
+    newer = [db.add_patient("doc", "Newer %d" % i, 30, "M", "", "") for i in range(3)]
+    ops = model.refresh()
+    assert [op[0] for op in ops] == ["insert"] * 3 + ["delete"] * 3
+    assert len(model.rows) == model.max_rows
+    assert [row[0] for row in model.rows][-4:] == [new] + newer
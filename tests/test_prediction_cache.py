@@ -0,0 +1,59 @@
+# tests/test_prediction_cache.py
+# prediction_cache.py with the key blindness._cached_inference builds: the
+# same image bytes must miss once the model version or the preprocessing
+# signature changes.
+#
+#   python -m pytest tests/test_prediction_cache.py
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import model
+from prediction_cache import PredictionCache, make_key
+
+IMAGE = b"\x89PNG fundus bytes"
+RESULT = {"class": 2, "label": "Moderate", "probs": [0.1, 0.2, 0.4, 0.2, 0.1], "error": None}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PredictionCache(str(tmp_path / "cache.db"), memory_size=4)
+
+
+def key_now(tta=None):
+    return make_key(IMAGE, model.model_version(), model.preprocess_signature(tta))
+
+
+def test_new_model_version_misses(cache):
+    # both kept alive: an in-memory model's version is derived from its id()
+    nets = [model.build_model(arch="resnet18") for _ in range(2)]
+    model.registry.use(nets[0])
+    first = key_now()
+    cache.put(first, RESULT)
+    assert cache.get(key_now()) == RESULT
+    model.registry.use(nets[1])
+    second = key_now()
+    assert second != first
+    assert cache.get(second) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_preprocessing_change_misses(cache, monkeypatch):
+    key = make_key(IMAGE, "v1", model.preprocess_signature())
+    cache.put(key, RESULT)
+    assert make_key(IMAGE, "v1", model.preprocess_signature(tta="flip")) != key
+    monkeypatch.setattr(model, "CROP_BORDER", not model.CROP_BORDER)
+    cropped = make_key(IMAGE, "v1", model.preprocess_signature())
+    assert cropped != key and cache.get(cropped) is None
+    assert make_key(IMAGE + b"x", "v1", model.preprocess_signature()) != cropped
+
+
+def test_disk_tier_keeps_versions_apart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    PredictionCache(path).put(make_key(IMAGE, "v1", "p"), RESULT)
+    # a new session (empty memory tier) reads the disk tier
+    reopened = PredictionCache(path)
+    assert reopened.get(make_key(IMAGE, "v1", "p")) == RESULT
+    assert reopened.get(make_key(IMAGE, "v2", "p")) is None
+    assert reopened.stats()["hits_disk"] == 1
@@ -0,0 +1,84 @@
+# tests/test_score.py
+# score.py: an interrupted run resumes without duplicated or missing rows, and
+# an output without its checkpoint is never overwritten.
+#
+#   python -m pytest tests/test_score.py
+
+import csv
+
+import pytest
+
+torch = pytest.importorskip("torch")
+np = pytest.importorskip("numpy")
+from PIL import Image
+
+import model
+import score
+
+
+@pytest.fixture(scope="module")
+def images(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("images")
+    rnd = np.random.default_rng(0)
+    for i in range(7):
+        Image.fromarray(rnd.integers(0, 255, (64, 64, 3), dtype=np.uint8)).save(str(folder / ("eye%d.png" % i)))
+    # an image that cannot be decoded gets an error row, once
+    (folder / "eye7.png").write_bytes(b"not an image")
+    torch.manual_seed(0)
+    model.registry.use(model.build_model(arch="resnet18"))
+    return str(folder)
+
+
+def rows(path):
+    with open(path, newline="", encoding="utf-8") as fh:
+        return list(csv.reader(fh))
+
+
+def test_resume_after_interruption(images, tmp_path, monkeypatch):
+    reference = str(tmp_path / "reference.csv")
+    score.score(images, reference, batch_size=2, workers=1)
+    expected = rows(reference)
+    assert [row[0] for row in expected[1:]] == ["eye%d" % i for i in range(8)]
+
+    out = str(tmp_path / "results.csv")
+    predict = model.predict_tensors
+    calls = []
+
+    def crash_on_third_batch(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return predict(*args, **kwargs)
+
+    monkeypatch.setattr(model, "predict_tensors", crash_on_third_batch)
+    with pytest.raises(KeyboardInterrupt):
+        score.score(images, out, batch_size=2, workers=1)
+    assert len(rows(out)) == 1 + 4
+    # a row half-written when the process died
+    with open(out, "a", encoding="utf-8") as fh:
+        fh.write("eye4,partial")
+
+    monkeypatch.setattr(model, "predict_tensors", predict)
+    result = score.score(images, out, batch_size=2, workers=1)
+    assert result["scored"] == 4 and result["done"] == 8
+    assert rows(out) == expected
+    # finished: running again adds nothing
+    assert score.score(images, out, batch_size=2, workers=1)["scored"] == 0
+    assert rows(out) == expected
+
+
+def test_refuses_output_without_checkpoint(images, tmp_path):
+    out = tmp_path / "results.csv"
+    out.write_text("someone else's results\n")
+    with pytest.raises(SystemExit, match="--restart"):
+        score.score(images, str(out), batch_size=2, workers=1)
+    assert out.read_text() == "someone else's results\n"
+    score.score(images, str(out), batch_size=4, workers=1, restart=True)
+    assert len(rows(str(out))) == 1 + 8
+
+
+def test_refuses_checkpoint_without_output(images, tmp_path):
+    out = str(tmp_path / "results.csv")
+    score.save_checkpoint(out + ".progress.json", images, 4, 1000)
+    with pytest.raises(SystemExit, match="--restart"):
+        score.score(images, out, batch_size=2, workers=1)
@@ -0,0 +1,248 @@
+# tests/test_storage.py
+# storage.py and migrations.py on a temporary SQLite file.
+#
+#   python -m pytest tests/test_storage.py
+
+import random
+import threading
+
+import pytest
+
+import history
+import migrations
+import storage
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = storage.Storage(storage.SQLiteBackend(str(tmp_path / "app_data.db")), pool_size=2)
+    migrations.migrate(db)
+    db.add_user("doc", "hash")
+    yield db
+    db.close()
+
+
+def add_history(db, patient_id, cls, at):
+    # as the app saves it: class number in diagnosis, label in diagnosis_class
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO records (patient_id, diagnosis, diagnosis_class, filename, created_at) "
+                     "VALUES (?, ?, ?, 'eye.png', ?)", (patient_id, str(cls), "label %d" % cls, at))
+
+
+def expected_progress(db, patient_id):
+    """patient_progress recomputed from the patient's history rows."""
+    rows = [(at, int(cls)) for at, cls, _, _, _ in db.patient_history(patient_id) if str(cls).isdigit()]
+    if not rows:
+        return None
+    changed = [at for (at, cls), (_, previous) in zip(rows, [(None, None)] + rows[:-1]) if cls != previous]
+    return (len(rows), rows[0][1], rows[0][0], rows[-1][1], rows[-1][0], changed[-1], max(c for _, c in rows))
+
+
+def progress(db, patient_id):
+    with db.transaction() as conn:
+        return conn.execute("SELECT tests, first_class, first_at, last_class, last_at, changed_at, worst_class "
+                            "FROM patient_progress WHERE patient_id = ?", (patient_id,)).fetchone()
+
+
+def history_rows(db, patient_id):
+    with db.transaction() as conn:
+        return conn.execute("SELECT diagnosis, diagnosis_class, filename FROM records "
+                            "WHERE patient_id = ? ORDER BY id", (patient_id,)).fetchall()
+
+
+def schema(db):
+    with db.transaction() as conn:
+        return (conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY name").fetchall(),
+                conn.execute("SELECT version, description FROM schema_version ORDER BY version").fetchall())
+
+
+def test_migrate_from_empty(tmp_path):
+    db = storage.Storage(storage.SQLiteBackend(str(tmp_path / "new.db")))
+    assert migrations.current_version(db) == 0
+    assert migrations.migrate(db) == [number for number, _, _ in migrations.SQLITE]
+    assert migrations.current_version(db) == migrations.latest_version("sqlite")
+    assert migrations.ensure_current(db) == [] and db.schema_current
+    db.close()
+
+
+def test_migrate_again_is_a_no_op(db):
+    pid = db.add_patient("doc", "Asha", 52, "F", "555", "")
+    before = schema(db)
+    assert migrations.migrate(db) == []
+    assert schema(db) == before
+    assert db.get_credentials("doc")[0] == "hash"
+    assert db.get_patient(pid)[2] == "Asha"
+
+
+def test_users(db):
+    assert db.add_user("nurse", "h1")
+    assert not db.add_user("nurse", "h2")
+    assert db.get_credentials("nurse")[0] == "h1"
+    db.set_password_hash("nurse", "h3")
+    assert db.get_credentials("nurse")[0] == "h3"
+    assert db.get_credentials("nobody") is None
+
+
+def test_patient_crud(db):
+    since = db.now()
+    pid = db.add_patient("doc", "Asha", 52, "F", "555", "notes")
+    assert db.get_patient(pid)[:7] == (pid, "doc", "Asha", 52, "F", "555", "notes")
+    assert [row[0] for row in db.list_patients("doc")] == [pid]
+    db.update_patient(pid, "Asha R", 53, "F", "556", "")
+    assert db.get_patient(pid)[2:6] == ("Asha R", 53, "F", "556")
+    assert db.search_patients("doc", "asha")[0][0] == pid
+    assert db.search_patients("doc", "55", field="contact")[0][0] == pid
+    db.delete_patient(pid)
+    assert db.get_patient(pid) is None
+    assert db.list_patients("doc") == []
+    changed, deleted = db.patients_changed("doc", since)
+    assert changed == [] and deleted == [pid]
+
+
+def test_patients_page_is_keyset(db):
+    ids = [db.add_patient("doc", "p%d" % i, 30, "M", "", "") for i in range(5)]
+    first = db.patients_page("doc", 0, 2)
+    rest = db.patients_page("doc", first[-1][0], 10)
+    assert [row[0] for row in first + rest] == ids
+
+
+def test_save_diagnosis_and_history(db):
+    pid = db.add_patient("doc", "Asha", 52, "F", "555", "")
+    db.save_diagnosis(pid, "doc", 0, "No DR", "a.png")
+    db.save_diagnosis(pid, "doc", 3, "Severe", "b.png")
+    assert db.get_patient(pid)[7:] == ("3", "Severe")
+    assert history_rows(db, pid) == [("0", "No DR", "a.png"), ("3", "Severe", "b.png")]
+    rows = db.patient_history(pid)
+    assert [row[1:] for row in rows] == [("0", "No DR", "a.png", None), ("3", "Severe", "b.png", "0")]
+    assert history.class_change(rows[1][1], rows[1][4]) == "up"
+
+    report = history.progression_report(db, "doc", months=1)
+    assert [(row[0], row[3], row[4], row[6]) for row in report] == [(pid, 0, 3, 2)]
+    assert history.progression_report(db, None, months=1)[0][0] == pid
+    assert history.progression_report(db, "someone else", months=1) == []
+
+
+def test_history_range_sees_the_test_before_it(db):
+    pid = db.add_patient("doc", "Asha", 52, "F", "555", "")
+    for cls, at in ((1, "2021-01-01 00:00:00"), (3, "2021-06-01 00:00:00"), (3, "2021-09-01 00:00:00")):
+        add_history(db, pid, cls, at)
+    rows = db.patient_history(pid, since="2021-03-01 00:00:00")
+    assert [(row[1], row[4]) for row in rows] == [("3", "1"), ("3", "3")]
+    assert history.class_change(rows[0][1], rows[0][4]) == "up"
+    assert [row[4] for row in db.patient_history(pid, until="2021-06-01 00:00:00")] == [None]
+
+
+def test_save_diagnosis_rolls_back_on_error(db, monkeypatch):
+    pid = db.add_patient("doc", "Asha", 52, "F", "555", "")
+    monkeypatch.setitem(db.backend.SQL, "set_prediction", "UPDATE no_such_table SET x = ?")
+    with pytest.raises(Exception):
+        db.save_diagnosis(pid, "doc", 2, "Moderate", "a.png")
+    assert history_rows(db, pid) == []
+    assert db.get_patient(pid)[7] is None
+    assert progress(db, pid) is None
+
+
+def test_progression_window_and_backfill(tmp_path):
+    db = storage.Storage(storage.SQLiteBackend(str(tmp_path / "old.db")))
+    migrations.migrate(db, target=4)
+    db.add_user("doc", "")
+    worse = db.add_patient("doc", "worse", 60, "F", "", "")
+    stable = db.add_patient("doc", "stable", 60, "F", "", "")
+    long_ago = db.add_patient("doc", "long ago", 60, "F", "", "")
+    recent = history.months_before(db.now(), 1)
+    for pid, classes in ((worse, (1, 1, 3)), (stable, (3, 3, 3)), (long_ago, (1, 3, 3))):
+        for cls, at in zip(classes, ("2020-01-01 00:00:00", "2021-01-01 00:00:00", recent)):
+            add_history(db, pid, cls, at)
+    # the summary for existing history comes from the migration
+    migrations.migrate(db)
+    assert [row[0] for row in history.progression_report(db, "doc", months=6)] == [worse]
+    assert sorted(row[0] for row in history.progression_report(db, "doc", months=120)) == [worse, long_ago]
+    # and from save_diagnosis afterwards; biggest rise first
+    db.save_diagnosis(stable, "doc", 4, "Proliferative DR", "x.png")
+    assert [(row[0], row[3], row[4]) for row in history.progression_report(db, "doc", months=6)] == \
+        [(worse, 1, 3), (stable, 3, 4)]
+    db.close()
+
+
+def test_progress_matches_history(tmp_path):
+    db = storage.Storage(storage.SQLiteBackend(str(tmp_path / "old.db")))
+    migrations.migrate(db, target=4)
+    db.add_user("doc", "")
+    rnd = random.Random(0)
+    ids = [db.add_patient("doc", "p%d" % i, 60, "F", "", "") for i in range(30)]
+    for pid in ids[:-1]:
+        for _ in range(rnd.randint(1, 8)):
+            # few distinct days, so some tests share a timestamp and order by id
+            add_history(db, pid, rnd.randint(0, 4), "2021-01-%02d 10:00:00" % rnd.randint(1, 5))
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO records (patient_id, diagnosis, diagnosis_class, filename, created_at) "
+                     "VALUES (?, 'unreadable', NULL, 'x.png', '2021-01-03 10:00:00')", (ids[0],))
+    # backfilled by the migration
+    migrations.migrate(db)
+    assert [progress(db, pid) for pid in ids] == [expected_progress(db, pid) for pid in ids]
+    # and kept current by save_diagnosis, including a patient without history so far
+    for pid in rnd.sample(ids[:-1], 10) + [ids[-1]]:
+        for cls in (rnd.randint(0, 4), rnd.randint(0, 4)):
+            db.save_diagnosis(pid, "doc", cls, "label", "eye.png")
+    assert [progress(db, pid) for pid in ids] == [expected_progress(db, pid) for pid in ids]
+    db.close()
+
+
+def test_pool_checkout_and_return():
+    opened = []
+
+    def connect():
+        opened.append(object())
+        return opened[-1]
+
+    pool = storage.ConnectionPool(connect, max_size=2)
+    a, b = pool.acquire(), pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    pool.release(a)
+    assert pool.acquire(timeout=0.05) is a
+    pool.release(b, broken=True)
+    c = pool.acquire(timeout=0.05)
+    assert c is not b and len(opened) == 3
+
+
+def test_pool_under_contention(db):
+    pid = db.add_patient("doc", "Asha", 52, "F", "555", "")
+    out = []
+    lock = threading.Lock()
+    active = [0, 0]
+    acquire, release = db.pool.acquire, db.pool.release
+
+    def counting_acquire(timeout=None):
+        conn = acquire(timeout)
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        return conn
+
+    def counting_release(conn, broken=False):
+        with lock:
+            active[0] -= 1
+        release(conn, broken)
+
+    db.pool.acquire, db.pool.release = counting_acquire, counting_release
+    errors = []
+
+    def worker(k):
+        try:
+            for i in range(20):
+                db.save_diagnosis(pid, "doc", (k + i) % 5, "label", "eye.png")
+                out.append(len(db.list_patients("doc")))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(history_rows(db, pid)) == 160 and out == [1] * 160
+    # never more connections out than the pool allows, and all of them back
+    assert active[0] == 0 and active[1] <= 2
+    assert len(db.pool._all) <= 2
@@ -0,0 +1,42 @@
+# tests/test_train.py
+# train.run_epoch and the checkpoint round trip on a tiny synthetic dataset.
+#
+#   python -m pytest tests/test_train.py
+
+import math
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import dataset
+import model
+import train
+
+
+def test_run_epoch_and_checkpoints(tmp_path, monkeypatch):
+    torch.manual_seed(0)
+    net = model.build_model().to(model.device)
+    data = dataset.SyntheticDataset(count=10, size=32)
+    trainloader, validloader = train.make_loaders(data, valid_size=0.2, batch_size=4, workers=0)
+    criterion = torch.nn.NLLLoss()
+    optimizer = torch.optim.Adam(net.parameters(), lr=1e-3)
+
+    loss, accuracy, seen = train.run_epoch(net, trainloader, criterion, optimizer)
+    assert seen == 8 and math.isfinite(loss) and 0.0 <= accuracy <= 1.0
+    loss, accuracy, seen = train.run_epoch(net, validloader, criterion)
+    assert seen == 2 and math.isfinite(loss)
+
+    out = str(tmp_path / "smoke.pt")
+    slim = train.save_checkpoints(net, optimizer, 1, loss, out)
+    expected = {k: v.detach().cpu() for k, v in net.state_dict().items()}
+    loads = []
+    torch_load = torch.load
+    monkeypatch.setattr(torch, "load", lambda *a, **k: loads.append(a[0]) or torch_load(*a, **k))
+    for path in (out, slim):
+        loaded = model.load_model(path)
+        state = loaded.state_dict()
+        assert state.keys() == expected.keys()
+        assert all(torch.equal(state[k].cpu(), expected[k]) for k in expected)
+    # each file is deserialized once
+    assert loads == [out, slim]
@@ -0,0 +1,185 @@
+# train.py
+# Training entry point (the train_and_test loop from training.ipynb as a
+# module / CLI), using the model.py architecture.
+#
+#   python train.py --data data/train_224 --init classifier.pt --epochs 5 --out classifier.pt
+#   python train.py --synthetic 64 --image-size 64 --epochs 1 --out /tmp/smoke.pt    (smoke test)
+#   python train.py --data data/train_224 --arch resnet18 --lr 1e-4 --out screen.pt  (cascade.py screening model)
+#
+# Compared to the notebook loop:
+#   - DataLoaders use worker processes with persistent workers and prefetching
+#   - the network and batches are channels_last, and the forward pass runs
+#     under bf16 autocast on CPUs that support it (--amp)
+#   - loss / accuracy are summed on the device and read once per epoch, not
+#     with .item() after every batch
+#   - the best epoch is saved as a training checkpoint (--out) and as a slim
+#     inference checkpoint (<out>.infer.pt, see model.save_inference_checkpoint)
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, SubsetRandomSampler
+
+import model
+import dataset
+import settings
+from log_config import setup_logging
+
+AMP_MODES = ("auto", "bf16", "off")
+
+
+def amp_dtype(mode="auto"):
+    """The autocast dtype to train with, or None for plain fp32."""
+    if mode == "off":
+        return None
+    if model.device.type == "cuda":
+        return torch.bfloat16 if torch.cuda.is_bf16_supported() else None
+    supported = False
+    try:
+        supported = torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        pass
+    if mode == "bf16" and not supported:
+        print("[TRAIN] bf16 is not supported on this CPU, training in fp32")
+    return torch.bfloat16 if supported else None
+
+
+def autocast(dtype):
+    if dtype is None:
+        return contextlib.nullcontext()
+    return torch.autocast(device_type=model.device.type, dtype=dtype)
+
+
+def make_loaders(train_data, valid_size=0.2, batch_size=64, workers=None, prefetch=2, seed=0):
+    # same split as the notebook: shuffled indices, the first valid_size go to validation
+    indices = np.random.RandomState(seed).permutation(len(train_data))
+    split = int(np.floor(valid_size * len(train_data)))
+    train_idx, valid_idx = indices[split:].tolist(), indices[:split].tolist()
+    workers = settings.get_int("train_workers", min(4, os.cpu_count() or 1)) if workers is None else workers
+    kwargs = dict(batch_size=batch_size, num_workers=workers, pin_memory=model.device.type == "cuda")
+    if workers > 0:
+        kwargs.update(persistent_workers=True, prefetch_factor=prefetch)
+    trainloader = DataLoader(train_data, sampler=SubsetRandomSampler(train_idx), drop_last=len(train_idx) > batch_size, **kwargs)
+    validloader = DataLoader(train_data, sampler=SubsetRandomSampler(valid_idx), **kwargs)
+    return trainloader, validloader
+
+
+def run_epoch(net, loader, criterion, optimizer=None, dtype=None, channels_last=True):
+    """One pass over loader (training when optimizer is given). Returns (mean loss, accuracy, samples)."""
+    training = optimizer is not None
+    net.train(training)
+    memory_format = torch.channels_last if channels_last else torch.contiguous_format
+    total_loss = torch.zeros((), device=model.device)
+    correct = torch.zeros((), dtype=torch.long, device=model.device)
+    seen = 0
+    with torch.set_grad_enabled(training):
+        for images, labels in loader:
+            images = images.to(model.device, non_blocking=True).contiguous(memory_format=memory_format)
+            labels = labels.to(model.device, non_blocking=True)
+            with autocast(dtype):
+                out = net(images)
+            # NLLLoss on fp32 log-probs
+            loss = criterion(out.float(), labels)
+            if training:
+                optimizer.zero_grad(set_to_none=True)
+                loss.backward()
+                optimizer.step()
+            total_loss += loss.detach() * labels.shape[0]
+            correct += (out.detach().argmax(1) == labels).sum()
+            seen += labels.shape[0]
+    if seen == 0:
+        return 0.0, 0.0, 0
+    return total_loss.item() / seen, correct.item() / seen, seen
+
+
+def save_checkpoints(net, optimizer, epoch, loss, out, arch="resnet152"):
+    state_dict = net.state_dict()
+    torch.save({'epoch': epoch, 'model_state_dict': state_dict, 'arch': arch,
+                'optimizer_state_dict': optimizer.state_dict(), 'loss': loss}, out)
+    slim = os.path.splitext(out)[0] + ".infer.pt"
+    model.save_inference_checkpoint(state_dict, slim, arch=arch)
+    return slim
+
+
+def train(net, train_data, epochs=5, batch_size=64, lr=None, valid_size=0.2, workers=None, prefetch=2,
+          amp="auto", channels_last=True, out=None, arch="resnet152"):
+    """Fine-tune net (layer2..fc, as in the notebook). Returns per-epoch history dicts."""
+    model.freeze_layers(net)
+    criterion, optimizer, scheduler = model.build_optimizer(net)
+    if lr is not None:
+        for group in optimizer.param_groups:
+            group['lr'] = lr
+    if channels_last:
+        net = net.to(memory_format=torch.channels_last)
+    dtype = amp_dtype(amp)
+    trainloader, validloader = make_loaders(train_data, valid_size, batch_size, workers, prefetch)
+    print(f"[TRAIN] {len(trainloader.sampler)} train / {len(validloader.sampler)} valid, "
+          f"batch {batch_size}, workers {trainloader.num_workers}, "
+          f"amp {'bf16' if dtype is not None else 'off'}, channels_last {channels_last}")
+
+    history = []
+    valid_loss_min = np.inf
+    for epoch in range(epochs):
+        t0 = time.perf_counter()
+        train_loss, _, n = run_epoch(net, trainloader, criterion, optimizer, dtype, channels_last)
+        train_seconds = time.perf_counter() - t0
+        valid_loss, valid_acc, _ = run_epoch(net, validloader, criterion, None, dtype, channels_last)
+        scheduler.step()
+        history.append({"epoch": epoch + 1, "train_loss": train_loss, "valid_loss": valid_loss,
+                        "valid_accuracy": valid_acc, "train_samples_per_sec": n / train_seconds if train_seconds else 0.0,
+                        "seconds": time.perf_counter() - t0})
+        print(f"[TRAIN] epoch {epoch + 1}/{epochs} train loss {train_loss:.3f} valid loss {valid_loss:.3f} "
+              f"valid acc {valid_acc:.3f} ({history[-1]['train_samples_per_sec']:.1f} samples/s)")
+        if out and valid_loss <= valid_loss_min:
+            slim = save_checkpoints(net, optimizer, epoch, valid_loss, out, arch)
+            print(f"[TRAIN] valid loss decreased ({valid_loss_min:.6f} --> {valid_loss:.6f}), saved {out} and {slim}")
+            valid_loss_min = valid_loss
+    return history
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train / fine-tune the diabetic retinopathy classifier")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--data", help="dataset.build_memmap directory")
+    src.add_argument("--synthetic", type=int, metavar="N", help="N random images (smoke test / benchmarking)")
+    parser.add_argument("--image-size", type=int, default=224, help="--synthetic only")
+    parser.add_argument("--arch", choices=model.ARCHS, default="resnet152",
+                        help="a smaller ResNet trains the screening model for cascade.py")
+    parser.add_argument("--init", default=None, help="starting checkpoint (training or slim)")
+    parser.add_argument("--out", default=None, help="training checkpoint to write (slim copy: <out>.infer.pt)")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--lr", type=float, default=None, help="default: the notebook's 1e-6")
+    parser.add_argument("--valid-size", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=None, help="DataLoader workers (default DR_TRAIN_WORKERS or min(4, cpus))")
+    parser.add_argument("--prefetch", type=int, default=2, help="batches prefetched per worker")
+    parser.add_argument("--amp", choices=AMP_MODES, default="auto")
+    parser.add_argument("--no-channels-last", action="store_true")
+    parser.add_argument("--flip-p", type=float, default=0.4)
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    if args.synthetic:
+        data = dataset.SyntheticDataset(args.synthetic, args.image_size)
+    else:
+        data = dataset.MemmapDataset(args.data, flip_p=args.flip_p)
+    net = model.build_model(arch=args.arch)
+    if args.init:
+        checkpoint = model.read_checkpoint(args.init, mmap=False)
+        if model.is_slim_checkpoint(checkpoint):
+            net.load_state_dict(model.inference_model_from(checkpoint).state_dict())
+        else:
+            net = model.training_model_from(checkpoint, net)
+    net.to(model.device)
+    train(net, data, args.epochs, args.batch_size, args.lr, args.valid_size, args.workers, args.prefetch,
+          args.amp, not args.no_channels_last, args.out, args.arch)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())